@@ -0,0 +1,349 @@
+import sys
+import time
+import logging
+import pathlib
+import traceback
+from queue import Empty
+from collections import defaultdict, namedtuple
+from multiprocessing import cpu_count
+from typing import Dict, List, Tuple
+
+import click
+
+from photon.demo_util.util import pass_context
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.archive import ARCHIVE_MODES
+from photon.demo_util.common.magick import auto_magick_threads
+from photon.demo_util.common.messages import ResultNT
+from photon.demo_util.common.stats import percentiles
+
+# defaults - config overrides defaults; commandline options override config
+WORKER_COUNT: int = 0
+POOL: str = "thread"
+QUEUE_DEPTH: int = 0
+ARCHIVE_MODE: str = "copy"
+CACHE_MB: int = 0
+INSTRUMENT: bool = False
+MAGICK_THREADS: int = 0
+
+
+def _collect(ctx: ContextBase, paths: Tuple[str, ...]) -> Dict[pathlib.Path, int]:
+    # explicit files are queued as given; directory trees only for valid images
+    fileps: List[pathlib.Path] = []
+
+    for path in paths:
+        pathp = pathlib.Path(path)
+
+        if pathp.is_dir():
+            fileps.extend(
+                filep
+                for filep in sorted(pathp.rglob("*"))
+                if filep.is_file() and filep.suffix.upper() in ctx.VALID_EXTENSIONS
+            )
+        else:
+            fileps.append(pathp)
+
+    sizesd: Dict[pathlib.Path, int] = {}
+    namesd: Dict[str, pathlib.Path] = {}
+
+    for filep in fileps:
+        if filep.name in namesd and namesd[filep.name] != filep:
+            # the destination directories are flat: one would overwrite the other
+            raise click.UsageError(
+                f"duplicate file name: {namesd[filep.name]} and {filep}"
+            )
+
+        namesd[filep.name] = filep
+        sizesd[filep] = filep.stat().st_size
+
+    return sizesd
+
+
+def _summarize_transforms(resultnts: List[ResultNT]) -> str:
+    wallsd: Dict[str, float] = defaultdict(float)
+    cpusd: Dict[str, float] = defaultdict(float)
+
+    for resultnt in resultnts:
+        for transformnt in resultnt.transforms:
+            wallsd[transformnt.name] += transformnt.secs
+            cpusd[transformnt.name] += transformnt.cpusecs or 0.0  # --instrument
+
+    total = sum(wallsd.values()) or 1.0
+    msg = ""
+
+    for name, secs in sorted(wallsd.items(), key=lambda item: -item[1]):
+        msg += f"\n  transform {name}: {secs:.3f} secs ({secs / total:.0%})"
+
+        if cpusd[name]:
+            msg += f"; cpu {cpusd[name]:.3f} secs"
+
+    return msg
+
+
+def _summarize(
+    ctx: ContextBase, resultnts: List[ResultNT], secs: float, bytes_in: int
+) -> str:
+    bytes_out = 0
+
+    for resultnt in resultnts:
+        destp = resultnt.destdirp / resultnt.filep.name
+
+        if resultnt.valid and destp.exists():
+            bytes_out += destp.stat().st_size
+
+    endworkd = percentiles(r.endworktd.total_seconds() for r in resultnts)
+    rejected = sum(1 for r in resultnts if not r.valid)
+    transforms_msg = _summarize_transforms(resultnts)
+
+    return (
+        f"{ctx.util_cmd} summary:"
+        f"\n  images: {len(resultnts)}"
+        f"\n  rejected: {rejected}"
+        f"\n  secs: {secs:.3f}"
+        f"\n  images/sec: {len(resultnts) / max(secs, 1e-9):.2f}"
+        f"\n  endworktd p50/p95/p99 secs: {endworkd['p50']:.3f} / "
+        f"{endworkd['p95']:.3f} / {endworkd['p99']:.3f}"
+        f"\n  bytes in: {bytes_in}"
+        f"\n  bytes out: {bytes_out}"
+        f"{transforms_msg}"
+    )
+
+
+def _doit(ctx: ContextBase, sizesd: Dict[pathlib.Path, int]) -> bool:
+    # import here: loads Wand and the plugins only when executing
+    from photon.demo_util.common.results import ResultsDemo
+    from photon.demo_util.common.methods import (
+        update_ctx,
+        start_watchdog,
+        start_workers,
+        start_batch,
+    )
+
+    update_ctx(ctx, parties=1 + 1)  # Incoming + this main thread
+    start_watchdog(ctx)  # bkgd thread: block on the earliest deadline
+    start_workers(ctx)  # bkgd threads: each blocks on the workq
+    start_batch(ctx, sizesd)  # bkgd thread: queue the batch, then exit
+    results = ResultsDemo(ctx)  # not started: the main thread drains resultq
+
+    ctx.startfast_br.wait()  # blocks until all threads are ready
+    begin = time.monotonic()
+    resultnts: List[ResultNT] = []
+
+    while len(resultnts) < len(sizesd) and not ctx.failfast_ev.is_set():
+        try:
+            resultnt = ctx.resultq.get(timeout=1)
+        except Empty:
+            continue
+
+        results.handle_result(resultnt)
+        resultnts.append(resultnt)
+
+    click.echo(
+        _summarize(ctx, resultnts, time.monotonic() - begin, sum(sizesd.values()))
+    )
+
+    if ctx.failfast_ev.is_set():
+        ctx._logger.error(f"{ctx.util_cmd}: failed after {len(resultnts)} files")
+        return False
+
+    return all(resultnt.valid for resultnt in resultnts)
+
+
+@click.command("batch", short_help="Transform a fixed set of images and exit.")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option(
+    "-w",
+    "--worker-count",
+    type=click.IntRange(0, 127),
+    help=(
+        "Number of workers - 0 means one per cpu, divided by magick-threads "
+        f"(default {WORKER_COUNT}, range 0-127)"
+    ),
+)
+@click.option(
+    "-p",
+    "--pool",
+    type=click.Choice(["thread", "process"]),
+    help=(
+        "Transform files in the worker threads or in a pool of worker-count "
+        f"processes (default {POOL})"
+    ),
+)
+@click.option(
+    "-q",
+    "--queue-depth",
+    type=click.IntRange(0, 100000),
+    help=(
+        "Max items on the work and result queues; 0 means 2 * worker-count "
+        f"(default {QUEUE_DEPTH}, range 0-100000)"
+    ),
+)
+@click.option(
+    "-t",
+    "--timeout",
+    type=click.IntRange(10, 600),
+    default=60,
+    help=("Worker timeout in seconds (default 60, range 10-600)"),
+)
+@click.option(
+    "--archive-mode",
+    type=click.Choice(ARCHIVE_MODES),
+    help=(
+        "How originals are saved: copy bytes (reflink/copy_file_range/sendfile), "
+        f"hardlink (copy across filesystems) or reencode (default {ARCHIVE_MODE})"
+    ),
+)
+@click.option(
+    "--cache-mb",
+    type=click.IntRange(0, 1048576),
+    help=(
+        "Size in MB of the result cache that serves already transformed images "
+        f"without transforming them; 0 disables it (default {CACHE_MB})"
+    ),
+)
+@click.option(
+    "--magick-threads",
+    type=click.IntRange(0, 256),
+    help=(
+        "ImageMagick threads per transform; 0 splits the cpus evenly across "
+        f"the workers (default {MAGICK_THREADS}, range 0-256)"
+    ),
+)
+@click.option(
+    "--instrument",
+    is_flag=True,
+    default=False,
+    help=(
+        "Record CPU time and pixels in/out of each transform in the results "
+        f"(default {INSTRUMENT})"
+    ),
+)
+@click.option(
+    "-e",
+    "--execute",
+    is_flag=True,
+    default=False,
+    help="Execute the commands (default False)",
+)
+@pass_context
+def cli(
+    ctx: ContextBase,
+    paths: Tuple[str, ...],
+    worker_count: int,
+    pool: str,
+    queue_depth: int,
+    timeout: int,
+    archive_mode: str,
+    cache_mb: int,
+    magick_threads: int,
+    instrument: bool,
+    execute: bool,
+) -> None:
+    """
+    Transform a fixed set of images and exit.
+
+    PATHS are image files, queued as given, or directories, searched
+    recursively for images with a valid extension. As with demo, originals are
+    archived and the files are moved to the modified or rejected directory, so
+    file names must be unique across PATHS.
+
+    NOTE: the files under PATHS are transformed in place and then moved out -
+    only the archived originals are kept. Run on a copy to keep PATHS intact.
+
+    Prints a throughput summary when the batch has drained and exits non-zero
+    if any file was rejected or any thread failed.
+
+    """
+    logname = pathlib.Path(__file__).stem
+    ctx.util_cmd = logname.replace("cmd_", "")
+    application = f"{ctx.PACKAGE_NAME}.{logname}"
+    ctx._logger = logging.getLogger(application)
+
+    if not worker_count:
+        worker_count = getattr(ctx, "WORKER_COUNT", WORKER_COUNT)
+
+    if not magick_threads:
+        magick_threads = getattr(ctx, "MAGICK_THREADS", MAGICK_THREADS)
+
+    # CPU bound with nothing to wait on: one worker per cpu
+    worker_count = worker_count or max(1, cpu_count() // max(1, magick_threads))
+    magick_threads = magick_threads or auto_magick_threads(worker_count)
+
+    if not pool:
+        pool = getattr(ctx, "POOL", POOL)
+
+    if not queue_depth:
+        queue_depth = getattr(ctx, "QUEUE_DEPTH", QUEUE_DEPTH)
+
+    queue_depth = queue_depth or worker_count * 2
+
+    if not archive_mode:
+        archive_mode = getattr(ctx, "ARCHIVE_MODE", ARCHIVE_MODE)
+
+    if not cache_mb:
+        cache_mb = getattr(ctx, "CACHE_MB", CACHE_MB)
+
+    if not instrument:
+        instrument = getattr(ctx, "INSTRUMENT", INSTRUMENT)
+
+    sizesd = _collect(ctx, paths)
+
+    ctx._logger.info(
+        "Effective Options (commandline overrides config.py):"
+        f"\n  files: {len(sizesd)}"
+        f"\n  worker_count: {worker_count}"
+        f"\n  pool: {pool}"
+        f"\n  queue_depth: {queue_depth}"
+        f"\n  timeout: {timeout}"
+        f"\n  archive_mode: {archive_mode}"
+        f"\n  cache_mb: {cache_mb}"
+        f"\n  magick_threads: {magick_threads}"
+        f"\n  instrument: {instrument}"
+        f"\n  execute: {execute}"
+    )
+
+    CmdCtx = namedtuple(
+        "CmdCtx",
+        "worker_count min_workers max_workers pool queue_depth queue_policy "
+        "timeout archive_mode cache_mb magick_threads magick_memory_mb "
+        "magick_map_mb magick_area_mp check_interval_secs incoming_mode "
+        "instrument execute",
+    )
+
+    cmdctx = CmdCtx(
+        worker_count,
+        worker_count,  # fixed: no Supervisor
+        worker_count,
+        pool,
+        queue_depth,
+        "fifo",  # throughput, not latency: order does not matter
+        timeout,
+        archive_mode,
+        cache_mb,
+        magick_threads,
+        getattr(ctx, "MAGICK_MEMORY_MB", 0),  # config only
+        getattr(ctx, "MAGICK_MAP_MB", 0),
+        getattr(ctx, "MAGICK_AREA_MP", 0),
+        0,  # no polling: the batch is queued once
+        "batch",
+        instrument,
+        execute,
+    )  # immutable
+
+    for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
+        setattr(ctx, k, v)
+
+    if cmdctx.execute:
+        try:
+            ok = _doit(ctx, sizesd)
+        except KeyboardInterrupt:
+            sys.exit(1)
+        except Exception as e:
+            t = traceback.format_exc()
+            ctx._logger.error(f"Exception: {e}\n{t}")
+            sys.exit(1)
+
+        if not ok:
+            sys.exit(1)
+    else:
+        ctx._logger.info(f"{ctx.util_cmd}: Not executed")
@@ -0,0 +1,346 @@
+import sys
+import json
+import time
+import shutil
+import logging
+import pathlib
+import tempfile
+import traceback
+import multiprocessing
+from collections import namedtuple
+from multiprocessing import cpu_count
+from typing import Any, Dict, List, Tuple
+
+import click
+
+from photon.demo_util.util import pass_context
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.corpus import SIZE_MIXES
+from photon.demo_util.common.workqueue import QUEUE_POLICIES
+from photon.demo_util.common.magick import auto_magick_threads
+from photon.demo_util.common.bench import (
+    BENCH_VERSION,
+    TOLERANCE,
+    compare,
+    cpu_secs,
+    peak_rss_bytes,
+    process_peak_rss_bytes,
+    write_results,
+)
+
+# defaults - config overrides defaults; commandline options override config
+COUNT: int = 200
+MIX: str = "mixed"
+SEED: int = 0
+WORKER_COUNT: int = 0
+POOL: str = "thread"
+QUEUE_POLICY: str = "fifo"
+CHECK_INTERVAL_SECS: float = 0.2  # polling only: inotify is used if available
+BENCH_TIMEOUT_SECS: int = 3600
+
+# (dotted key, higher is better) compared against a baseline
+CHECKS: List[Tuple[str, bool]] = [
+    ("images_per_sec", True),
+    ("latency.end.p50", False),
+    ("latency.end.p95", False),
+    ("latency.end.p99", False),
+    ("peak_rss_bytes", False),
+]
+
+
+def _use_dirs(ctx: ContextBase, dirp: pathlib.Path) -> None:
+    ctx.DEMO_DIRP = dirp
+    ctx.INCOMING_DIRP = dirp / "incoming"
+    ctx.MODIFIED_DIRP = dirp / "modified"
+    ctx.ORIGINAL_DIRP = dirp / "original"
+    ctx.REJECTED_DIRP = dirp / "rejected"
+
+
+def _run(ctx: ContextBase, fileps: List[pathlib.Path]) -> Dict[str, Any]:
+    from photon.demo_util.common.methods import (
+        update_ctx,
+        start_watchdog,
+        start_workers,
+        start_incoming,
+        handle_results,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp_dirname:
+        _use_dirs(ctx, pathlib.Path(tmp_dirname))
+        update_ctx(ctx, parties=1 + 1)  # Incoming + Results
+        stagingp = ctx.DEMO_DIRP / "staging"  # same filesystem: renames are atomic
+        stagingp.mkdir()
+
+        for filep in fileps:
+            shutil.copyfile(filep, stagingp / filep.name)
+
+        start_watchdog(ctx)  # bkgd thread: block on the earliest deadline
+        start_workers(ctx)  # bkgd threads: each blocks on the workq
+        start_incoming(ctx)  # bkgd thread: block on inotify or time.sleep()
+        handle_results(ctx)  # bkgd thread: block on resultq
+
+        cpu_begin = cpu_secs()
+        begin = time.monotonic()
+
+        for filep in fileps:  # all at once: measure throughput, not arrivals
+            (stagingp / filep.name).rename(ctx.INCOMING_DIRP / filep.name)
+
+        while ctx.metrics.cumulative().count < len(fileps):
+            if ctx.failfast_ev.is_set():
+                raise RuntimeError("a pipeline thread failed")
+
+            if time.monotonic() - begin > BENCH_TIMEOUT_SECS:
+                raise RuntimeError(f"not done in {BENCH_TIMEOUT_SECS} secs")
+
+            time.sleep(0.05)
+
+        secs = time.monotonic() - begin
+
+        peak_rss = peak_rss_bytes()  # the corpus was generated in another process
+
+        if ctx.pool == "process":  # count the children's CPU and RSS
+            peaks = [process_peak_rss_bytes(p) for p in ctx.process_pool.pids()]
+            ctx.process_pool.close()
+
+            if None in peaks:  # not Linux: the peak of any waited-for child
+                peaks = [peak_rss_bytes(children=True)]
+
+            peak_rss = max([peak_rss] + [peak or 0 for peak in peaks])
+
+        cpu_used = cpu_secs() - cpu_begin
+        bytes_out = sum(p.stat().st_size for p in ctx.MODIFIED_DIRP.glob("*.jpg"))
+
+    snapshotnt = ctx.metrics.cumulative()
+    latencyd = {
+        name: histogram.percentiles((50, 95, 99))
+        for name, histogram in snapshotnt.histogramsd.items()
+    }
+
+    return {
+        "version": BENCH_VERSION,
+        "images": snapshotnt.count,
+        "rejects": snapshotnt.rejects,
+        "secs": secs,
+        "images_per_sec": snapshotnt.count / secs,
+        "bytes_in": snapshotnt.size,
+        "bytes_out": bytes_out,
+        "latency": latencyd,
+        "peak_rss_bytes": peak_rss,
+        "cpu_secs": cpu_used,
+        "cpu_utilization": cpu_used / (secs * cpu_count()),
+    }
+
+
+def _doit(ctx: ContextBase) -> bool:
+    from photon.demo_util.common.corpus import corpus_dirp, make_corpus
+
+    corpus_begin = time.monotonic()
+    dirp = corpus_dirp(ctx, ctx.count, ctx.mix, ctx.seed)
+    mp_ctx = multiprocessing.get_context("spawn")  # its peak RSS is not the bench's
+
+    with mp_ctx.Pool(1) as pool:
+        fileps = pool.apply(make_corpus, (dirp, ctx.count, ctx.mix, ctx.seed))
+
+    ctx._logger.info(
+        f"corpus: {len(fileps)} images in {time.monotonic() - corpus_begin:.1f} secs"
+    )
+
+    resultd = _run(ctx, fileps)
+    resultd["options"] = {
+        k: getattr(ctx, k)
+        for k in ("count", "mix", "seed", "worker_count", "pool", "queue_policy")
+    }
+    resultd["cpu_count"] = cpu_count()
+
+    if ctx.baseline:
+        baselined = json.loads(pathlib.Path(ctx.baseline).read_text())
+        resultd["baseline"] = ctx.baseline
+        resultd["regressions"] = compare(resultd, baselined, CHECKS, ctx.tolerance)
+
+    write_results(resultd, pathlib.Path(ctx.output) if ctx.output else None)
+
+    for regression in resultd.get("regressions", []):
+        ctx._logger.error(f"regression: {regression}")
+
+    return not resultd.get("regressions")
+
+
+@click.command("bench", short_help="Benchmark the pipeline end to end.")
+@click.option(
+    "-n",
+    "--count",
+    type=click.IntRange(1, 1000000),
+    help=f"Number of images in the corpus (default {COUNT}, range 1-1000000)",
+)
+@click.option(
+    "--mix",
+    type=click.Choice(sorted(SIZE_MIXES)),
+    help=f"Image size mix of the corpus (default {MIX})",
+)
+@click.option("--seed", type=int, help=f"Seed of the corpus (default {SEED})")
+@click.option(
+    "-w",
+    "--worker-count",
+    type=click.IntRange(0, 127),
+    help=(
+        "Number of workers - 0 means one per cpu "
+        f"(default {WORKER_COUNT}, range 0-127)"
+    ),
+)
+@click.option(
+    "-p",
+    "--pool",
+    type=click.Choice(["thread", "process"]),
+    help=f"Transform files in threads or in processes (default {POOL})",
+)
+@click.option(
+    "--queue-policy",
+    type=click.Choice(QUEUE_POLICIES),
+    help=f"Order of the work queue (default {QUEUE_POLICY})",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the JSON results to this file rather than stdout",
+)
+@click.option(
+    "-b",
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Compare with these saved JSON results and exit 1 on a regression",
+)
+@click.option(
+    "--tolerance",
+    type=click.FloatRange(0.0, 10.0),
+    default=TOLERANCE,
+    help=(
+        "Relative change in throughput, latency or peak RSS treated as noise "
+        f"when comparing (default {TOLERANCE})"
+    ),
+)
+@click.option(
+    "-e",
+    "--execute",
+    is_flag=True,
+    default=False,
+    help="Execute the commands (default False)",
+)
+@pass_context
+def cli(
+    ctx: ContextBase,
+    count: int,
+    mix: str,
+    seed: int,
+    worker_count: int,
+    pool: str,
+    queue_policy: str,
+    output: str,
+    baseline: str,
+    tolerance: float,
+    execute: bool,
+) -> None:
+    """
+    Benchmark Incoming -> Workers -> Results end to end.
+
+    A reproducible synthetic JPEG corpus is generated with Wand - once, then
+    reused from the user cache directory - and run through the pipeline in
+    temporary directories. Prints throughput, latency percentiles, peak RSS
+    and CPU utilization as JSON.
+
+    With --baseline, results are compared with saved ones: a drop in
+    throughput, or a rise in latency or peak RSS, beyond the tolerance is a
+    regression and the command exits 1.
+
+    """
+    logname = pathlib.Path(__file__).stem
+    ctx.util_cmd = logname.replace("cmd_", "")
+    application = f"{ctx.PACKAGE_NAME}.{logname}"
+    ctx._logger = logging.getLogger(application)
+
+    if not count:
+        count = getattr(ctx, "BENCH_COUNT", COUNT)
+
+    if not mix:
+        mix = getattr(ctx, "BENCH_MIX", MIX)
+
+    if seed is None:
+        seed = getattr(ctx, "BENCH_SEED", SEED)
+
+    if not worker_count:
+        worker_count = getattr(ctx, "WORKER_COUNT", WORKER_COUNT)
+
+    worker_count = worker_count or cpu_count()
+
+    if not pool:
+        pool = getattr(ctx, "POOL", POOL)
+
+    if not queue_policy:
+        queue_policy = getattr(ctx, "QUEUE_POLICY", QUEUE_POLICY)
+
+    ctx._logger.info(
+        "Effective Options (commandline overrides config.py):"
+        f"\n  count: {count}"
+        f"\n  mix: {mix}"
+        f"\n  seed: {seed}"
+        f"\n  worker_count: {worker_count}"
+        f"\n  pool: {pool}"
+        f"\n  queue_policy: {queue_policy}"
+        f"\n  output: {output}"
+        f"\n  baseline: {baseline}"
+        f"\n  tolerance: {tolerance}"
+        f"\n  execute: {execute}"
+    )
+
+    from photon.demo_util.common.inotify import inotify_available
+
+    CmdCtx = namedtuple(
+        "CmdCtx",
+        "count mix seed worker_count min_workers max_workers pool queue_depth "
+        "queue_policy timeout archive_mode cache_mb magick_threads "
+        "magick_memory_mb magick_map_mb magick_area_mp check_interval_secs "
+        "incoming_mode instrument metrics_port output baseline tolerance execute",
+    )
+
+    cmdctx = CmdCtx(
+        count,
+        mix,
+        seed,
+        worker_count,
+        worker_count,  # fixed: no Supervisor
+        worker_count,
+        pool,
+        worker_count * 2,
+        queue_policy,
+        600,  # timeout: only a hung Worker should trip it
+        "copy",
+        0,  # no result cache: every image is transformed
+        auto_magick_threads(worker_count),
+        getattr(ctx, "MAGICK_MEMORY_MB", 0),  # config only
+        getattr(ctx, "MAGICK_MAP_MB", 0),
+        getattr(ctx, "MAGICK_AREA_MP", 0),
+        CHECK_INTERVAL_SECS,
+        "inotify" if inotify_available() else "poll",
+        False,
+        0,
+        output,
+        baseline,
+        tolerance,
+        execute,
+    )  # immutable
+
+    for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
+        setattr(ctx, k, v)
+
+    if cmdctx.execute:
+        try:
+            ok = _doit(ctx)
+        except Exception as e:
+            t = traceback.format_exc()
+            ctx._logger.error(f"Exception: {e}\n{t}")
+            sys.exit(1)
+
+        if not ok:
+            sys.exit(1)
+    else:
+        ctx._logger.info(f"{ctx.util_cmd}: Not executed")
@@ -9,20 +9,37 @@ import click
 
 from photon.demo_util.util import pass_context
 from photon.demo_util.common.context_base import ContextBase
-
-from photon.demo_util.common.methods import (
-    update_ctx,
-    start_workers,
-    start_incoming,
-    start_timer,
-    handle_results,
-    failfast,
-)
+from photon.demo_util.common.archive import ARCHIVE_MODES
+from photon.demo_util.common.inotify import inotify_available
+from photon.demo_util.common.magick import auto_magick_threads
+from photon.demo_util.common.pubsub import ADDRESS
+from photon.demo_util.common.workqueue import QUEUE_POLICIES
 
 # defaults - config overrides defaults; commandline options override config
 CHECK_INTERVAL_SECS: int = 5
 CPU_FACTOR: int = 2
 WORKER_COUNT: int = 0
+MIN_WORKERS: int = 0
+MAX_WORKERS: int = 0
+POOL: str = "thread"
+QUEUE_DEPTH: int = 0
+QUEUE_POLICY: str = "fifo"
+ARCHIVE_MODE: str = "copy"
+CACHE_MB: int = 0
+INSTRUMENT: bool = False
+METRICS_PORT: int = 0
+METRICS_HOST: str = "127.0.0.1"
+MAGICK_THREADS: int = 0
+MAGICK_MEMORY_MB: int = 0
+MAGICK_MAP_MB: int = 0
+MAGICK_AREA_MP: int = 0
+INCOMING_MODE: str = "auto"
+WORK_SOURCE: str = "directory"
+PUBSUB_ADDRESS: str = ADDRESS
+ACK_BATCH: int = 50
+MAX_OUTSTANDING: int = 0
+LEDGER: bool = True
+EVENT_LOG: bool = False
 
 
 @click.command("demo", short_help="Transform incoming images.")
@@ -34,6 +51,48 @@ WORKER_COUNT: int = 0
         f"(default {CHECK_INTERVAL_SECS}, range 3-300)"
     ),
 )
+@click.option(
+    "--incoming-mode",
+    type=click.Choice(["auto", "inotify", "poll"]),
+    help=(
+        "Find incoming files by inotify events (Linux) or by polling every "
+        "check-interval-secs; auto uses inotify when available "
+        f"(default {INCOMING_MODE})"
+    ),
+)
+@click.option(
+    "--work-source",
+    type=click.Choice(["directory", "pubsub"]),
+    help=(
+        "Take work from files in the incoming directory, or from messages "
+        "naming them on the Pub/Sub stand-in - see the pubsub command "
+        f"(default {WORK_SOURCE})"
+    ),
+)
+@click.option(
+    "--pubsub-address",
+    help=(
+        "The Pub/Sub stand-in: host:port, or the path of a Unix socket "
+        f"(default {PUBSUB_ADDRESS})"
+    ),
+)
+@click.option(
+    "--ack-batch",
+    type=click.IntRange(1, 10000),
+    help=(
+        "Most Pub/Sub acks per request; a partial batch is sent within a "
+        f"second. 1 acks each message at once (default {ACK_BATCH}, range 1-10000)"
+    ),
+)
+@click.option(
+    "--max-outstanding",
+    type=click.IntRange(0, 100000),
+    help=(
+        "Flow control: most Pub/Sub messages held at once - queued, in work or "
+        "awaiting their ack; 0 means queue-depth + max-workers + ack-batch "
+        f"(default {MAX_OUTSTANDING}, range 0-100000)"
+    ),
+)
 @click.option(
     "-c",
     "--cpu-factor",
@@ -53,6 +112,51 @@ WORKER_COUNT: int = 0
         f'option "cpu-factor" above (default {WORKER_COUNT}, range 0-127)'
     ),
 )
+@click.option(
+    "--min-workers",
+    type=click.IntRange(0, 127),
+    help=(
+        "The Supervisor never shrinks below this many workers; "
+        f"0 means worker-count (default {MIN_WORKERS}, range 0-127)"
+    ),
+)
+@click.option(
+    "--max-workers",
+    type=click.IntRange(0, 127),
+    help=(
+        "The Supervisor never grows beyond this many workers; 0 means "
+        "worker-count, which with min-workers unset disables scaling "
+        f"(default {MAX_WORKERS}, range 0-127)"
+    ),
+)
+@click.option(
+    "-p",
+    "--pool",
+    type=click.Choice(["thread", "process"]),
+    help=(
+        "Transform files in the worker threads or in a pool of max-workers "
+        f"processes (default {POOL})"
+    ),
+)
+@click.option(
+    "-q",
+    "--queue-depth",
+    type=click.IntRange(0, 100000),
+    help=(
+        "Max items on the work and result queues - Incoming pauses while the "
+        "work queue is full; 0 means 2 * worker-count "
+        f"(default {QUEUE_DEPTH}, range 0-100000)"
+    ),
+)
+@click.option(
+    "--queue-policy",
+    type=click.Choice(QUEUE_POLICIES),
+    help=(
+        "Order of the work queue: first in first out, or shortest job first - "
+        "cheapest file by JPEG header size first, with aging so big files are "
+        f"not starved (default {QUEUE_POLICY})"
+    ),
+)
 @click.option(
     "-t",
     "--timeout",
@@ -60,6 +164,97 @@ WORKER_COUNT: int = 0
     default=60,
     help=("Worker timeout in seconds (default 60, range 10-600)"),
 )
+@click.option(
+    "--archive-mode",
+    type=click.Choice(ARCHIVE_MODES),
+    help=(
+        "How originals are saved: copy bytes (reflink/copy_file_range/sendfile), "
+        f"hardlink (copy across filesystems) or reencode (default {ARCHIVE_MODE})"
+    ),
+)
+@click.option(
+    "--cache-mb",
+    type=click.IntRange(0, 1048576),
+    help=(
+        "Size in MB of the result cache that serves re-delivered images "
+        f"without transforming them; 0 disables it (default {CACHE_MB})"
+    ),
+)
+@click.option(
+    "--magick-threads",
+    type=click.IntRange(0, 256),
+    help=(
+        "ImageMagick threads per transform; 0 splits the cpus evenly across "
+        "the workers. If set, the cpu-factor worker-count is divided by it "
+        f"(default {MAGICK_THREADS}, range 0-256)"
+    ),
+)
+@click.option(
+    "--magick-memory-mb",
+    type=click.IntRange(0, 1048576),
+    help=(
+        "ImageMagick pixel cache memory limit in MB per process; "
+        f"0 keeps the ImageMagick default (default {MAGICK_MEMORY_MB})"
+    ),
+)
+@click.option(
+    "--magick-map-mb",
+    type=click.IntRange(0, 1048576),
+    help=(
+        "ImageMagick memory-map limit in MB per process; "
+        f"0 keeps the ImageMagick default (default {MAGICK_MAP_MB})"
+    ),
+)
+@click.option(
+    "--magick-area-mp",
+    type=click.IntRange(0, 1048576),
+    help=(
+        "ImageMagick max in-memory image area in megapixels; "
+        f"0 keeps the ImageMagick default (default {MAGICK_AREA_MP})"
+    ),
+)
+@click.option(
+    "--instrument",
+    is_flag=True,
+    default=False,
+    help=(
+        "Record CPU time and pixels in/out of each transform in the results "
+        f"(default {INSTRUMENT})"
+    ),
+)
+@click.option(
+    "--metrics-port",
+    type=click.IntRange(0, 65535),
+    help=(
+        "Serve Prometheus metrics on this port at /metrics; 0 disables it "
+        f"(default {METRICS_PORT})"
+    ),
+)
+@click.option(
+    "--metrics-host",
+    help=(
+        "Serve metrics on this interface; 0.0.0.0 for all, to be scraped "
+        f"from other hosts (default {METRICS_HOST})"
+    ),
+)
+@click.option(
+    "--ledger/--no-ledger",
+    "use_ledger",
+    default=None,
+    help=(
+        "Record each finished file in the SQLite ledger at LEDGER_FILEP - "
+        f"see the ledger command (default {LEDGER})"
+    ),
+)
+@click.option(
+    "--event-log",
+    is_flag=True,
+    default=False,
+    help=(
+        "Also log the start and finish of each file as JSON lines; always "
+        f"on with --no-ledger (default {EVENT_LOG})"
+    ),
+)
 @click.option(
     "-e",
     "--execute",
@@ -71,9 +266,30 @@ WORKER_COUNT: int = 0
 def cli(
     ctx: ContextBase,
     check_interval_secs: int,
+    incoming_mode: str,
+    work_source: str,
+    pubsub_address: str,
+    ack_batch: int,
+    max_outstanding: int,
     cpu_factor: int,
     worker_count: int,
+    min_workers: int,
+    max_workers: int,
+    pool: str,
+    queue_depth: int,
+    queue_policy: str,
     timeout: int,
+    archive_mode: str,
+    cache_mb: int,
+    magick_threads: int,
+    magick_memory_mb: int,
+    magick_map_mb: int,
+    magick_area_mp: int,
+    instrument: bool,
+    metrics_port: int,
+    metrics_host: str,
+    use_ledger: bool,
+    event_log: bool,
     execute: bool,
 ) -> None:
     """
@@ -88,40 +304,193 @@ def cli(
     if not check_interval_secs:
         check_interval_secs = getattr(ctx, "CHECK_INTERVAL_SECS", CHECK_INTERVAL_SECS)
 
+    if not incoming_mode:
+        incoming_mode = getattr(ctx, "INCOMING_MODE", INCOMING_MODE)
+
+    if incoming_mode == "auto":
+        incoming_mode = "inotify" if inotify_available() else "poll"
+
     if not cpu_factor:
         cpu_factor = getattr(ctx, "CPU_FACTOR", CPU_FACTOR)
 
     if not worker_count:
         worker_count = getattr(ctx, "WORKER_COUNT", WORKER_COUNT)
 
-    # override cpu_factor calc w explicit worker_count
-    worker_count = worker_count or cpu_count() * cpu_factor + 1
+    if not archive_mode:
+        archive_mode = getattr(ctx, "ARCHIVE_MODE", ARCHIVE_MODE)
+
+    if not cache_mb:
+        cache_mb = getattr(ctx, "CACHE_MB", CACHE_MB)
+
+    if not instrument:
+        instrument = getattr(ctx, "INSTRUMENT", INSTRUMENT)
+
+    if not metrics_port:
+        metrics_port = getattr(ctx, "METRICS_PORT", METRICS_PORT)
+
+    if not metrics_host:
+        metrics_host = getattr(ctx, "METRICS_HOST", METRICS_HOST)
+
+    if use_ledger is None:
+        use_ledger = getattr(ctx, "LEDGER", LEDGER)
+
+    ledger_filep = getattr(ctx, "LEDGER_FILEP", ctx.DEMO_DIRP / "ledger.sqlite3")
+
+    if not event_log:
+        event_log = getattr(ctx, "EVENT_LOG", EVENT_LOG)
+
+    event_log = event_log or not use_ledger  # one record or the other
+
+    if not magick_threads:
+        magick_threads = getattr(ctx, "MAGICK_THREADS", MAGICK_THREADS)
+
+    if not magick_memory_mb:
+        magick_memory_mb = getattr(ctx, "MAGICK_MEMORY_MB", MAGICK_MEMORY_MB)
+
+    if not magick_map_mb:
+        magick_map_mb = getattr(ctx, "MAGICK_MAP_MB", MAGICK_MAP_MB)
+
+    if not magick_area_mp:
+        magick_area_mp = getattr(ctx, "MAGICK_AREA_MP", MAGICK_AREA_MP)
+
+    # override cpu_factor calc w explicit worker_count; explicit ImageMagick
+    # threads take their share of the cpus from the cpu_factor calc
+    worker_count = worker_count or (
+        cpu_count() * cpu_factor // max(1, magick_threads) + 1
+    )
+
+    if not min_workers:
+        min_workers = getattr(ctx, "MIN_WORKERS", MIN_WORKERS)
+
+    if not max_workers:
+        max_workers = getattr(ctx, "MAX_WORKERS", MAX_WORKERS)
+
+    # the Supervisor starts worker_count Workers, clamped to min-max
+    min_workers = min_workers or worker_count
+    max_workers = max(max_workers or worker_count, min_workers)
+    worker_count = min(max(worker_count, min_workers), max_workers)
+
+    # auto: split the cpus between workers and ImageMagick threads
+    magick_threads = magick_threads or auto_magick_threads(worker_count)
+
+    if not pool:
+        pool = getattr(ctx, "POOL", POOL)
+
+    if not queue_depth:
+        queue_depth = getattr(ctx, "QUEUE_DEPTH", QUEUE_DEPTH)
+
+    queue_depth = queue_depth or worker_count * 2
+
+    if not queue_policy:
+        queue_policy = getattr(ctx, "QUEUE_POLICY", QUEUE_POLICY)
+
+    if not work_source:
+        work_source = getattr(ctx, "WORK_SOURCE", WORK_SOURCE)
+
+    if not pubsub_address:
+        pubsub_address = getattr(ctx, "PUBSUB_ADDRESS", PUBSUB_ADDRESS)
+
+    if not ack_batch:
+        ack_batch = getattr(ctx, "ACK_BATCH", ACK_BATCH)
+
+    if not max_outstanding:
+        max_outstanding = getattr(ctx, "MAX_OUTSTANDING", MAX_OUTSTANDING)
+
+    # enough to fill the workq and the workers, and a batch awaiting its ack
+    max_outstanding = max_outstanding or queue_depth + max_workers + ack_batch
 
     ctx._logger.info(
         "Effective Options (commandline overrides config.py):"
         f"\n  check_interval_secs: {check_interval_secs}"
+        f"\n  incoming_mode: {incoming_mode}"
+        f"\n  work_source: {work_source}"
+        f"\n  pubsub_address: {pubsub_address}"
+        f"\n  ack_batch: {ack_batch}"
+        f"\n  max_outstanding: {max_outstanding}"
         f"\n  cpu_factor: {cpu_factor}"
         f"\n  worker_count: {worker_count}"
+        f"\n  min_workers: {min_workers}"
+        f"\n  max_workers: {max_workers}"
+        f"\n  pool: {pool}"
+        f"\n  queue_depth: {queue_depth}"
+        f"\n  queue_policy: {queue_policy}"
         f"\n  timeout: {timeout}"
+        f"\n  archive_mode: {archive_mode}"
+        f"\n  cache_mb: {cache_mb}"
+        f"\n  magick_threads: {magick_threads}"
+        f"\n  magick_memory_mb: {magick_memory_mb}"
+        f"\n  magick_map_mb: {magick_map_mb}"
+        f"\n  magick_area_mp: {magick_area_mp}"
+        f"\n  instrument: {instrument}"
+        f"\n  metrics_port: {metrics_port}"
+        f"\n  metrics_host: {metrics_host}"
+        f"\n  use_ledger: {use_ledger}"
+        f"\n  ledger_filep: {ledger_filep}"
+        f"\n  event_log: {event_log}"
         f"\n  execute: {execute}"
     )
 
     CmdCtx = namedtuple(
-        "CmdCtx", "check_interval_secs cpu_factor worker_count timeout execute"
+        "CmdCtx",
+        "check_interval_secs incoming_mode work_source pubsub_address ack_batch "
+        "max_outstanding cpu_factor worker_count min_workers "
+        "max_workers pool queue_depth queue_policy timeout archive_mode cache_mb "
+        "magick_threads magick_memory_mb magick_map_mb magick_area_mp instrument "
+        "metrics_port metrics_host use_ledger ledger_filep event_log execute",
     )
 
     cmdctx = CmdCtx(
-        check_interval_secs, cpu_factor, worker_count, timeout, execute
+        check_interval_secs,
+        incoming_mode,
+        work_source,
+        pubsub_address,
+        ack_batch,
+        max_outstanding,
+        cpu_factor,
+        worker_count,
+        min_workers,
+        max_workers,
+        pool,
+        queue_depth,
+        queue_policy,
+        timeout,
+        archive_mode,
+        cache_mb,
+        magick_threads,
+        magick_memory_mb,
+        magick_map_mb,
+        magick_area_mp,
+        instrument,
+        metrics_port,
+        metrics_host,
+        use_ledger,
+        ledger_filep,
+        event_log,
+        execute,
     )  # immutable
 
     for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
         setattr(ctx, k, v)
 
     if cmdctx.execute:
+        # import here: loads Wand and the plugins only when executing
+        from photon.demo_util.common.methods import (
+            update_ctx,
+            start_watchdog,
+            start_metrics_server,
+            start_supervisor,
+            start_incoming,
+            start_timer,
+            handle_results,
+            failfast,
+        )
+
         try:
             update_ctx(ctx)  # create shared data structures
-            start_workers(ctx)  # bkgd threads: each blocks on the workq
-            start_incoming(ctx)  # periodic bkgd thrd: block on time.sleep()
+            start_watchdog(ctx)  # bkgd thread: block on the earliest deadline
+            start_metrics_server(ctx)  # bkgd thread: block on http requests
+            start_supervisor(ctx)  # bkgd threads: Workers block on the workq
+            start_incoming(ctx)  # bkgd thrd: block on time.sleep() or the stream
             start_timer(ctx)  # bkgd thread: block on timer
             handle_results(ctx)  # bkgd thread: block on resultq
             failfast(ctx)  # main thread
@@ -0,0 +1,217 @@
+import sys
+import json
+import logging
+import pathlib
+import traceback
+from datetime import datetime
+from collections import Counter, namedtuple
+from typing import List, Optional, Tuple
+
+import click
+
+from photon.demo_util.util import pass_context
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.ledger import CompletionNT, query
+from photon.demo_util.common.stats import percentiles
+
+# defaults - config overrides defaults; commandline options override config
+LIMIT: int = 20
+
+
+def _format(completionnt: CompletionNT) -> str:
+    status = "valid" if completionnt.valid else "rejected"
+    status += "; cachehit" if completionnt.cachehit else ""
+
+    return (
+        f"{completionnt.finished.isoformat(timespec='milliseconds')}  "
+        f"{completionnt.filename}  worker: {completionnt.worker}; "
+        f"queued {completionnt.queued_secs:.3f}s; "
+        f"work {completionnt.work_secs:.3f}s; "
+        f"total {completionnt.total_secs:.3f}s; {status}; "
+        f"destdirp: {completionnt.destdirp}; tuuid: {completionnt.tuuid}"
+    )
+
+
+def _summarize(completionnts: List[CompletionNT]) -> str:
+    totald = percentiles(c.total_secs for c in completionnts)
+    workersd = Counter(c.worker for c in completionnts)
+    msg = (
+        f"completions: {len(completionnts)}"
+        f"\n  files: {len({c.filename for c in completionnts})}"
+        f"\n  rejected: {sum(1 for c in completionnts if not c.valid)}"
+        f"\n  cachehits: {sum(1 for c in completionnts if c.cachehit)}"
+        f"\n  total secs p50/p95/p99: {totald['p50']:.3f} / "
+        f"{totald['p95']:.3f} / {totald['p99']:.3f}"
+    )
+
+    if completionnts:
+        msg += (
+            f"\n  first: {completionnts[-1].finished.isoformat()}"
+            f"\n  last: {completionnts[0].finished.isoformat()}"
+        )
+
+    for worker, count in sorted(workersd.items()):
+        msg += f"\n  worker {worker}: {count}"
+
+    return msg
+
+
+def _doit(ctx: ContextBase) -> None:
+    completionnts = query(
+        ctx.ledger_filep,
+        ctx.filenames,
+        ctx.tuuid,
+        ctx.worker,
+        ctx.since,
+        ctx.until,
+        0 if ctx.summary else ctx.limit,
+    )
+
+    if ctx.summary:
+        click.echo(_summarize(completionnts))
+    elif ctx.json:
+        for completionnt in completionnts:
+            completiond = completionnt._asdict()
+            completiond["started"] = completionnt.started.isoformat()
+            completiond["finished"] = completionnt.finished.isoformat()
+            completiond["transforms"] = json.loads(completionnt.transforms)
+            click.echo(json.dumps(completiond))
+    else:
+        for completionnt in completionnts:
+            click.echo(_format(completionnt))
+
+    if ctx.filenames:  # was this file processed?
+        found = {c.filename for c in completionnts}
+
+        for filename in ctx.filenames:
+            if filename not in found:
+                ctx._logger.warning(f"not in the ledger: {filename}")
+
+
+@click.command("ledger", short_help="Query the ledger of completed files.")
+@click.argument("filenames", nargs=-1)
+@click.option("--tuuid", help="Only this unit of work")
+@click.option("--worker", help="Only files finished by this worker")
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    help="Only files finished at or after this local time",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(),
+    help="Only files finished before this local time",
+)
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(0, 100000000),
+    help=f"Most completions listed, newest first; 0 for all (default {LIMIT})",
+)
+@click.option(
+    "--summary",
+    is_flag=True,
+    default=False,
+    help="Print counts and total secs percentiles rather than completions",
+)
+@click.option(
+    "--json",
+    "json_",
+    is_flag=True,
+    default=False,
+    help="Print each completion as a JSON line",
+)
+@click.option(
+    "-l",
+    "--ledger-filep",
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help="The ledger file (default LEDGER_FILEP from config)",
+)
+@click.option(
+    "-e",
+    "--execute",
+    is_flag=True,
+    default=False,
+    help="Execute the commands (default False)",
+)
+@pass_context
+def cli(
+    ctx: ContextBase,
+    filenames: Tuple[str, ...],
+    tuuid: str,
+    worker: str,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    limit: int,
+    summary: bool,
+    json_: bool,
+    ledger_filep: pathlib.Path,
+    execute: bool,
+) -> None:
+    """
+    Query the ledger of files completed by demo.
+
+    Was a file processed, when, by which worker and how long did it take:
+    give FILENAMES - names, not paths - and each completion is listed with
+    its queued, work and total secs, newest first. A file not in the ledger
+    is logged as a warning. Filter by tuuid, worker or finish time, and
+    --summary for counts and percentiles.
+
+    The ledger is indexed by tuuid, file name and finish time, and can be
+    queried while demo runs.
+
+    """
+    logname = pathlib.Path(__file__).stem
+    ctx.util_cmd = logname.replace("cmd_", "")
+    application = f"{ctx.PACKAGE_NAME}.{logname}"
+    ctx._logger = logging.getLogger(application)
+
+    if not ledger_filep:
+        ledger_filep = getattr(ctx, "LEDGER_FILEP", ctx.DEMO_DIRP / "ledger.sqlite3")
+
+    if limit is None:
+        limit = LIMIT
+
+    ctx._logger.info(
+        "Effective Options (commandline overrides config.py):"
+        f"\n  filenames: {filenames}"
+        f"\n  tuuid: {tuuid}"
+        f"\n  worker: {worker}"
+        f"\n  since: {since}"
+        f"\n  until: {until}"
+        f"\n  limit: {limit}"
+        f"\n  summary: {summary}"
+        f"\n  json: {json_}"
+        f"\n  ledger_filep: {ledger_filep}"
+        f"\n  execute: {execute}"
+    )
+
+    CmdCtx = namedtuple(
+        "CmdCtx",
+        "filenames tuuid worker since until limit summary json ledger_filep execute",
+    )
+    cmdctx = CmdCtx(
+        filenames,
+        tuuid,
+        worker,
+        since,
+        until,
+        limit,
+        summary,
+        json_,
+        ledger_filep,
+        execute,
+    )  # immutable
+
+    for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
+        setattr(ctx, k, v)
+
+    if cmdctx.execute:
+        try:
+            _doit(ctx)
+        except Exception as e:
+            t = traceback.format_exc()
+            ctx._logger.error(f"Exception: {e}\n{t}")
+            sys.exit(1)
+    else:
+        ctx._logger.info(f"{ctx.util_cmd}: Not executed")
@@ -0,0 +1,442 @@
+import sys
+import math
+import time
+import shutil
+import logging
+import pathlib
+import itertools
+import traceback
+import urllib.request
+from collections import namedtuple
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import click
+
+from photon.demo_util.util import pass_context
+from photon.demo_util.common.corpus import SIZE_MIXES
+from photon.demo_util.common.context_base import ContextBase
+
+# defaults - config overrides defaults; commandline options override config
+PATTERN: str = "steady"
+RATE: float = 2.0
+DURATION_SECS: int = 600
+WINDOW_SECS: int = 60
+METRICS_PORT: int = 0
+QUEUED_LIMIT_SECS: float = 5.0
+COUNT: int = 100
+MIX: str = "mixed"
+SEED: int = 0
+
+PATTERNS = ["steady", "burst", "diurnal", "step"]
+BURST_FACTOR = 5.0  # burst: rate x this for the first BURST_SHARE of a window
+BURST_SHARE = 0.2  # ... and idle otherwise, so the mean is rate
+DIURNAL_PERIOD_SECS = 3600  # diurnal: a day compressed into an hour
+DIURNAL_SWING = 0.8  # ... between rate x (1 - swing) and rate x (1 + swing)
+STEP_FACTOR = 1.25  # step: rate x this every window
+KEEP_UP = 0.95  # bounded: throughput is at least this share of arrivals
+SCRAPE_TIMEOUT_SECS = 5
+
+
+class WindowNT(NamedTuple):
+    """
+    Arrivals and the demo's metrics over one window.
+
+    """
+
+    secs: float
+    arrival_rate: float
+    throughput: Optional[float]
+    queued_secs: Optional[float]
+    backlog: Optional[int]
+    workq_depth: Optional[int]
+    rss_bytes: Optional[int]
+    bounded: Optional[bool]
+
+
+WindowNT.secs.__doc__ = "float (field 0): Secs since start at the window end."
+WindowNT.arrival_rate.__doc__ = "float (field 1): Files written per sec."
+WindowNT.throughput.__doc__ = "float (field 2): Files finished per sec."
+WindowNT.queued_secs.__doc__ = "float (field 3): Mean queuedtd of finished files."
+WindowNT.backlog.__doc__ = "int (field 4): Files written and not yet finished."
+WindowNT.workq_depth.__doc__ = "int (field 5): Files on the work queue."
+WindowNT.rss_bytes.__doc__ = "int (field 6): Resident memory of the demo and its pool."
+WindowNT.bounded.__doc__ = "bool (field 7): Kept up and queued within limit T/F."
+
+
+def _rate_func(ctx: ContextBase) -> Callable[[float], float]:
+    rate, window_secs = ctx.rate, ctx.window_secs
+
+    if ctx.pattern == "burst":
+        return lambda t: (
+            rate * BURST_FACTOR if t % window_secs < window_secs * BURST_SHARE else 0.0
+        )
+
+    if ctx.pattern == "diurnal":  # starts at the daily low
+        return lambda t: rate * (
+            1 - DIURNAL_SWING * math.cos(2 * math.pi * t / DIURNAL_PERIOD_SECS)
+        )
+
+    if ctx.pattern == "step":
+        return lambda t: rate * STEP_FACTOR ** (t // window_secs)
+
+    return lambda t: rate
+
+
+def _staging_dirp(ctx: ContextBase) -> pathlib.Path:
+    # a sibling of incoming: renames into incoming are atomic on one filesystem
+    stagingp = ctx.INCOMING_DIRP.parent / ".loadgen"
+    stagingp.mkdir(parents=True, exist_ok=True)
+
+    if stagingp.stat().st_dev != ctx.INCOMING_DIRP.stat().st_dev:
+        raise ValueError(f"{stagingp} is not on the filesystem of incoming")
+
+    return stagingp
+
+
+def _scrape(ctx: ContextBase) -> Optional[Dict[str, float]]:
+    from photon.demo_util.common.metrics_http import parse_metrics
+
+    if not ctx.metrics_port:
+        return None
+
+    url = f"http://{ctx.metrics_host}:{ctx.metrics_port}/metrics"
+
+    try:
+        with urllib.request.urlopen(url, timeout=SCRAPE_TIMEOUT_SECS) as response:
+            return parse_metrics(response.read().decode())
+    except OSError as e:
+        ctx._logger.warning(f"scrape {url} failed: {e}")
+        return None
+
+
+def _window(
+    ctx: ContextBase,
+    secs: float,
+    sent: int,
+    total_sent: int,
+    startd: Optional[Dict[str, float]],
+    before: Optional[Dict[str, float]],
+    after: Optional[Dict[str, float]],
+) -> WindowNT:
+    arrival_rate = sent / ctx.window_secs
+
+    if not startd or not before or not after:
+        return WindowNT(secs, arrival_rate, None, None, None, None, None, None)
+
+    images = "photon_demo_images_total"
+    queued_sum = 'photon_demo_latency_seconds_sum{stage="queued"}'
+    queued_count = 'photon_demo_latency_seconds_count{stage="queued"}'
+    # the latency series appear with the first result
+    finished = after.get(queued_count, 0) - before.get(queued_count, 0)
+    throughput = (after[images] - before[images]) / ctx.window_secs
+    queued_secs = (
+        (after[queued_sum] - before.get(queued_sum, 0)) / finished if finished else None
+    )
+    backlog = total_sent - int(after[images] - startd[images])
+    bounded = throughput >= arrival_rate * KEEP_UP and (
+        queued_secs is None or queued_secs <= ctx.queued_limit_secs
+    )
+
+    return WindowNT(
+        secs,
+        arrival_rate,
+        throughput,
+        queued_secs,
+        backlog,
+        int(after["photon_demo_workq_depth"]),
+        int(
+            after["process_resident_memory_bytes"]
+            + after.get("photon_demo_pool_resident_memory_bytes", 0)
+        ),
+        bounded,
+    )
+
+
+def _log_window(ctx: ContextBase, windownt: WindowNT) -> None:
+    msg = f"{windownt.secs:8.0f}s  arrivals {windownt.arrival_rate:7.2f}/s"
+
+    if windownt.bounded is not None:
+        queued = (
+            f"{windownt.queued_secs:7.2f}s"
+            if windownt.queued_secs is not None
+            else "    n/a"
+        )
+        msg += (
+            f"  done {windownt.throughput:7.2f}/s  queued {queued}"
+            f"  backlog {windownt.backlog:6d}  workq {windownt.workq_depth:4d}"
+            f"  rss {windownt.rss_bytes / 2**20:8.1f} MB"
+            f"  {'bounded' if windownt.bounded else 'UNBOUNDED'}"
+        )
+
+    ctx._logger.info(msg)
+
+
+def _report(ctx: ContextBase, windownts: List[WindowNT]) -> Dict[str, Any]:
+    from photon.demo_util.common.stats import slope
+
+    scraped = [w for w in windownts if w.bounded is not None]
+    bounded_rates = [w.arrival_rate for w in scraped if w.bounded]
+    unbounded_rates = [w.arrival_rate for w in scraped if not w.bounded]
+    steady = scraped[1:]  # the first window includes warm-up: startup, caches
+    growth = slope([w.secs for w in steady], [w.rss_bytes for w in steady])
+
+    return {
+        "pattern": ctx.pattern,
+        "rate": ctx.rate,
+        "duration_secs": ctx.duration_secs,
+        "window_secs": ctx.window_secs,
+        "sustained_rate": max(bounded_rates) if bounded_rates else None,
+        "first_unbounded_rate": min(unbounded_rates) if unbounded_rates else None,
+        "peak_throughput": max((w.throughput for w in scraped), default=None),
+        "rss_growth_bytes_per_hour": None if math.isnan(growth) else growth * 3600,
+        "windows": [w._asdict() for w in windownts],
+    }
+
+
+def _stage(stagingp: pathlib.Path, filep: pathlib.Path, name: str) -> pathlib.Path:
+    tmpp = stagingp / f"{name}{filep.suffix}"
+    shutil.copyfile(filep, tmpp)  # staged ahead: the rename is the arrival
+
+    return tmpp
+
+
+def _doit(ctx: ContextBase) -> None:
+    from photon.demo_util.common.corpus import corpus_dirp, make_corpus
+    from photon.demo_util.common.bench import write_results
+
+    dirp = corpus_dirp(ctx, ctx.count, ctx.mix, ctx.seed)
+    fileps = make_corpus(dirp, ctx.count, ctx.mix, ctx.seed)
+    stagingp = _staging_dirp(ctx)
+    rate_func = _rate_func(ctx)
+    prefix = f"loadgen-{int(time.time())}"
+    sources = zip(itertools.count(), itertools.cycle(fileps))
+    windows = math.ceil(ctx.duration_secs / ctx.window_secs)
+    windownts: List[WindowNT] = []
+
+    startd = before = _scrape(ctx)
+    seq, filep = next(sources)
+    tmpp = _stage(stagingp, filep, f"{prefix}-{seq:08d}")
+    sent = total_sent = 0
+    begin = next_at = time.monotonic()
+    window_end = begin + ctx.window_secs
+
+    try:
+        while len(windownts) < windows:
+            now = time.monotonic()
+
+            if now >= window_end:
+                after = _scrape(ctx)
+                windownt = _window(
+                    ctx, window_end - begin, sent, total_sent, startd, before, after
+                )
+                _log_window(ctx, windownt)
+                windownts.append(windownt)
+                before, sent = after, 0
+                window_end += ctx.window_secs
+            elif now >= next_at:
+                tmpp.rename(ctx.INCOMING_DIRP / tmpp.name)
+                sent += 1
+                total_sent += 1
+                rate = rate_func(next_at - begin)
+
+                while rate <= 0:  # idle: look again in a tenth of a sec
+                    next_at += 0.1
+                    rate = rate_func(next_at - begin)
+
+                next_at = max(next_at + 1 / rate, now - 1)  # catch up by <= 1 sec
+                seq, filep = next(sources)
+                tmpp = _stage(stagingp, filep, f"{prefix}-{seq:08d}")
+            else:
+                time.sleep(min(next_at, window_end) - now)
+    finally:
+        tmpp.unlink(missing_ok=True)  # the next file, staged and never sent
+
+    reportd = _report(ctx, windownts)
+    reportd["sent"] = total_sent
+    write_results(reportd, pathlib.Path(ctx.output) if ctx.output else None)
+
+
+@click.command("loadgen", short_help="Generate load on the incoming directory.")
+@click.option(
+    "--pattern",
+    type=click.Choice(PATTERNS),
+    help=(
+        "Arrivals: steady rate, bursts, a compressed daily cycle, or a rate "
+        f"stepped up every window to find capacity (default {PATTERN})"
+    ),
+)
+@click.option(
+    "-r",
+    "--rate",
+    type=click.FloatRange(0.01, 10000.0),
+    help=f"Mean files per sec; the first step for step (default {RATE})",
+)
+@click.option(
+    "-d",
+    "--duration-secs",
+    type=click.IntRange(1, 30 * 24 * 3600),
+    help=f"Secs to run - hours for a soak (default {DURATION_SECS})",
+)
+@click.option(
+    "-w",
+    "--window-secs",
+    type=click.IntRange(5, 24 * 3600),
+    help=f"Secs per report window and per step (default {WINDOW_SECS})",
+)
+@click.option(
+    "--metrics-port",
+    type=click.IntRange(0, 65535),
+    help=(
+        "Port of the demo's metrics; 0 only generates files, without a "
+        f"report (default {METRICS_PORT})"
+    ),
+)
+@click.option(
+    "--metrics-host",
+    default="localhost",
+    help="Host of the demo's metrics (default localhost)",
+)
+@click.option(
+    "--queued-limit-secs",
+    type=click.FloatRange(0.0, 3600.0),
+    help=(
+        "Mean queued secs above which a window is unbounded "
+        f"(default {QUEUED_LIMIT_SECS})"
+    ),
+)
+@click.option(
+    "-n",
+    "--count",
+    type=click.IntRange(1, 1000000),
+    help=f"Number of distinct source images, reused in turn (default {COUNT})",
+)
+@click.option(
+    "--mix",
+    type=click.Choice(sorted(SIZE_MIXES)),
+    help=f"Image size mix of the source images (default {MIX})",
+)
+@click.option("--seed", type=int, help=f"Seed of the source images (default {SEED})")
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the JSON report to this file rather than stdout",
+)
+@click.option(
+    "-e",
+    "--execute",
+    is_flag=True,
+    default=False,
+    help="Execute the commands (default False)",
+)
+@pass_context
+def cli(
+    ctx: ContextBase,
+    pattern: str,
+    rate: float,
+    duration_secs: int,
+    window_secs: int,
+    metrics_port: int,
+    metrics_host: str,
+    queued_limit_secs: float,
+    count: int,
+    mix: str,
+    seed: int,
+    output: str,
+    execute: bool,
+) -> None:
+    """
+    Write files into the incoming directory of a running demo.
+
+    Files are copied from a synthetic corpus into a staging directory next
+    to incoming, then renamed into it, so Incoming never sees a partial JPEG.
+
+    Run `util demo --metrics-port PORT -e` and point --metrics-port here:
+    each window logs the arrival rate against the demo's throughput, mean
+    queued secs, backlog, work queue depth and RSS. The JSON report gives the
+    sustained rate - the highest arrival rate of a window that kept up with
+    queued secs within the limit - and the RSS growth per hour, for soaks.
+    RSS includes the children of a --pool process demo, where ImageMagick
+    runs.
+
+    """
+    logname = pathlib.Path(__file__).stem
+    ctx.util_cmd = logname.replace("cmd_", "")
+    application = f"{ctx.PACKAGE_NAME}.{logname}"
+    ctx._logger = logging.getLogger(application)
+
+    if not pattern:
+        pattern = getattr(ctx, "LOADGEN_PATTERN", PATTERN)
+
+    if not rate:
+        rate = getattr(ctx, "LOADGEN_RATE", RATE)
+
+    if not duration_secs:
+        duration_secs = getattr(ctx, "LOADGEN_DURATION_SECS", DURATION_SECS)
+
+    if not window_secs:
+        window_secs = getattr(ctx, "LOADGEN_WINDOW_SECS", WINDOW_SECS)
+
+    if not metrics_port:
+        metrics_port = getattr(ctx, "METRICS_PORT", METRICS_PORT)
+
+    if queued_limit_secs is None:
+        queued_limit_secs = getattr(ctx, "LOADGEN_QUEUED_LIMIT_SECS", QUEUED_LIMIT_SECS)
+
+    if not count:
+        count = getattr(ctx, "LOADGEN_COUNT", COUNT)
+
+    if not mix:
+        mix = getattr(ctx, "LOADGEN_MIX", MIX)
+
+    if seed is None:
+        seed = SEED
+
+    ctx._logger.info(
+        "Effective Options (commandline overrides config.py):"
+        f"\n  pattern: {pattern}"
+        f"\n  rate: {rate}"
+        f"\n  duration_secs: {duration_secs}"
+        f"\n  window_secs: {window_secs}"
+        f"\n  metrics_port: {metrics_port}"
+        f"\n  metrics_host: {metrics_host}"
+        f"\n  queued_limit_secs: {queued_limit_secs}"
+        f"\n  count: {count}"
+        f"\n  mix: {mix}"
+        f"\n  seed: {seed}"
+        f"\n  output: {output}"
+        f"\n  execute: {execute}"
+    )
+
+    CmdCtx = namedtuple(
+        "CmdCtx",
+        "pattern rate duration_secs window_secs metrics_port metrics_host "
+        "queued_limit_secs count mix seed output execute",
+    )
+    cmdctx = CmdCtx(
+        pattern,
+        rate,
+        duration_secs,
+        window_secs,
+        metrics_port,
+        metrics_host,
+        queued_limit_secs,
+        count,
+        mix,
+        seed,
+        output,
+        execute,
+    )  # immutable
+
+    for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
+        setattr(ctx, k, v)
+
+    if cmdctx.execute:
+        try:
+            _doit(ctx)
+        except Exception as e:
+            t = traceback.format_exc()
+            ctx._logger.error(f"Exception: {e}\n{t}")
+            sys.exit(1)
+    else:
+        ctx._logger.info(f"{ctx.util_cmd}: Not executed")
@@ -0,0 +1,321 @@
+import sys
+import math
+import time
+import logging
+import pathlib
+import tempfile
+import statistics
+import traceback
+import multiprocessing
+from types import SimpleNamespace
+from collections import namedtuple
+from multiprocessing import cpu_count
+from typing import cast, Any, Dict, List, NamedTuple, Optional
+
+import click
+
+from photon.demo_util.util import pass_context
+from photon.demo_util.common.stats import loglog_slope
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.bench import BENCH_VERSION, write_results
+
+# defaults - config overrides defaults; commandline options override config
+MEGAPIXELS: List[float] = [0.25, 1.0, 4.0, 16.0]
+REPEAT: int = 3
+SEED: int = 0
+ASPECT = 4 / 3  # width / height, as from most cameras
+
+
+class MeasureNT(NamedTuple):
+    """
+    One plugin at one image size and ImageMagick thread count.
+
+    """
+
+    plugin: str
+    megapixels: float
+    threads: int
+    pixels: int
+    secs: float
+    cpu_secs: float
+    base_rss_bytes: int
+    peak_rss_bytes: int
+
+
+MeasureNT.plugin.__doc__ = "str (field 0): Plugin name."
+MeasureNT.megapixels.__doc__ = "float (field 1): Requested image size."
+MeasureNT.threads.__doc__ = "int (field 2): ImageMagick thread limit."
+MeasureNT.pixels.__doc__ = "int (field 3): Input pixels."
+MeasureNT.secs.__doc__ = "float (field 4): Median secs per run."
+MeasureNT.cpu_secs.__doc__ = "float (field 5): Median process CPU secs per run."
+MeasureNT.base_rss_bytes.__doc__ = "int (field 6): Peak RSS before the first run."
+MeasureNT.peak_rss_bytes.__doc__ = "int (field 7): Peak RSS after the last run."
+
+
+def _measure_in_child(
+    settingsd: Dict[str, Any], name: str, megapixels: float, repeat: int, seed: int
+) -> MeasureNT:
+    # a fresh process per measurement: its peak RSS is this measurement's alone
+    from photon.demo_util.common.bench import peak_rss_bytes
+    from photon.demo_util.common.corpus import make_image
+    from photon.demo_util.common.magick import configure_magick
+    from photon.demo_util.common.transforms import get_transforms
+
+    childctx = cast(ContextBase, SimpleNamespace(**settingsd))
+    configure_magick(childctx)
+    transforms = get_transforms(childctx)
+    height = max(1, round(math.sqrt(megapixels * 1e6 / ASPECT)))
+    width = max(1, round(height * ASPECT))
+    secs = []
+    cpu_secs = []
+
+    with tempfile.TemporaryDirectory(prefix="microbench-") as tmp_dirname:
+        filename = str(pathlib.Path(tmp_dirname) / "microbench.jpg")
+
+        with make_image(width, height, seed) as srcimg:
+            base_rss = peak_rss_bytes()
+
+            for run in range(repeat + 1):  # run 0 warms up caches and OpenMP
+                img = srcimg.clone()
+                begin, cpu_begin = time.perf_counter(), time.process_time()
+
+                try:
+                    img = transforms.run_stage(name, img, filename)
+                finally:
+                    img.close()
+
+                if run:
+                    secs.append(time.perf_counter() - begin)
+                    cpu_secs.append(time.process_time() - cpu_begin)
+
+    return MeasureNT(
+        name,
+        megapixels,
+        childctx.magick_threads,
+        width * height,
+        statistics.median(secs),
+        statistics.median(cpu_secs),
+        base_rss,
+        peak_rss_bytes(),
+    )
+
+
+def _measure(ctx: ContextBase, name: str, megapixels: float, threads: int) -> MeasureNT:
+    settingsd = {k: v for k, v in vars(ctx).items() if k.isupper()}
+    settingsd.update(
+        instrument=False,
+        magick_threads=threads,
+        magick_memory_mb=getattr(ctx, "MAGICK_MEMORY_MB", 0),
+        magick_map_mb=getattr(ctx, "MAGICK_MAP_MB", 0),
+        magick_area_mp=getattr(ctx, "MAGICK_AREA_MP", 0),
+    )
+
+    mp_ctx = multiprocessing.get_context("spawn")  # no state from the parent
+
+    with mp_ctx.Pool(1) as pool:
+        return cast(
+            MeasureNT,
+            pool.apply(
+                _measure_in_child,
+                (settingsd, name, megapixels, ctx.repeat, ctx.seed),
+            ),
+        )
+
+
+def _nan_to_none(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def _summarize(name: str, measures: List[MeasureNT]) -> Dict[str, Any]:
+    by_threadsd: Dict[int, List[MeasureNT]] = {}
+
+    for measure in measures:
+        by_threadsd.setdefault(measure.threads, []).append(measure)
+
+    slopesd = {
+        threads: loglog_slope([m.pixels for m in ms], [m.secs for m in ms])
+        for threads, ms in by_threadsd.items()
+    }
+    fewest = min(by_threadsd)
+    speedupsd = {  # at the largest size, against the fewest threads
+        threads: by_threadsd[fewest][-1].secs / ms[-1].secs
+        for threads, ms in by_threadsd.items()
+    }
+
+    click.echo(f"{name}:")
+    click.echo(
+        f"  {'MP':>7} {'threads':>7} {'ms':>10} {'ns/pixel':>10} "
+        f"{'cpu/wall':>8} {'peak MB':>8} {'+MB':>7}"
+    )
+
+    for m in measures:
+        click.echo(
+            f"  {m.megapixels:7.2f} {m.threads:7d} {m.secs * 1000:10.1f} "
+            f"{m.secs * 1e9 / m.pixels:10.2f} {m.cpu_secs / m.secs:8.2f} "
+            f"{m.peak_rss_bytes / 2**20:8.1f} "
+            f"{(m.peak_rss_bytes - m.base_rss_bytes) / 2**20:7.1f}"
+        )
+
+    for threads in sorted(by_threadsd):
+        click.echo(
+            f"  {threads} threads: time ~ pixels^{slopesd[threads]:.2f}, "
+            f"speedup {speedupsd[threads]:.2f}x at the largest size"
+        )
+
+    return {
+        "measures": [
+            dict(m._asdict(), ns_per_pixel=m.secs * 1e9 / m.pixels) for m in measures
+        ],
+        "slope": {str(t): _nan_to_none(s) for t, s in slopesd.items()},
+        "speedup": {str(t): s for t, s in speedupsd.items()},
+    }
+
+
+def _doit(ctx: ContextBase) -> None:
+    from photon.demo_util.common.transforms import get_transforms
+
+    names = get_transforms(ctx).stage_names()  # every registered plugin
+    names = [name for name in names if not ctx.plugin or name in ctx.plugin]
+    unknown = sorted(set(ctx.plugin) - set(names))
+
+    if unknown:
+        raise ValueError(f"no such plugins: {unknown}")
+
+    resultd: Dict[str, Any] = {
+        "version": BENCH_VERSION,
+        "cpu_count": cpu_count(),
+        "repeat": ctx.repeat,
+        "seed": ctx.seed,
+        "plugins": {},
+    }
+
+    for name in names:
+        measures = [
+            _measure(ctx, name, megapixels, threads)
+            for threads in ctx.threads
+            for megapixels in ctx.megapixels
+        ]
+        resultd["plugins"][name] = _summarize(name, measures)
+
+    if ctx.output:
+        write_results(resultd, pathlib.Path(ctx.output))
+
+
+@click.command("microbench", short_help="Benchmark each transform plugin alone.")
+@click.option(
+    "-m",
+    "--megapixels",
+    type=click.FloatRange(0.01, 400.0),
+    multiple=True,
+    help=(
+        "Image size to run each plugin on - repeat for a ladder "
+        f"(default {' '.join(f'{mp:g}' for mp in MEGAPIXELS)})"
+    ),
+)
+@click.option(
+    "-t",
+    "--threads",
+    type=click.IntRange(1, 256),
+    multiple=True,
+    help="ImageMagick thread limit - repeat to compare (default 1 and cpu count)",
+)
+@click.option(
+    "--plugin",
+    multiple=True,
+    help="Plugin name to benchmark - repeat for several (default all)",
+)
+@click.option(
+    "-r",
+    "--repeat",
+    type=click.IntRange(1, 1000),
+    help=f"Timed runs per measurement, the median is kept (default {REPEAT})",
+)
+@click.option("--seed", type=int, help=f"Seed of the images (default {SEED})")
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also write the results as JSON to this file",
+)
+@click.option(
+    "-e",
+    "--execute",
+    is_flag=True,
+    default=False,
+    help="Execute the commands (default False)",
+)
+@pass_context
+def cli(
+    ctx: ContextBase,
+    megapixels: List[float],
+    threads: List[int],
+    plugin: List[str],
+    repeat: int,
+    seed: int,
+    output: str,
+    execute: bool,
+) -> None:
+    """
+    Benchmark each transform plugin alone across image sizes and threads.
+
+    Every plugin registered with TransformsDemo - including any dropped into
+    the plugins package - runs in isolation on synthetic images over a ladder
+    of sizes and ImageMagick thread limits. Each measurement runs in a fresh
+    process, so its peak RSS is its own.
+
+    Prints ns/pixel, CPU/wall time, peak RSS and its growth over the input
+    image, and per thread limit the log-log slope of time against pixels -
+    1.0 is linear, above 1.0 superlinear - and the speedup over the fewest
+    threads.
+
+    """
+    logname = pathlib.Path(__file__).stem
+    ctx.util_cmd = logname.replace("cmd_", "")
+    application = f"{ctx.PACKAGE_NAME}.{logname}"
+    ctx._logger = logging.getLogger(application)
+
+    if not megapixels:
+        megapixels = getattr(ctx, "MICROBENCH_MEGAPIXELS", MEGAPIXELS)
+
+    if not threads:
+        threads = getattr(ctx, "MICROBENCH_THREADS", [1, cpu_count()])
+
+    if not repeat:
+        repeat = getattr(ctx, "MICROBENCH_REPEAT", REPEAT)
+
+    if seed is None:
+        seed = SEED
+
+    megapixels = sorted(set(megapixels))
+    threads = sorted(set(threads))
+
+    ctx._logger.info(
+        "Effective Options (commandline overrides config.py):"
+        f"\n  megapixels: {megapixels}"
+        f"\n  threads: {threads}"
+        f"\n  plugin: {list(plugin)}"
+        f"\n  repeat: {repeat}"
+        f"\n  seed: {seed}"
+        f"\n  output: {output}"
+        f"\n  execute: {execute}"
+    )
+
+    CmdCtx = namedtuple(
+        "CmdCtx", "megapixels threads plugin repeat seed output instrument execute"
+    )
+    cmdctx = CmdCtx(
+        megapixels, threads, list(plugin), repeat, seed, output, False, execute
+    )  # immutable
+
+    for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
+        setattr(ctx, k, v)
+
+    if cmdctx.execute:
+        try:
+            _doit(ctx)
+        except Exception as e:
+            t = traceback.format_exc()
+            ctx._logger.error(f"Exception: {e}\n{t}")
+            sys.exit(1)
+    else:
+        ctx._logger.info(f"{ctx.util_cmd}: Not executed")
@@ -0,0 +1,117 @@
+import sys
+import json
+import logging
+import pathlib
+import traceback
+from collections import namedtuple
+
+import click
+
+from photon.demo_util.util import pass_context
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.pubsub import ADDRESS
+
+# defaults - config overrides defaults; commandline options override config
+PUBSUB_ADDRESS: str = ADDRESS
+PUBLISH_BATCH = 1000  # messages per publish request
+
+
+def _doit(ctx: ContextBase) -> None:
+    from photon.demo_util.common.pubsub import PubSubClient
+
+    client = PubSubClient(ctx.address)
+
+    try:
+        if ctx.stats:
+            click.echo(json.dumps(client.stats(), indent=2))
+            return
+
+        fileps = sorted(p.resolve() for p in ctx.dirp.iterdir() if p.is_file())
+        published = 0
+
+        for i in range(0, len(fileps), PUBLISH_BATCH):
+            datas = [{"filep": str(p)} for p in fileps[i : i + PUBLISH_BATCH]]
+            published += len(client.publish(datas))
+
+        ctx._logger.info(f"published {published} messages from {ctx.dirp}")
+    finally:
+        client.close()
+
+
+@click.command("publish", short_help="Publish files to the Pub/Sub stand-in.")
+@click.argument(
+    "dirp",
+    required=False,
+    type=click.Path(exists=True, file_okay=False, path_type=pathlib.Path),
+)
+@click.option(
+    "-a",
+    "--address",
+    help=(
+        "The Pub/Sub stand-in: host:port, or the path of a Unix socket "
+        f"(default {PUBSUB_ADDRESS})"
+    ),
+)
+@click.option(
+    "--stats",
+    is_flag=True,
+    default=False,
+    help="Print the subscription counters as JSON rather than publish",
+)
+@click.option(
+    "-e",
+    "--execute",
+    is_flag=True,
+    default=False,
+    help="Execute the commands (default False)",
+)
+@pass_context
+def cli(
+    ctx: ContextBase,
+    dirp: pathlib.Path,
+    address: str,
+    stats: bool,
+    execute: bool,
+) -> None:
+    """
+    Publish a message naming each file in DIRP (default incoming).
+
+    A message is {"filep": absolute path}, as a storage notification would
+    name an upload. With `util demo --work-source pubsub -e` running, the
+    demo transforms the files and acks the messages.
+
+    """
+    logname = pathlib.Path(__file__).stem
+    ctx.util_cmd = logname.replace("cmd_", "")
+    application = f"{ctx.PACKAGE_NAME}.{logname}"
+    ctx._logger = logging.getLogger(application)
+
+    if not dirp:
+        dirp = ctx.INCOMING_DIRP
+
+    if not address:
+        address = getattr(ctx, "PUBSUB_ADDRESS", PUBSUB_ADDRESS)
+
+    ctx._logger.info(
+        "Effective Options (commandline overrides config.py):"
+        f"\n  dirp: {dirp}"
+        f"\n  address: {address}"
+        f"\n  stats: {stats}"
+        f"\n  execute: {execute}"
+    )
+
+    CmdCtx = namedtuple("CmdCtx", "dirp address stats execute")
+    cmdctx = CmdCtx(dirp, address, stats, execute)  # immutable
+
+    for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
+        setattr(ctx, k, v)
+
+    if cmdctx.execute:
+        try:
+            _doit(ctx)
+        except Exception as e:
+            t = traceback.format_exc()
+            ctx._logger.error(f"Exception: {e}\n{t}")
+            sys.exit(1)
+    else:
+        ctx._logger.info(f"{ctx.util_cmd}: Not executed")
@@ -0,0 +1,97 @@
+import sys
+import logging
+import pathlib
+import traceback
+from collections import namedtuple
+
+import click
+
+from photon.demo_util.util import pass_context
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.pubsub import ADDRESS
+
+# defaults - config overrides defaults; commandline options override config
+PUBSUB_ADDRESS: str = ADDRESS
+ACK_DEADLINE_SECS: int = 10
+
+
+@click.command("pubsub", short_help="Serve a local Pub/Sub stand-in.")
+@click.option(
+    "-a",
+    "--address",
+    help=(
+        "Listen on host:port, or on a Unix socket at a path "
+        f"(default {PUBSUB_ADDRESS})"
+    ),
+)
+@click.option(
+    "--ack-deadline-secs",
+    type=click.IntRange(1, 600),
+    help=(
+        "Secs a delivered message is leased before it is redelivered, unless "
+        f"acked or extended (default {ACK_DEADLINE_SECS}, range 1-600)"
+    ),
+)
+@click.option(
+    "-e",
+    "--execute",
+    is_flag=True,
+    default=False,
+    help="Execute the commands (default False)",
+)
+@pass_context
+def cli(
+    ctx: ContextBase,
+    address: str,
+    ack_deadline_secs: int,
+    execute: bool,
+) -> None:
+    """
+    Serve a local stand-in for a Pub/Sub subscription.
+
+    One subscription with leases, ack deadlines and redelivery, and streaming
+    pull with flow control. Publish files with `util publish DIR -e`, and
+    take them with `util demo --work-source pubsub -e`. The counters are
+    logged every ten secs: compare ack_requests with acked to see the effect
+    of the demo's --ack-batch.
+
+    """
+    logname = pathlib.Path(__file__).stem
+    ctx.util_cmd = logname.replace("cmd_", "")
+    application = f"{ctx.PACKAGE_NAME}.{logname}"
+    ctx._logger = logging.getLogger(application)
+
+    if not address:
+        address = getattr(ctx, "PUBSUB_ADDRESS", PUBSUB_ADDRESS)
+
+    if not ack_deadline_secs:
+        ack_deadline_secs = getattr(ctx, "ACK_DEADLINE_SECS", ACK_DEADLINE_SECS)
+
+    ctx._logger.info(
+        "Effective Options (commandline overrides config.py):"
+        f"\n  address: {address}"
+        f"\n  ack_deadline_secs: {ack_deadline_secs}"
+        f"\n  execute: {execute}"
+    )
+
+    CmdCtx = namedtuple("CmdCtx", "address ack_deadline_secs execute")
+    cmdctx = CmdCtx(address, ack_deadline_secs, execute)  # immutable
+
+    for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
+        setattr(ctx, k, v)
+
+    if cmdctx.execute:
+        from photon.demo_util.common.pubsub_server import PubSubServerDemo
+
+        try:
+            server = PubSubServerDemo(ctx._logger, address, ack_deadline_secs)
+            server.start()  # bkgd thread: block on connections
+            server.log_stats()  # main thread
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            t = traceback.format_exc()
+            ctx._logger.error(f"Exception: {e}\n{t}")
+            sys.exit(1)
+    else:
+        ctx._logger.info(f"{ctx.util_cmd}: Not executed")
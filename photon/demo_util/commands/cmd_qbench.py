@@ -0,0 +1,240 @@
+import sys
+import heapq
+import random
+import logging
+import pathlib
+import traceback
+from queue import Queue
+from collections import namedtuple
+from typing import List, NamedTuple, Tuple
+
+import click
+
+from photon.demo_util.util import pass_context
+from photon.demo_util.common.stats import percentiles
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.workqueue import (
+    AGING_SECS_PER_COST,
+    QUEUE_POLICIES,
+    PriorityWorkQueue,
+)
+
+# defaults - config overrides defaults; commandline options override config
+COUNT: int = 20000
+WORKER_COUNT: int = 4
+UTILIZATION: float = 0.8
+SEED: int = 0
+
+SECS_PER_COST = 0.05  # transform secs per megapixel
+SECS_FIXED = 0.01  # archive, move and per-file overhead
+ESTIMATE_SIGMA = 0.3  # actual / estimated cost is lognormal(0, sigma)
+
+# (share of files, min megapixels, max megapixels)
+WORKLOAD = [(0.90, 0.2, 2.0), (0.09, 12.0, 24.0), (0.01, 80.0, 100.0)]
+
+
+class JobNT(NamedTuple):
+    """
+    A simulated file.
+
+    """
+
+    arrival: float
+    cost: float
+    secs: float
+
+
+JobNT.arrival.__doc__ = "float (field 0): Simulated arrival time in secs."
+JobNT.cost.__doc__ = "float (field 1): Estimated cost in megapixels."
+JobNT.secs.__doc__ = "float (field 2): Simulated transform secs."
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _jobs(count: int, worker_count: int, utilization: float, seed: int) -> List[JobNT]:
+    rng = random.Random(seed)
+    shares = [share for share, _, _ in WORKLOAD]
+    costs = []
+
+    for _ in range(count):
+        _, low, high = rng.choices(WORKLOAD, weights=shares)[0]
+        costs.append(rng.uniform(low, high))
+
+    secs = [
+        SECS_FIXED + cost * SECS_PER_COST * rng.lognormvariate(0, ESTIMATE_SIGMA)
+        for cost in costs
+    ]
+    rate = utilization * worker_count / (sum(secs) / count)  # Poisson arrivals
+    arrival = 0.0
+    jobs = []
+
+    for cost, job_secs in zip(costs, secs):
+        arrival += rng.expovariate(rate)
+        jobs.append(JobNT(arrival, cost, job_secs))
+
+    return jobs
+
+
+def _simulate(
+    policy: str, jobs: List[JobNT], worker_count: int, aging_secs_per_cost: float
+) -> List[Tuple[JobNT, float]]:
+    # discrete events: an arrival, or a Worker finishing; the real queue classes
+    # order the work, with the simulated clock driving PriorityWorkQueue aging
+    clock = _Clock()
+    workq: Queue = (
+        PriorityWorkQueue(aging_secs_per_cost=aging_secs_per_cost, clock=clock)
+        if policy == "sjf"
+        else Queue()
+    )
+    finishing: List[float] = []  # heap of Worker finish times
+    latencies: List[Tuple[JobNT, float]] = []
+    idle = worker_count
+    index = 0
+
+    while index < len(jobs) or finishing:
+        next_arrival = jobs[index].arrival if index < len(jobs) else float("inf")
+
+        if finishing and finishing[0] < next_arrival:
+            clock.now = heapq.heappop(finishing)
+            idle += 1
+        else:
+            clock.now = next_arrival
+            workq.put(jobs[index])
+            index += 1
+
+        while idle and not workq.empty():
+            job = workq.get_nowait()
+            idle -= 1
+            heapq.heappush(finishing, clock.now + job.secs)
+            latencies.append((job, clock.now + job.secs - job.arrival))
+
+    return latencies
+
+
+def _report(policy: str, latencies: List[Tuple[JobNT, float]]) -> str:
+    big = WORKLOAD[-1][1]
+    alld = percentiles((secs for _, secs in latencies), (50, 95, 99))
+    bigd = percentiles((secs for job, secs in latencies if job.cost >= big), (50, 99))
+
+    return (
+        f"  {policy:>4}: p50 {alld['p50']:8.3f}  p95 {alld['p95']:8.3f}  "
+        f"p99 {alld['p99']:8.3f}  max {max(secs for _, secs in latencies):8.3f}  |  "
+        f"largest files p50 {bigd['p50']:8.3f}  p99 {bigd['p99']:8.3f}"
+    )
+
+
+@click.command("qbench", short_help="Compare work queue policies by simulation.")
+@click.option(
+    "-n",
+    "--count",
+    type=click.IntRange(100, 10000000),
+    help=f"Number of simulated files (default {COUNT}, range 100-10000000)",
+)
+@click.option(
+    "-w",
+    "--worker-count",
+    type=click.IntRange(1, 127),
+    help=f"Number of simulated workers (default {WORKER_COUNT}, range 1-127)",
+)
+@click.option(
+    "-u",
+    "--utilization",
+    type=click.FloatRange(0.05, 0.99),
+    help=(
+        "Mean fraction of worker time busy - sets the arrival rate "
+        f"(default {UTILIZATION}, range 0.05-0.99)"
+    ),
+)
+@click.option(
+    "--aging-secs-per-cost",
+    type=click.FloatRange(0.0, 3600.0),
+    default=AGING_SECS_PER_COST,
+    help=(
+        "SJF head start in secs per megapixel given to cheaper files "
+        f"(default {AGING_SECS_PER_COST})"
+    ),
+)
+@click.option("--seed", type=int, help=f"Random seed (default {SEED})")
+@click.option(
+    "-e",
+    "--execute",
+    is_flag=True,
+    default=False,
+    help="Execute the commands (default False)",
+)
+@pass_context
+def cli(
+    ctx: ContextBase,
+    count: int,
+    worker_count: int,
+    utilization: float,
+    aging_secs_per_cost: float,
+    seed: int,
+    execute: bool,
+) -> None:
+    """
+    Compare FIFO and shortest-job-first work queues by simulation.
+
+    Files of mostly small, some large and a few panorama sizes arrive at
+    random; a discrete-event simulation runs them through the real work queue
+    classes and prints end-to-end latency percentiles in secs for each policy,
+    for all files and for the largest ones, which SJF delays.
+
+    """
+    logname = pathlib.Path(__file__).stem
+    ctx.util_cmd = logname.replace("cmd_", "")
+    application = f"{ctx.PACKAGE_NAME}.{logname}"
+    ctx._logger = logging.getLogger(application)
+
+    if not count:
+        count = getattr(ctx, "QBENCH_COUNT", COUNT)
+
+    if not worker_count:
+        worker_count = getattr(ctx, "WORKER_COUNT", WORKER_COUNT)
+
+    if not utilization:
+        utilization = getattr(ctx, "QBENCH_UTILIZATION", UTILIZATION)
+
+    if seed is None:
+        seed = SEED
+
+    ctx._logger.info(
+        "Effective Options (commandline overrides config.py):"
+        f"\n  count: {count}"
+        f"\n  worker_count: {worker_count}"
+        f"\n  utilization: {utilization}"
+        f"\n  aging_secs_per_cost: {aging_secs_per_cost}"
+        f"\n  seed: {seed}"
+        f"\n  execute: {execute}"
+    )
+
+    CmdCtx = namedtuple(
+        "CmdCtx", "count worker_count utilization aging_secs_per_cost seed execute"
+    )
+    cmdctx = CmdCtx(
+        count, worker_count, utilization, aging_secs_per_cost, seed, execute
+    )  # immutable
+
+    for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
+        setattr(ctx, k, v)
+
+    if cmdctx.execute:
+        try:
+            jobs = _jobs(count, worker_count, utilization, seed)
+            click.echo(f"latency secs, {count} files, {worker_count} workers:")
+
+            for policy in QUEUE_POLICIES:
+                latencies = _simulate(policy, jobs, worker_count, aging_secs_per_cost)
+                click.echo(_report(policy, latencies))
+        except Exception as e:
+            t = traceback.format_exc()
+            ctx._logger.error(f"Exception: {e}\n{t}")
+            sys.exit(1)
+    else:
+        ctx._logger.info(f"{ctx.util_cmd}: Not executed")
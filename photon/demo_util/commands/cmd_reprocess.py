@@ -0,0 +1,105 @@
+import sys
+import logging
+import pathlib
+import traceback
+from collections import namedtuple
+from multiprocessing import cpu_count
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from photon.demo_util.util import pass_context
+from photon.demo_util.common.context_base import ContextBase
+
+# defaults - config overrides defaults; commandline options override config
+WORKER_COUNT: int = 0
+
+
+def _doit(ctx: ContextBase) -> None:
+    # import here: loads Wand and the plugins only when executing
+    from photon.demo_util.common.stages import StageCacheDemo
+    from photon.demo_util.common.transforms import get_transforms
+
+    stages = StageCacheDemo(ctx, get_transforms(ctx))
+    ctx.MODIFIED_DIRP.mkdir(parents=True, exist_ok=True)
+
+    originals = sorted(
+        filep
+        for filep in ctx.ORIGINAL_DIRP.iterdir()
+        if filep.is_file() and filep.suffix.upper() in ctx.VALID_EXTENSIONS
+    )
+
+    def reprocess(filep: pathlib.Path) -> int:
+        reprocessnt = stages.reprocess(filep, ctx.MODIFIED_DIRP / filep.name)
+        ctx._logger.debug(f"{filep.name}: {reprocessnt}")
+
+        return reprocessnt.skipped
+
+    with ThreadPoolExecutor(ctx.worker_count) as executor:
+        skipped = sum(executor.map(reprocess, originals))
+
+    stage_count = len(get_transforms(ctx).prefix_signatures())
+    total = stage_count * len(originals)
+    ctx._logger.info(
+        f"reprocessed {len(originals)} originals into {ctx.MODIFIED_DIRP}; "
+        f"stages run: {total - skipped}; stages skipped: {skipped}"
+    )
+
+
+@click.command("reprocess", short_help="Rebuild modified images from originals.")
+@click.option(
+    "-w",
+    "--worker-count",
+    type=click.IntRange(0, 127),
+    help=(
+        "Number of threads - 0 means one per cpu "
+        f"(default {WORKER_COUNT}, range 0-127)"
+    ),
+)
+@click.option(
+    "-e",
+    "--execute",
+    is_flag=True,
+    default=False,
+    help="Execute the commands (default False)",
+)
+@pass_context
+def cli(ctx: ContextBase, worker_count: int, execute: bool) -> None:
+    """
+    Rebuild the modified images from the archived originals.
+
+    The image after each transform stage is cached, so when only later plugins
+    have changed, the earlier stages are not run again.
+
+    """
+    logname = pathlib.Path(__file__).stem
+    ctx.util_cmd = logname.replace("cmd_", "")
+    application = f"{ctx.PACKAGE_NAME}.{logname}"
+    ctx._logger = logging.getLogger(application)
+
+    if not worker_count:
+        worker_count = getattr(ctx, "WORKER_COUNT", WORKER_COUNT)
+
+    worker_count = worker_count or cpu_count()
+
+    ctx._logger.info(
+        "Effective Options (commandline overrides config.py):"
+        f"\n  worker_count: {worker_count}"
+        f"\n  execute: {execute}"
+    )
+
+    CmdCtx = namedtuple("CmdCtx", "worker_count execute")
+    cmdctx = CmdCtx(worker_count, execute)  # immutable
+
+    for k, v in cmdctx._asdict().items():  # push cmdctx into ctx
+        setattr(ctx, k, v)
+
+    if cmdctx.execute:
+        try:
+            _doit(ctx)
+        except Exception as e:
+            t = traceback.format_exc()
+            ctx._logger.error(f"Exception: {e}\n{t}")
+            sys.exit(1)
+    else:
+        ctx._logger.info(f"{ctx.util_cmd}: Not executed")
@@ -0,0 +1,154 @@
+import os
+import errno
+import fcntl
+import shutil
+import logging
+from pathlib import Path
+from typing import Any
+
+from photon.demo_util.common.context_base import ContextBase
+
+ARCHIVE_MODES = ["copy", "link", "reencode"]
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+_FALLBACK_ERRNOS = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EBADF,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+}
+
+
+class ArchiveDemo:
+    """
+    Save a copy of each original image before it is transformed.
+
+    Modes:
+        copy: copy the bytes with the cheapest path the kernel offers - reflink,
+            then `copy_file_range`, then `sendfile`, then a userspace copy.
+        link: hardlink when on the same filesystem, otherwise copy as above.
+        reencode: decode and re-encode with ImageMagick (lossy, slow).
+
+    NOTE: hardlinks are safe because TransformsDemo replaces the transformed file
+    with a new inode rather than overwriting the archived one.
+
+    """
+
+    def __init__(self, ctx: ContextBase) -> None:
+        """
+        Args:
+            ctx: The Context object.
+        """
+        logname = Path(__file__).stem
+        self._logger = logging.getLogger(f"{ctx.PACKAGE_NAME}.{logname}")
+        self._archive_mode = ctx.archive_mode
+        self._original_dirp = ctx.ORIGINAL_DIRP
+
+        if self._archive_mode not in ARCHIVE_MODES:
+            raise ValueError(f"invalid archive mode: {self._archive_mode}")
+
+    def _reencode(self, filep: Path, copyp: Path) -> str:
+        from wand.image import Image  # only this mode needs ImageMagick
+
+        with Image(filename=str(filep)) as img:
+            img.save(filename=str(copyp))
+
+        return "reencode"
+
+    def _link(self, filep: Path, copyp: Path) -> str:
+        try:
+            copyp.unlink()  # a same-named original was archived before
+        except FileNotFoundError:
+            pass
+
+        try:
+            os.link(filep, copyp)
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRNOS | {errno.EPERM, errno.EMLINK}:
+                raise
+
+            return self._copy(filep, copyp)
+
+        return "link"
+
+    def _copy(self, filep: Path, copyp: Path) -> str:
+        with open(filep, "rb") as src, open(copyp, "wb") as dst:
+            srcfd, dstfd = src.fileno(), dst.fileno()
+            size = os.fstat(srcfd).st_size
+
+            try:
+                fcntl.ioctl(dstfd, FICLONE, srcfd)
+                return "reflink"
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+
+            if hasattr(os, "copy_file_range"):
+                try:
+                    _copy_loop(_copy_file_range, srcfd, dstfd, size)
+                    return "copy_file_range"
+                except OSError as e:
+                    if e.errno not in _FALLBACK_ERRNOS:
+                        raise
+
+                    dst.truncate(0)
+
+            try:
+                _copy_loop(_sendfile, srcfd, dstfd, size)
+                return "sendfile"
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+
+                dst.truncate(0)
+                dst.seek(0)
+
+            src.seek(0)
+            shutil.copyfileobj(src, dst)
+
+            return "userspace"
+
+    def save_original(self, filep: Path) -> str:
+        """
+        Save a copy of the original file into the ORIGINAL_DIRP.
+
+        Args:
+            filep: The original file.
+
+        Returns:
+            The method used: reflink, copy_file_range, sendfile, userspace,
+            link or reencode.
+        """
+        copyp = self._original_dirp / filep.name
+
+        if self._archive_mode == "reencode":
+            method = self._reencode(filep, copyp)
+        elif self._archive_mode == "link":
+            method = self._link(filep, copyp)
+        else:
+            method = self._copy(filep, copyp)
+
+        self._logger.debug(f"archived {filep} -> {copyp} via {method}")
+
+        return method
+
+
+def _copy_file_range(srcfd: int, dstfd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(srcfd, dstfd, count, offset, offset)  # type: ignore
+
+
+def _sendfile(srcfd: int, dstfd: int, offset: int, count: int) -> int:
+    return os.sendfile(dstfd, srcfd, offset, count)  # writes at dst position
+
+
+def _copy_loop(copier: Any, srcfd: int, dstfd: int, size: int) -> None:
+    offset = 0
+
+    while offset < size:
+        copied = copier(srcfd, dstfd, offset, size - offset)
+
+        if copied == 0:  # source shrank underneath us
+            break
+
+        offset += copied
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import resource
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+
+BENCH_VERSION = 1  # bump when results stop being comparable
+TOLERANCE = 0.10  # relative change treated as noise
+
+
+def peak_rss_bytes(children: bool = False) -> int:
+    """
+    Get the peak resident set size of this process or its waited-for children.
+
+    Args:
+        children: The largest child rather than this process.
+
+    Returns:
+        The peak RSS in bytes.
+    """
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    maxrss = resource.getrusage(who).ru_maxrss
+
+    return maxrss if sys.platform == "darwin" else maxrss * 1024  # Linux: KB
+
+
+def process_peak_rss_bytes(pid: int) -> Optional[int]:
+    """
+    Get the peak resident set size of a running process.
+
+    Args:
+        pid: The process ID.
+
+    Returns:
+        The peak RSS in bytes, or None if unknown - /proc/<pid>/status and its
+        VmHWM are Linux only.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024  # KB
+    except (OSError, ValueError, IndexError):
+        pass
+
+    return None
+
+
+def cpu_secs() -> float:
+    """
+    Get the user + system CPU time of this process and its waited-for children.
+
+    """
+    times = os.times()
+
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _lookup(resultd: Dict[str, Any], key: str) -> Optional[float]:
+    value: Any = resultd
+
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+
+        value = value[part]
+
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def compare(
+    resultd: Dict[str, Any],
+    baselined: Dict[str, Any],
+    checks: List[Tuple[str, bool]],
+    tolerance: float = TOLERANCE,
+) -> List[str]:
+    """
+    Compare benchmark results with a baseline.
+
+    Args:
+        resultd: The results.
+        baselined: The baseline results, from the same command.
+        checks: (dotted key, higher is better) of each value to compare, ex:
+            ("latency.end.p99", False).
+        tolerance: The relative change treated as noise.
+
+    Returns:
+        A message per regression - empty if there are none.
+    """
+    regressions = []
+
+    if baselined.get("version") != resultd.get("version"):
+        return [f"baseline version {baselined.get('version')} is not comparable"]
+
+    for key, higher_is_better in checks:
+        value, baseline = _lookup(resultd, key), _lookup(baselined, key)
+
+        if value is None or not baseline:
+            continue
+
+        change = (value - baseline) / baseline
+        worse = -change if higher_is_better else change
+
+        if worse > tolerance:
+            regressions.append(
+                f"{key}: {baseline:.6g} -> {value:.6g} ({change:+.1%}, "
+                f"tolerance {tolerance:.0%})"
+            )
+
+    return regressions
+
+
+def write_results(resultd: Dict[str, Any], outputp: Optional[Path]) -> None:
+    """
+    Write benchmark results as JSON to a file, or to stdout.
+
+    Args:
+        resultd: The results.
+        outputp: The file, or None for stdout.
+    """
+    text = json.dumps(resultd, indent=2, sort_keys=True)
+
+    if outputp:
+        outputp.write_text(text + "\n")
+    else:
+        click.echo(text)
@@ -1,11 +1,19 @@
 from queue import Queue
-from typing import List
+from typing import List, Optional, TYPE_CHECKING
 from pathlib import Path
 from threading import Barrier, Event
 
 from photon.demo_util.common.messages import WorkNT, ResultNT
 from photon.common.config_context_common import ConfigContextCommon
 
+if TYPE_CHECKING:
+    from photon.demo_util.common.incoming_index import InFlight
+    from photon.demo_util.common.ledger import LedgerDemo
+    from photon.demo_util.common.metrics import MetricsDemo
+    from photon.demo_util.common.pool import ProcessPoolDemo
+    from photon.demo_util.common.pubsub import AckBatcher, PubSubStream
+    from photon.demo_util.common.watchdog import WatchdogDemo
+
 
 class ContextBase(ConfigContextCommon):
     """
@@ -18,9 +26,38 @@ class ContextBase(ConfigContextCommon):
 
     failfast_ev: Event
     startfast_br: Barrier
+    watchdog: "WatchdogDemo"
+    metrics: "MetricsDemo"
     check_interval_secs: int
+    incoming_mode: str
+    inflight: "InFlight"
     worker_count: int
+    min_workers: int
+    max_workers: int
+    pool: str
+    process_pool: "ProcessPoolDemo"
+    queue_depth: int
+    queue_policy: str
     timeout: int
+    archive_mode: str
+    cache_mb: int
+    instrument: bool
+    metrics_port: int
+    metrics_host: str
+    work_source: str
+    pubsub_address: str
+    ack_batch: int
+    max_outstanding: int
+    pubsub_stream: "PubSubStream"
+    acker: Optional["AckBatcher"]
+    use_ledger: bool
+    ledger_filep: Path
+    ledger: Optional["LedgerDemo"]
+    event_log: bool
+    magick_threads: int
+    magick_memory_mb: int
+    magick_map_mb: int
+    magick_area_mp: int
     execute: bool
 
     DEMO_DIRP: Path
@@ -28,6 +65,7 @@ class ContextBase(ConfigContextCommon):
     MODIFIED_DIRP: Path
     ORIGINAL_DIRP: Path
     REJECTED_DIRP: Path
+    LEDGER_FILEP: Path
     VALID_EXTENSIONS: List[str]
 
     def __init__(self) -> None:  # TODO: Fix when stdlib is updated
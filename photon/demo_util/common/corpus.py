@@ -0,0 +1,131 @@
+import os
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from photon.demo_util.common.context_base import ContextBase
+
+CORPUS_VERSION = 1  # bump when the generated images change
+JPEG_QUALITY = 85
+
+# name: [(weight, (width, height))] - phone photos are 12MP, panoramas 40MP+
+SIZE_MIXES: Dict[str, List[Tuple[float, Tuple[int, int]]]] = {
+    "small": [(1.0, (640, 480)), (1.0, (1024, 768))],
+    "mixed": [
+        (0.60, (1024, 768)),
+        (0.30, (2048, 1536)),
+        (0.09, (4032, 3024)),
+        (0.01, (12000, 3000)),
+    ],
+    "large": [(0.8, (4032, 3024)), (0.2, (12000, 3000))],
+}
+
+
+def _plan(count: int, mix: str, seed: int) -> List[Tuple[int, int]]:
+    rng = random.Random(seed)
+    weights = [weight for weight, _ in SIZE_MIXES[mix]]
+    sizes = [size for _, size in SIZE_MIXES[mix]]
+
+    return rng.choices(sizes, weights=weights, k=count)
+
+
+def corpus_dirp(ctx: ContextBase, count: int, mix: str, seed: int) -> Path:
+    """
+    Get the directory of a corpus: CORPUS_DIRP from config (or its former
+    name, BENCH_CORPUS_DIRP), else under the user cache directory, one
+    subdirectory per set of parameters.
+
+    Args:
+        ctx: The Context object.
+        count: The number of images.
+        mix: The size mix, a key of SIZE_MIXES.
+        seed: The seed of the sizes and the pixels.
+
+    Returns:
+        The corpus directory, which may not exist yet.
+    """
+    cache_dirp = Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser()
+    dirp = cache_dirp / ctx.PACKAGE_HIERARCHY / "corpus"
+    dirp = getattr(ctx, "BENCH_CORPUS_DIRP", dirp)  # the old key, still honoured
+    dirp = getattr(ctx, "CORPUS_DIRP", dirp)
+
+    return Path(dirp) / f"{mix}-{count}-{seed}"
+
+
+def make_image(width: int, height: int, seed: int) -> Any:
+    """
+    Generate a synthetic photo-like image: an ImageMagick plasma fractal.
+
+    Args:
+        width: The width in pixels.
+        height: The height in pixels.
+        seed: The seed of the pixels.
+
+    Returns:
+        The open Wand image, set to encode as JPEG - the caller closes it.
+    """
+    from wand.image import Image  # only needed to generate
+
+    img = Image()
+
+    try:
+        img.seed = seed
+        img.pseudo(width, height, "plasma:")
+        img.format = "jpeg"
+        img.compression_quality = JPEG_QUALITY
+    except Exception:
+        img.close()
+        raise
+
+    return img
+
+
+def make_corpus(
+    dirp: Path, count: int, mix: str = "mixed", seed: int = 0
+) -> List[Path]:
+    """
+    Get a reproducible corpus of synthetic JPEGs, generating it if needed.
+
+    Image sizes are drawn from the named mix with a seeded RNG, and each image
+    is an ImageMagick plasma fractal - photo-like in how it compresses and how
+    costly it is to transform - seeded per image. A corpus already in `dirp`
+    for the same parameters is reused.
+
+    Args:
+        dirp: The corpus directory, created if missing.
+        count: The number of images.
+        mix: The size mix, a key of SIZE_MIXES.
+        seed: The seed of the sizes and the pixels.
+
+    Returns:
+        The image filepaths.
+    """
+    paramsd = {"version": CORPUS_VERSION, "count": count, "mix": mix, "seed": seed}
+    manifestp = dirp / "corpus.json"
+    fileps = [
+        dirp / f"corpus-{index:06d}-{width}x{height}.jpg"
+        for index, (width, height) in enumerate(_plan(count, mix, seed))
+    ]
+
+    try:
+        if json.loads(manifestp.read_text()) == paramsd:
+            if all(filep.exists() for filep in fileps):
+                return fileps
+    except (OSError, ValueError):
+        pass
+
+    dirp.mkdir(parents=True, exist_ok=True)
+
+    for filep in dirp.glob("corpus-*.jpg"):  # a different corpus
+        filep.unlink()
+
+    for index, filep in enumerate(fileps):
+        width, height = (int(n) for n in filep.stem.split("-")[-1].split("x"))
+
+        with make_image(width, height, seed * 1000003 + index) as img:
+            img.save(filename=str(filep))
+
+    manifestp.write_text(json.dumps(paramsd))
+
+    return fileps
@@ -0,0 +1,102 @@
+import struct
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+
+MP = 1000 * 1000
+PIXELS_PER_BYTE = 5.0  # typical JPEG: about 1.6 bits per pixel
+MAX_HEADER_SEGMENTS = 64  # give up rather than walk a corrupt file
+
+# start of frame markers: baseline, progressive, lossless, arithmetic - not DHT,
+# JPG or DAC, which share the range
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7}
+SOF_MARKERS |= {0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}  # TEM, RSTn: no length field
+
+
+def _read_dimensions(jpeg: BinaryIO) -> Optional[Tuple[int, int]]:
+    if jpeg.read(2) != b"\xff\xd8":  # SOI
+        return None
+
+    for _ in range(MAX_HEADER_SEGMENTS):
+        if jpeg.read(1) != b"\xff":  # not at a marker: corrupt
+            return None
+
+        marker = jpeg.read(1)
+
+        while marker == b"\xff":  # fill bytes before the marker code
+            marker = jpeg.read(1)
+
+        if not marker:
+            return None
+
+        code = marker[0]
+
+        if code in STANDALONE_MARKERS:
+            continue
+
+        if code in (0xD9, 0xDA):  # EOI or SOS before any SOF
+            return None
+
+        length_bytes = jpeg.read(2)
+
+        if len(length_bytes) < 2:
+            return None
+
+        (length,) = struct.unpack(">H", length_bytes)
+
+        if code in SOF_MARKERS:
+            frame = jpeg.read(5)  # precision, height, width
+
+            if len(frame) < 5:
+                return None
+
+            _, height, width = struct.unpack(">BHH", frame)
+            return width, height
+
+        jpeg.seek(length - 2, 1)  # skip the segment, EXIF thumbnails and all
+
+    return None
+
+
+def jpeg_dimensions(filep: Path) -> Optional[Tuple[int, int]]:
+    """
+    Read the dimensions of a JPEG from its frame header, without decoding.
+
+    Only the markers before the start of frame are read; APPn segments, such
+    as EXIF with its thumbnail, are skipped with a seek.
+
+    Args:
+        filep: The file.
+
+    Returns:
+        (width, height), or None if the file is not a readable JPEG.
+    """
+    try:
+        with filep.open("rb") as jpeg:
+            return _read_dimensions(jpeg)
+    except (OSError, struct.error):
+        return None
+
+
+def estimate_cost(filep: Path, size: int) -> float:
+    """
+    Estimate the cost of transforming a file, in megapixels.
+
+    Transform time grows with the pixel count, so the cost is the pixel count
+    from the JPEG header, or one estimated from the file size when there is no
+    readable header.
+
+    Args:
+        filep: The file.
+        size: The file size in bytes.
+
+    Returns:
+        The estimated cost.
+    """
+    dimensions = jpeg_dimensions(filep)
+
+    if dimensions:
+        width, height = dimensions
+        return width * height / MP
+
+    return size * PIXELS_PER_BYTE / MP
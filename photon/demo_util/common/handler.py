@@ -0,0 +1,84 @@
+import shutil
+from pathlib import Path
+from typing import List, NamedTuple
+
+from photon.demo_util.common.archive import ArchiveDemo
+from photon.demo_util.common.messages import TransformNT
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.transforms import get_transforms
+from photon.demo_util.common.result_cache import get_result_cache
+
+
+class HandledNT(NamedTuple):
+    """
+    Result of handling a file, returned to the Worker.
+
+    """
+
+    destdirp: Path
+    transforms: List[TransformNT]
+    cachehit: bool
+
+
+HandledNT.destdirp.__doc__ = "Path (field 0): Destination directory path."
+HandledNT.transforms.__doc__ = "List (field 1): Completed transforms - TransformNT."
+HandledNT.cachehit.__doc__ = "bool (field 2): Served from the result cache T/F."
+
+
+class HandlerDemo:
+    """
+    Archive, transform and move a single file.
+
+    With a result cache, a file whose bytes were already transformed by the same
+    transform chain is served from the cache instead.
+
+    Separate from the Worker thread so the same work can run either in the
+    Worker itself or in a child process of ProcessPoolDemo.
+
+    """
+
+    def __init__(self, ctx: ContextBase) -> None:
+        """
+        Args:
+            ctx: The Context object.
+        """
+        self._transforms = get_transforms(ctx)  # shared by all threads
+        self._archive = ArchiveDemo(ctx)
+        self._cache = get_result_cache(ctx, self._transforms.signature())
+        self._modified_dirp = ctx.MODIFIED_DIRP
+        self._rejected_dirp = ctx.REJECTED_DIRP
+
+    def _transform(self, filep: Path, destp: Path) -> HandledNT:
+        key = self._cache.key(filep) if self._cache else ""
+
+        if self._cache and self._cache.fetch(key, destp):
+            filep.unlink()  # archived already, result served from the cache
+            return HandledNT(destp.parent, [], True)
+
+        transforms = self._transforms.run_transforms(str(filep))
+        shutil.move(str(filep), str(destp))  # a copy across filesystems
+
+        if self._cache:
+            self._cache.store(key, destp)
+
+        return HandledNT(destp.parent, transforms, False)
+
+    def handle(self, filep: Path, valid: bool) -> HandledNT:
+        """
+        Handle a file.
+
+        Args:
+            filep: The incoming file.
+            valid: File valid T/F - invalid files are only moved.
+
+        Returns:
+            The destination directory, completed transforms and cache hit T/F.
+        """
+        if valid:
+            self._archive.save_original(filep)
+            return self._transform(filep, self._modified_dirp / filep.name)
+
+        new_name = self._rejected_dirp / filep.name
+        shutil.move(str(filep), str(new_name))  # a copy across filesystems
+
+        return HandledNT(self._rejected_dirp, [], False)
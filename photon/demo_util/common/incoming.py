@@ -2,12 +2,26 @@ import time
 import traceback
 from pathlib import Path
 from typing import Any, Dict
-from threading import Thread, Timer
+from threading import Thread
 
 from photon.common.json_common import JSONCommon
 from photon.common.tuuid_common import TUUIDCommon
+from photon.demo_util.common.cost import estimate_cost
 from photon.demo_util.common.messages import WorkNT
 from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.incoming_index import IncomingIndex, ScanNT
+from photon.demo_util.common.inotify import (
+    Inotify,
+    IN_CLOSE_WRITE,
+    IN_DELETE,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+)
+
+RECONCILE_INTERVAL_SECS = 60
+SETTLE_SECS = 1.0  # a scanned file modified more recently may still be written
+PAUSED_POLL_SECS = 0.05  # paused: how often the workq is checked for capacity
 
 
 class IncomingDemo(Thread):
@@ -22,20 +36,26 @@ class IncomingDemo(Thread):
 
     def __init__(self, ctx: ContextBase) -> None:
         """
-         Args:
-             ctx: The Context object.
-         """
+        Args:
+            ctx: The Context object.
+        """
         super().__init__(daemon=True)  # terminate together w main thread
         self._logger = ctx._logger
         self._logger.info("Incoming")
         self._workq = ctx.workq
+        self._estimate = ctx.queue_policy == "sjf"  # the cost orders the workq
+        self._paused = False  # workq full: files are left in the directory
+        self._deferred = False  # files left for a later scan: maybe still written
         self._util_cmd = ctx.util_cmd
         self._timeout = ctx.timeout
+        self._watchdog = ctx.watchdog
         self._json = JSONCommon(ctx)
+        self._event_log = getattr(ctx, "event_log", True)  # not every cmd
         self._tuuid = TUUIDCommon(ctx)
         self._check_interval_secs = ctx.check_interval_secs
-        self._lastcheck_time = float(0)  # init to zero
         self._incoming_dirp = ctx.INCOMING_DIRP
+        self._index = IncomingIndex(self._incoming_dirp)
+        self._inflight = ctx.inflight
         self._valid_extensions = ctx.VALID_EXTENSIONS
         self._failfast_ev = ctx.failfast_ev
         self._startfast_br = ctx.startfast_br
@@ -60,10 +80,13 @@ class IncomingDemo(Thread):
         filepd["queuedtd"] = self._tuuid.get_tza_utcdt() - startdt
         self._workq.put(WorkNT(**filepd))
 
+    def _filep_size(self, filep: Path) -> int:
+        return self._index.get(filep.name).size
+
     def _valid_filep(self, filep: Path) -> bool:
         msgs = []
         extension = filep.suffix.upper()
-        size = filep.stat().st_size
+        size = self._filep_size(filep)
 
         if extension not in self._valid_extensions:
             msgs.append(f"invalid extension: {extension}")
@@ -79,22 +102,98 @@ class IncomingDemo(Thread):
 
         return True
 
-    def _process_filep(self, filep: Path) -> None:
+    def _has_capacity(self) -> bool:
+        if self._workq.full():  # only Incoming puts, so a put will not block
+            if not self._paused:
+                self._paused = True
+                msg = (
+                    f"incoming paused: workq full ({self._workq.maxsize}); "
+                    "leaving files in the incoming directory"
+                )
+                self._logger.warning(msg)
+
+            return False
+
+        if self._paused:
+            self._paused = False
+            self._logger.info("incoming resumed: workq has capacity")
+
+        return True
+
+    def _wait(self, secs: float) -> None:
+        deadline = time.monotonic() + secs
+
+        while self._paused and self._workq.full() and time.monotonic() < deadline:
+            time.sleep(PAUSED_POLL_SECS)  # paused: scan again once there is room
+
+        if not self._paused:
+            time.sleep(max(0.0, deadline - time.monotonic()))
+
+    def _process_filep(self, filep: Path, ackid: str = "") -> bool:
+        if not self._has_capacity():
+            return False
+
         tuuid = self._tuuid.get_tuuid()
         valid = self._valid_filep(filep)
         startdt = self._tuuid.extract_datetime(tuuid)
+        size = self._filep_size(filep)
+        cost = estimate_cost(filep, size) if self._estimate and valid else 0.0
 
-        filepd = {"tuuid": tuuid, "filep": filep, "valid": valid, "startdt": startdt}
+        filepd = {
+            "tuuid": tuuid,
+            "filep": filep,
+            "valid": valid,
+            "startdt": startdt,
+            "size": size,
+            "cost": cost,
+            "ackid": ackid,
+        }
 
+        self._inflight.add(filep, ackid)  # before the put: a Worker discards it
         self._submit_work(filepd)
-        self._log_event(filepd, "start")
+        if self._event_log:  # else the ledger records the finish
+            self._log_event(filepd, "start")
+
+        return True
+
+    def _log_scan(self, scannt: ScanNT, queued: int) -> None:
+        msg = (
+            f"scan: {scannt.secs:.3f} secs; seen: {scannt.seen}; "
+            f"added: {len(scannt.added)}; changed: {len(scannt.changed)}; "
+            f"removed: {len(scannt.removed)}; queued: {queued}"
+        )
+
+        if queued:
+            self._logger.info(msg)
+        else:
+            self._logger.debug(msg)
 
     def _check_incoming(self) -> None:
-        for filep in self._incoming_dirp.iterdir():  # does not handle nested dirs
-            if filep.stat().st_ctime > self._lastcheck_time:
-                self._process_filep(filep)
+        scannt = self._index.scan()  # does not handle nested dirs
+
+        full = False
+        queued = 0
+        settled = time.time() - SETTLE_SECS
+        self._deferred = False
+
+        for filep in scannt.added + scannt.changed:
+            if filep in self._inflight:  # the Worker's rewrite, or a new file
+                self._index.forget(filep.name)  # not clear of it: look again
+                continue
+
+            if not full and self._index.get(filep.name).mtime > settled:
+                self._index.forget(filep.name)  # IN_CLOSE_WRITE or a scan queues it
+                self._deferred = True
+                continue
 
-        self._lastcheck_time = time.time()
+            full = full or not self._process_filep(filep)
+
+            if full:  # report it again on the next scan
+                self._index.forget(filep.name)
+            else:
+                queued += 1
+
+        self._log_scan(scannt, queued)
 
     def _kill_switch(self) -> None:
         msg = f"incoming hit {self._timeout} sec timeout"
@@ -113,11 +212,259 @@ class IncomingDemo(Thread):
 
         try:
             while True:
-                ks = Timer(self._timeout, self._kill_switch)
-                ks.start()
+                token = self._watchdog.register(
+                    "incoming", self._timeout, self._kill_switch
+                )
                 self._check_incoming()
-                ks.cancel()
-                time.sleep(self._check_interval_secs)
+                self._watchdog.clear(token)
+                self._wait(self._check_interval_secs)
+        except Exception as e:
+            t = traceback.format_exc()
+            msg = f"incoming thread failed: {e}\n{t}"
+            self._logger.error(msg)
+            self._failfast_ev.set()
+
+
+class IncomingInotifyDemo(IncomingDemo):
+    """
+    Queue files as soon as they are fully written, using Linux inotify.
+
+    Files are queued on IN_CLOSE_WRITE (written in place) or IN_MOVED_TO (renamed
+    into the directory), so an idle directory costs no CPU. A periodic
+    reconciliation scan - and one after an event queue overflow - picks up
+    anything the events missed. The scan leaves files modified within
+    SETTLE_SECS, which may still be written, to their close event or to a
+    scan soon after. While the workq is full, files are left to the scan that
+    runs as soon as it has room.
+
+    Names stay in the index from being queued until the Worker moves them out
+    (IN_MOVED_FROM) or removes them (IN_DELETE, ex: on a result cache hit), so
+    the same name delivered again is queued. The Worker's own in-place writes
+    are not re-queued: those files are in flight.
+
+    """
+
+    def __init__(self, ctx: ContextBase) -> None:
+        """
+        Args:
+            ctx: The Context object.
+        """
+        super().__init__(ctx)
+        self._reconcile_interval_secs = max(
+            RECONCILE_INTERVAL_SECS, self._check_interval_secs
+        )
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+        self._inotify = Inotify(self._incoming_dirp, mask)  # before any scan
+
+    def _queue_name(self, name: str) -> None:
+        if self._paused:  # the scan once the workq has room queues it, and resumes
+            return
+
+        if self._incoming_dirp / name in self._inflight:  # ex: the Worker's write
+            return
+
+        if self._index.add(name):  # False if already queued or already gone
+            if not self._process_filep(self._incoming_dirp / name):
+                self._index.forget(name)  # workq full: leave for a later scan
+
+    def _handle_events(self, timeout: float) -> bool:
+        overflow = False
+
+        for mask, name in self._inotify.read(timeout):  # blocks up to timeout
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif mask & (IN_MOVED_FROM | IN_DELETE):
+                self._index.forget(name)
+            elif name:
+                self._queue_name(name)
+
+        return overflow
+
+    def run(self) -> None:
+        """
+        Run the thread.
+
+        Background thread of parent process.
+
+        """
+        self._startfast_br.wait()  # blocks until all threads are ready
+        self._logger.info("Incoming running (inotify)")
+
+        try:
+            next_reconcile = float(0)  # reconcile on start
+
+            while True:
+                now = time.monotonic()
+
+                if now >= next_reconcile:
+                    token = self._watchdog.register(
+                        "incoming", self._timeout, self._kill_switch
+                    )
+                    self._check_incoming()
+                    self._watchdog.clear(token)
+
+                    if self._deferred:  # look again once they have settled
+                        interval = min(self._check_interval_secs, SETTLE_SECS)
+                    elif self._paused:  # retry soon
+                        interval = self._check_interval_secs
+                    else:
+                        interval = self._reconcile_interval_secs
+
+                    next_reconcile = now + interval
+
+                remaining = max(0.0, next_reconcile - time.monotonic())
+
+                if self._paused:  # check the workq for capacity
+                    remaining = min(remaining, PAUSED_POLL_SECS)
+
+                overflow = self._handle_events(remaining)
+
+                if self._paused and not self._workq.full():  # room: scan again now
+                    next_reconcile = float(0)
+
+                if overflow:
+                    self._logger.warning("inotify queue overflow: reconciling")
+                    next_reconcile = float(0)
+        except Exception as e:
+            t = traceback.format_exc()
+            msg = f"incoming thread failed: {e}\n{t}"
+            self._logger.error(msg)
+            self._failfast_ev.set()
+        finally:
+            self._inotify.close()
+
+
+class IncomingBatchDemo(IncomingDemo):
+    """
+    Queue a fixed set of files once, then exit.
+
+    Unlike polling, a put blocks while the workq is full, so the whole batch is
+    queued as fast as the Workers take it. The files were stat'ed when the batch
+    was collected, so the incoming directory is not scanned.
+
+    """
+
+    def __init__(self, ctx: ContextBase, sizesd: Dict[Path, int]) -> None:
+        """
+        Args:
+            ctx: The Context object.
+            sizesd: The files to queue and their sizes in bytes.
+        """
+        super().__init__(ctx)
+        self._sizesd = sizesd
+
+    def _filep_size(self, filep: Path) -> int:
+        return self._sizesd[filep]
+
+    def _has_capacity(self) -> bool:
+        return True  # let the put block: there is nothing to leave for later
+
+    def run(self) -> None:
+        """
+        Run the thread.
+
+        Background thread of parent process.
+
+        """
+        self._startfast_br.wait()  # blocks until all threads are ready
+        self._logger.info(f"Incoming running (batch of {len(self._sizesd)})")
+
+        try:
+            for filep in self._sizesd:
+                self._process_filep(filep)
+
+            self._logger.info("Incoming batch queued")
+        except Exception as e:
+            t = traceback.format_exc()
+            msg = f"incoming thread failed: {e}\n{t}"
+            self._logger.error(msg)
+            self._failfast_ev.set()
+
+
+class IncomingPubSubDemo(IncomingDemo):
+    """
+    Queue files named by messages from a streaming pull of the Pub/Sub stand-in.
+
+    Each message names a file, as a storage notification would. Flow control
+    on the stream bounds the messages held - queued, in work, or awaiting
+    their ack in Results - so the workq is never far over capacity and a put
+    only blocks briefly. Leases of messages still in work are extended by a
+    thread of their own, every quarter of the ack deadline, so neither a slow
+    receive nor a blocked put lets them expire.
+
+    A file already gone is a redelivery of finished work, whose ack came too
+    late: it is acked again and skipped. A file still queued or in work is a
+    redelivery of work in progress: it is joined to that work's delivery and
+    acked when Results acks it, so if the work fails the message is still
+    redelivered.
+
+    """
+
+    def __init__(self, ctx: ContextBase) -> None:
+        """
+        Args:
+            ctx: The Context object.
+        """
+        super().__init__(ctx)
+        self._stream = ctx.pubsub_stream  # Results acks on the same stream
+        self._lease_secs = self._stream.ack_deadline_secs / 4  # < deadline/2
+        self._receive_secs = min(self._check_interval_secs, self._lease_secs)
+
+    def _filep_size(self, filep: Path) -> int:
+        return filep.stat().st_size
+
+    def _has_capacity(self) -> bool:
+        return True  # flow control: the stream holds the rest on the server
+
+    def _extend_leases(self) -> None:
+        try:
+            while not self._failfast_ev.wait(self._lease_secs):
+                self._stream.extend_leases()
+        except Exception as e:
+            t = traceback.format_exc()
+            msg = f"incoming lease thread failed: {e}\n{t}"
+            self._logger.error(msg)
+            self._failfast_ev.set()
+
+    def _process_message(self, deliveryd: Dict[str, Any]) -> None:
+        filep = Path(deliveryd["data"]["filep"])
+        ackid = deliveryd["ackid"]
+        msg = f"message: {deliveryd['id']}; attempt: {deliveryd['attempt']}"
+        original = self._inflight.ackid(filep)
+
+        if original and self._stream.join(ackid, original):  # not yet acked
+            self._logger.warning(f"incoming duplicate: {filep} is in work; {msg}")
+            return
+
+        if not filep.exists():
+            self._logger.warning(f"incoming duplicate: {filep} is gone; {msg}")
+            self._stream.ack([ackid])
+            return
+
+        self._process_filep(filep, ackid)
+
+    def run(self) -> None:
+        """
+        Run the thread.
+
+        Background thread of parent process.
+
+        """
+        self._startfast_br.wait()  # blocks until all threads are ready
+        self._logger.info("Incoming running (pubsub)")
+        Thread(target=self._extend_leases, daemon=True).start()
+
+        try:
+            while True:
+                deliveries = self._stream.receive(self._receive_secs)
+                token = self._watchdog.register(
+                    "incoming", self._timeout, self._kill_switch
+                )
+
+                for deliveryd in deliveries:
+                    self._process_message(deliveryd)
+
+                self._watchdog.clear(token)
         except Exception as e:
             t = traceback.format_exc()
             msg = f"incoming thread failed: {e}\n{t}"
@@ -0,0 +1,205 @@
+import os
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional
+
+
+class FileStateNT(NamedTuple):
+    """
+    Indexed state of an incoming file.
+
+    """
+
+    inode: int
+    size: int
+    mtime: float
+
+
+class ScanNT(NamedTuple):
+    """
+    The difference between one scan of the incoming directory and the last.
+
+    """
+
+    added: List[Path]
+    changed: List[Path]
+    removed: List[str]
+    seen: int
+    secs: float
+
+
+class InFlight:
+    """
+    The files queued by Incoming and not yet moved out by a Worker.
+
+    A scan cannot tell the Worker's own rewrite of a file in incoming from a
+    new file of the same name - both are a new inode - but only the first is
+    in flight.
+
+    Each is recorded with the Pub/Sub ack ID it was queued with, if any.
+
+    Thread-safe: Incoming adds, the Workers discard.
+
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._ackidsd: Dict[Path, str] = {}
+
+    def __contains__(self, filep: Path) -> bool:
+        with self._lock:
+            return filep in self._ackidsd
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ackidsd)
+
+    def add(self, filep: Path, ackid: str = "") -> None:
+        """
+        Mark a file queued.
+
+        Args:
+            filep: The file path, as queued.
+            ackid: The Pub/Sub ack ID; empty for a directory.
+        """
+        with self._lock:
+            self._ackidsd[filep] = ackid
+
+    def ackid(self, filep: Path) -> Optional[str]:
+        """
+        Get the ack ID a file was queued with.
+
+        Args:
+            filep: The file path, as queued.
+
+        Returns:
+            The ack ID, or None if the file is not in flight.
+        """
+        with self._lock:
+            return self._ackidsd.get(filep)
+
+    def discard(self, filep: Path) -> None:
+        """
+        Mark a file done: it has left incoming, moved or removed.
+
+        Args:
+            filep: The file path, as queued.
+        """
+        with self._lock:
+            self._ackidsd.pop(filep, None)
+
+
+class IncomingIndex:
+    """
+    Index the files of the incoming directory by name.
+
+    Each scan diffs `os.scandir()` against the index. A name already indexed
+    with the same inode is not stat'ed again - `DirEntry.inode()` is free - so a
+    pass over a large, mostly unchanged directory costs one `getdents` walk
+    rather than a `stat` per file. New names are stat'ed once, via the
+    `DirEntry`, to record size and mtime.
+
+    Files are reported once, when added, so unlike comparing `st_ctime` with the
+    time of the last check, a file written during a scan is neither missed nor
+    queued twice.
+
+    """
+
+    def __init__(self, dirp: Path) -> None:
+        """
+        Args:
+            dirp: The directory to index (not recursive).
+        """
+        self._dirp = dirp
+        self._filesd: Dict[str, FileStateNT] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._filesd
+
+    def __len__(self) -> int:
+        return len(self._filesd)
+
+    def get(self, name: str) -> FileStateNT:
+        """
+        Get the indexed state of a file.
+
+        Args:
+            name: The filename.
+
+        Returns:
+            The indexed state.
+
+        Raises:
+            KeyError if the name is not indexed.
+        """
+        return self._filesd[name]
+
+    def add(self, name: str) -> bool:
+        """
+        Index a single file, ex: on an inotify event.
+
+        Args:
+            name: The filename.
+
+        Returns:
+            True if the file exists and was not already indexed.
+        """
+        if name in self._filesd:
+            return False
+
+        try:
+            st = os.stat(self._dirp / name, follow_symlinks=False)
+        except FileNotFoundError:
+            return False
+
+        self._filesd[name] = FileStateNT(st.st_ino, st.st_size, st.st_mtime)
+
+        return True
+
+    def forget(self, name: str) -> None:
+        """
+        Drop a file from the index so the next scan reports it as added.
+
+        Args:
+            name: The filename.
+        """
+        self._filesd.pop(name, None)
+
+    def scan(self) -> ScanNT:
+        """
+        Scan the directory and update the index.
+
+        Returns:
+            The files added, changed (replaced with a new inode) and removed
+            since the last scan, the number of files seen and the scan duration.
+        """
+        begin = time.monotonic()
+        added: List[Path] = []
+        changed: List[Path] = []
+        filesd: Dict[str, FileStateNT] = {}
+
+        with os.scandir(self._dirp) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):  # d_type: no stat
+                    continue
+
+                name = entry.name
+                state = self._filesd.get(name)
+
+                if state is None or state.inode != entry.inode():
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:  # moved out since listed
+                        continue
+
+                    filesd[name] = FileStateNT(st.st_ino, st.st_size, st.st_mtime)
+                    (added if state is None else changed).append(Path(entry.path))
+                else:
+                    filesd[name] = state
+
+        removed = [name for name in self._filesd if name not in filesd]
+        self._filesd = filesd
+        secs = time.monotonic() - begin
+
+        return ScanNT(added, changed, removed, len(filesd), secs)
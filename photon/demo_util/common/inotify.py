@@ -0,0 +1,117 @@
+import os
+import sys
+import errno
+import ctypes
+import select
+import struct
+import ctypes.util
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# linux/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+_READ_SIZE = 64 * 1024
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+_libc = _load_libc()
+
+
+def inotify_available() -> bool:
+    """
+    Check whether Linux inotify can be used.
+
+    Returns:
+        True if inotify is available.
+    """
+    return _libc is not None
+
+
+class Inotify:
+    """
+    Minimal ctypes wrapper watching a single directory with Linux inotify.
+
+    """
+
+    def __init__(self, dirp: Path, mask: int) -> None:
+        """
+        Args:
+            dirp: The directory to watch (not recursive).
+            mask: The IN_* events to watch for.
+
+        Raises:
+            OSError if inotify is unavailable or the watch cannot be added.
+        """
+        if _libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+
+        self._fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if self._fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, f"inotify_init1: {os.strerror(e)}")
+
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(dirp), mask | IN_ONLYDIR)
+
+        if wd < 0:
+            e = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(e, f"inotify_add_watch: {os.strerror(e)}: {dirp}")
+
+    def read(self, timeout: Optional[float]) -> List[Tuple[int, str]]:
+        """
+        Wait for and read events.
+
+        Args:
+            timeout: Seconds to wait for events - None waits indefinitely.
+
+        Returns:
+            A list of (mask, name) - name is empty for IN_Q_OVERFLOW.
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+
+        if not ready:
+            return []
+
+        try:
+            buf = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+
+        while offset + _EVENT.size <= len(buf):
+            _, mask, _, length = _EVENT.unpack_from(buf, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(buf[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((mask, name))
+
+        return events
+
+    def close(self) -> None:
+        """
+        Close the inotify file descriptor.
+
+        """
+        os.close(self._fd)
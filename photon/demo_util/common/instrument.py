@@ -0,0 +1,62 @@
+import time
+import threading
+from typing import Any, Optional, Tuple
+
+from wand.image import Image
+
+from photon.demo_util.common.transforms import transform_impl
+
+INSTRUMENT_NAME = "_instrument"  # plugin names come from class names: no clash
+
+MeasuredT = Tuple[Optional[float], Optional[int], Optional[int]]
+UNMEASURED: MeasuredT = (None, None, None)
+
+
+class InstrumentDemo:
+    """
+    Pluggy hookwrapper measuring every image transform.
+
+    Wraps each plugin's `run_image_transform` call to record the CPU time of
+    the calling thread and the pixel count of the image in and out. Workers
+    transform concurrently, so the measurement is kept per thread until
+    `TransformsDemo.run_chain()` takes it for the TransformNT.
+
+    CPU time is the calling thread's: ImageMagick's own OpenMP threads are not
+    counted, so with more than one magick thread it is a lower bound.
+
+    Only registered with --instrument: without it there is no wrapper to call.
+
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    @transform_impl(hookwrapper=True)  # type: ignore
+    def run_image_transform(self, img: Image) -> Any:
+        """
+        Measure the wrapped transform.
+
+        args:
+            img: The open image.
+        """
+        pixels_in = img.width * img.height
+        begin = time.thread_time()
+        outcome = yield  # the plugin runs
+        cpusecs = time.thread_time() - begin
+
+        if outcome.excinfo is None:
+            results = outcome.get_result()
+            img_out = results[0] if results else img
+            self._local.measured = (cpusecs, pixels_in, img_out.width * img_out.height)
+
+    def take(self) -> MeasuredT:
+        """
+        Take the measurement of this thread's last transform.
+
+        Returns:
+            CPU secs, pixels in and pixels out - None if not measured.
+        """
+        measured = getattr(self._local, "measured", UNMEASURED)
+        self._local.measured = UNMEASURED
+
+        return measured  # type: ignore
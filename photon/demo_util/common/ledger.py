@@ -0,0 +1,287 @@
+import json
+import time
+import sqlite3
+from pathlib import Path
+from threading import Lock
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from photon.demo_util.common.messages import ResultNT
+
+LEDGER_BATCH = 100  # completions per transaction
+LEDGER_FLUSH_SECS = 1.0  # a partial batch is committed within this
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    tuuid TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    filep TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    queued_secs REAL NOT NULL,
+    work_secs REAL NOT NULL,
+    total_secs REAL NOT NULL,
+    worker TEXT NOT NULL,
+    valid INTEGER NOT NULL,
+    cachehit INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    destdirp TEXT NOT NULL,
+    util_cmd TEXT NOT NULL,
+    transforms TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS completions_tuuid ON completions (tuuid);
+CREATE INDEX IF NOT EXISTS completions_filename ON completions (filename, finished);
+CREATE INDEX IF NOT EXISTS completions_finished ON completions (finished);
+"""
+
+
+class CompletionNT(NamedTuple):
+    """
+    A completed file, as recorded in the ledger.
+
+    """
+
+    tuuid: str
+    filename: str
+    filep: str
+    started: datetime
+    finished: datetime
+    queued_secs: float
+    work_secs: float
+    total_secs: float
+    worker: str
+    valid: bool
+    cachehit: bool
+    size: int
+    destdirp: str
+    util_cmd: str
+    transforms: str
+
+
+CompletionNT.tuuid.__doc__ = "str (field 0): Unique ID of the unit of work."
+CompletionNT.filename.__doc__ = "str (field 1): File name, as received."
+CompletionNT.filep.__doc__ = "str (field 2): File path, as received."
+CompletionNT.started.__doc__ = "datetime (field 3): UTC start dt, when found."
+CompletionNT.finished.__doc__ = "datetime (field 4): UTC finish dt, in Results."
+CompletionNT.queued_secs.__doc__ = "float (field 5): Secs from start to the workq."
+CompletionNT.work_secs.__doc__ = "float (field 6): Secs a Worker spent on the file."
+CompletionNT.total_secs.__doc__ = "float (field 7): Secs from start to finish."
+CompletionNT.worker.__doc__ = "str (field 8): Worker name."
+CompletionNT.valid.__doc__ = "bool (field 9): Valid image T/F; if F, rejected."
+CompletionNT.cachehit.__doc__ = "bool (field 10): Served from the result cache T/F."
+CompletionNT.size.__doc__ = "int (field 11): File size in bytes when queued."
+CompletionNT.destdirp.__doc__ = "str (field 12): Directory the file was moved to."
+CompletionNT.util_cmd.__doc__ = "str (field 13): The command that processed it."
+CompletionNT.transforms.__doc__ = "str (field 14): JSON list of TransformNT dicts."
+
+
+def _epoch_dt(secs: float) -> datetime:
+    return datetime.fromtimestamp(secs, tz=timezone.utc)
+
+
+def _connect(ledgerp: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(ledgerp), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")  # readers never block the writer
+    conn.execute("PRAGMA synchronous = NORMAL")  # WAL: durable but for power loss
+
+    return conn
+
+
+class LedgerDemo:
+    """
+    An append-only SQLite ledger of completed files, written by Results.
+
+    Rows are collected and inserted in batches, one transaction each - a
+    commit when LEDGER_BATCH have collected, or by `flush_due()` once the
+    oldest has waited LEDGER_FLUSH_SECS - rather than a write per file.
+    The database is in WAL mode, so `util ledger` can query it while the
+    demo runs. Indexed by tuuid, file name and finish time.
+
+    A redelivered or reprocessed file gets a row for each completion.
+
+    """
+
+    def __init__(self, ledgerp: Path, util_cmd: str, batch: int = LEDGER_BATCH) -> None:
+        """
+        Args:
+            ledgerp: The ledger file, created if need be.
+            util_cmd: The command writing the ledger.
+            batch: The most rows per transaction.
+        """
+        ledgerp.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = _connect(ledgerp)
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._lock = Lock()  # Results writes; the main thread closes
+        self._util_cmd = util_cmd
+        self._batch = batch
+        self._rows: List[Sequence[Any]] = []
+        self._oldest = 0.0
+        self._closed = False
+        self.transactions = 0
+
+    def add(self, resultnt: ResultNT, finishdt: datetime, finishtd: timedelta) -> None:
+        """
+        Add a completion, committing the batch if it is full.
+
+        Args:
+            resultnt: The result from a Worker.
+            finishdt: UTC dt when Results handled it.
+            finishtd: Time from start to finish.
+        """
+        transforms = json.dumps([t._asdict() for t in resultnt.transforms])
+        row = (
+            str(resultnt.tuuid),
+            resultnt.filep.name,
+            str(resultnt.filep),
+            resultnt.startdt.timestamp(),
+            finishdt.timestamp(),
+            resultnt.queuedtd.total_seconds(),
+            (resultnt.endworktd - resultnt.beginworktd).total_seconds(),
+            finishtd.total_seconds(),
+            resultnt.worker,
+            resultnt.valid,
+            resultnt.cachehit,
+            resultnt.size,
+            str(resultnt.destdirp),
+            self._util_cmd,
+            transforms,
+        )
+
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+
+            self._rows.append(row)
+
+            if len(self._rows) >= self._batch:
+                self._commit()
+
+    def _commit(self) -> None:
+        if not self._rows:
+            return
+
+        if self._closed:  # the process is exiting: their acks must not be sent
+            raise RuntimeError(f"ledger closed with {len(self._rows)} rows pending")
+
+        with self._conn:  # one transaction
+            self._conn.executemany(
+                f"INSERT INTO completions VALUES ({', '.join('?' * 15)})",
+                self._rows,
+            )
+
+        self._rows = []
+        self.transactions += 1
+
+    def flush_due(self) -> None:
+        """
+        Commit the batch if its oldest row has waited long enough.
+
+        """
+        with self._lock:
+            if self._rows and time.monotonic() - self._oldest >= LEDGER_FLUSH_SECS:
+                self._commit()
+
+    def flush(self) -> None:
+        """
+        Commit the batch, if any.
+
+        Raises:
+            RuntimeError if the ledger is closed and rows are pending.
+        """
+        with self._lock:
+            self._commit()
+
+    def close(self) -> None:
+        """
+        Commit the batch and close the ledger.
+
+        """
+        with self._lock:
+            if self._closed:
+                return
+
+            self._commit()
+            self._conn.close()
+            self._closed = True
+
+
+def query(
+    ledgerp: Path,
+    filenames: Sequence[str] = (),
+    tuuid: Optional[str] = None,
+    worker: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 0,
+) -> List[CompletionNT]:
+    """
+    Find completions in a ledger, newest first.
+
+    Args:
+        ledgerp: The ledger file.
+        filenames: Only these file names, if any.
+        tuuid: Only this unit of work.
+        worker: Only this worker.
+        since: Only finished at or after this dt.
+        until: Only finished before this dt.
+        limit: The most completions; 0 for all.
+
+    Returns:
+        The completions.
+
+    Raises:
+        FileNotFoundError if there is no ledger.
+    """
+    if not ledgerp.exists():
+        raise FileNotFoundError(f"no ledger: {ledgerp}")
+
+    wheres: List[str] = []
+    params: List[Any] = []
+
+    if filenames:
+        wheres.append(f"filename IN ({', '.join('?' * len(filenames))})")
+        params.extend(filenames)
+
+    if tuuid:
+        wheres.append("tuuid = ?")
+        params.append(tuuid)
+
+    if worker:
+        wheres.append("worker = ?")
+        params.append(worker)
+
+    if since:
+        wheres.append("finished >= ?")
+        params.append(since.timestamp())
+
+    if until:
+        wheres.append("finished < ?")
+        params.append(until.timestamp())
+
+    sql = "SELECT * FROM completions"
+    sql += f" WHERE {' AND '.join(wheres)}" if wheres else ""
+    sql += " ORDER BY finished DESC"
+    sql += f" LIMIT {int(limit)}" if limit else ""
+
+    conn = _connect(ledgerp)
+
+    try:
+        conn.execute("PRAGMA query_only = ON")
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    return [
+        CompletionNT(
+            *row[:3],
+            _epoch_dt(row[3]),
+            _epoch_dt(row[4]),
+            *row[5:9],
+            bool(row[9]),
+            bool(row[10]),
+            *row[11:],
+        )
+        for row in rows
+    ]
@@ -0,0 +1,56 @@
+from typing import Dict
+from multiprocessing import cpu_count
+
+from photon.demo_util.common.context_base import ContextBase
+
+MB = 1024 * 1024
+MP = 1000 * 1000
+
+
+def auto_magick_threads(worker_count: int) -> int:
+    """
+    Split the cpus between worker parallelism and ImageMagick's own threads.
+
+    Each Worker gets an equal share of the cpus for its OpenMP threads, so the
+    total number of runnable threads stays close to the cpu count.
+
+    Args:
+        worker_count: The number of Workers.
+
+    Returns:
+        The ImageMagick thread limit, at least 1.
+    """
+    return max(1, cpu_count() // max(1, worker_count))
+
+
+def configure_magick(ctx: ContextBase) -> Dict[str, int]:
+    """
+    Apply the ImageMagick resource limits of the current process.
+
+    Limits are per process: shared by all Worker threads in thread pool mode
+    and applied by each child in process pool mode. A limit of zero leaves the
+    ImageMagick default (policy.xml, environment) in place.
+
+    Args:
+        ctx: The Context object.
+
+    Returns:
+        The limits applied, by ImageMagick resource name.
+    """
+    from wand.resource import limits  # loads libMagickWand
+
+    requested = {
+        "thread": ctx.magick_threads,
+        "memory": ctx.magick_memory_mb * MB,
+        "map": ctx.magick_map_mb * MB,
+        "area": ctx.magick_area_mp * MP,
+    }
+
+    applied = {}
+
+    for resource, limit in requested.items():
+        if limit:
+            limits[resource] = limit
+            applied[resource] = limit
+
+    return applied
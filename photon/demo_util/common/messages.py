@@ -1,10 +1,30 @@
 from pathlib import Path
-from typing import NamedTuple, List
+from typing import NamedTuple, List, Optional
 from datetime import datetime, timedelta
 
 from time_uuid import TimeUUID
 
 
+class TransformNT(NamedTuple):
+    """
+    A completed transform and its duration.
+
+    """
+
+    name: str
+    secs: float
+    cpusecs: Optional[float] = None
+    pixels_in: Optional[int] = None
+    pixels_out: Optional[int] = None
+
+
+TransformNT.name.__doc__ = "str (field 0): Transform plugin name."
+TransformNT.secs.__doc__ = "float (field 1): Wall clock secs spent in the plugin."
+TransformNT.cpusecs.__doc__ = "float (field 2): Thread CPU secs; None if not measured."
+TransformNT.pixels_in.__doc__ = "int (field 3): Pixels in; None if not measured."
+TransformNT.pixels_out.__doc__ = "int (field 4): Pixels out; None if not measured."
+
+
 class WorkNT(NamedTuple):
     """
     Work info sent from Incoming to Worker.
@@ -17,6 +37,9 @@ class WorkNT(NamedTuple):
 
     startdt: datetime
     queuedtd: timedelta
+    size: int
+    cost: float
+    ackid: str
 
 
 WorkNT.tuuid.__doc__ = "TimeUUID (field 0): Unique ID for each unit of work."
@@ -25,6 +48,9 @@ WorkNT.valid.__doc__ = "bool (field 2): File valid T/F."
 
 WorkNT.startdt.__doc__ = "datetime (field 3): Start dt for this file."
 WorkNT.queuedtd.__doc__ = "timedelta (field 4): Queued dt for this file."
+WorkNT.size.__doc__ = "int (field 5): File size in bytes when queued."
+WorkNT.cost.__doc__ = "float (field 6): Estimated cost in megapixels; 0.0 if FIFO."
+WorkNT.ackid.__doc__ = "str (field 7): Pub/Sub ack ID; empty for a directory."
 
 
 class ResultNT(NamedTuple):
@@ -44,7 +70,11 @@ class ResultNT(NamedTuple):
     beginworktd: timedelta
     endworktd: timedelta
     destdirp: Path
-    transforms: List[str]
+    transforms: List[TransformNT]
+    cachehit: bool
+    size: int
+    cost: float
+    ackid: str
 
 
 ResultNT.tuuid.__doc__ = "TimeUUID (field 0): Unique ID for each unit of work."
@@ -58,4 +88,8 @@ ResultNT.worker.__doc__ = "int (field 5): Worker index number."
 ResultNT.beginworktd.__doc__ = "timedelta (field 6): Timedelta for this file."
 ResultNT.endworktd.__doc__ = "timedelta (field 7): Timedelta for this file."
 ResultNT.destdirp.__doc__ = "Path (field 8): Destination directory path for this file."
-ResultNT.transforms.__doc__ = "List (field 9): List of completed file transforms."
+ResultNT.transforms.__doc__ = "List (field 9): Completed file transforms - TransformNT."
+ResultNT.cachehit.__doc__ = "bool (field 10): Served from the result cache T/F."
+ResultNT.size.__doc__ = "int (field 11): File size in bytes when queued."
+ResultNT.cost.__doc__ = "float (field 12): Estimated cost in megapixels; 0.0 if FIFO."
+ResultNT.ackid.__doc__ = "str (field 13): Pub/Sub ack ID; empty for a directory."
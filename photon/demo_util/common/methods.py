@@ -1,11 +1,28 @@
+from pathlib import Path
+from typing import Dict
 from queue import Queue
 from threading import Barrier, Event
 
 from photon.demo_util.common.timer import TimerDemo
+from photon.demo_util.common.magick import configure_magick
+from photon.demo_util.common.transforms import get_transforms
 from photon.demo_util.common.worker import WorkerDemo
+from photon.demo_util.common.pool import ProcessPoolDemo
 from photon.demo_util.common.results import ResultsDemo
+from photon.demo_util.common.metrics import MetricsDemo
+from photon.demo_util.common.watchdog import WatchdogDemo
+from photon.demo_util.common.supervisor import SupervisorDemo
+from photon.demo_util.common.workqueue import PriorityWorkQueue
 from photon.demo_util.common.failfast import FailFastDemo
-from photon.demo_util.common.incoming import IncomingDemo
+from photon.demo_util.common.incoming_index import InFlight
+from photon.demo_util.common.ledger import LedgerDemo
+from photon.demo_util.common.pubsub import AckBatcher, PubSubStream
+from photon.demo_util.common.incoming import (
+    IncomingDemo,
+    IncomingBatchDemo,
+    IncomingInotifyDemo,
+    IncomingPubSubDemo,
+)
 from photon.demo_util.common.context_base import ContextBase
 
 
@@ -17,7 +34,11 @@ def failfast(ctx: ContextBase) -> None:
         ctx: The Context object.
     """
 
-    FailFastDemo(ctx).run()
+    try:
+        FailFastDemo(ctx).run()
+    finally:
+        if ctx.ledger:  # commit the last batch
+            ctx.ledger.close()
 
 
 def handle_results(ctx: ContextBase) -> None:
@@ -44,42 +65,142 @@ def start_timer(ctx: ContextBase) -> None:
 
 def start_incoming(ctx: ContextBase) -> None:
     """
-    Launch a background thread to periodically handle incoming files.
+    Launch a background thread to handle incoming files.
+
+    Files are found either by periodic polling or, on Linux, by inotify events -
+    or named by messages from the Pub/Sub stand-in.
+
+    Args:
+        ctx: The Context object.
+    """
+
+    if getattr(ctx, "work_source", "directory") == "pubsub":  # not every cmd
+        IncomingPubSubDemo(ctx).start()
+    elif ctx.incoming_mode == "inotify":
+        IncomingInotifyDemo(ctx).start()
+    else:
+        IncomingDemo(ctx).start()
+
+
+def start_batch(ctx: ContextBase, sizesd: Dict[Path, int]) -> None:
+    """
+    Launch a background thread to queue a fixed set of files once.
+
+    Args:
+        ctx: The Context object.
+        sizesd: The files to queue and their sizes in bytes.
+    """
+
+    IncomingBatchDemo(ctx, sizesd).start()
+
+
+def start_metrics_server(ctx: ContextBase) -> None:
+    """
+    Start the thread serving Prometheus metrics, if a port is set.
 
     Args:
         ctx: The Context object.
     """
 
-    IncomingDemo(ctx).start()
+    if ctx.metrics_port:
+        from photon.demo_util.common.metrics_http import MetricsServerDemo
+
+        MetricsServerDemo(ctx).start()
+
+
+def start_watchdog(ctx: ContextBase) -> None:
+    """
+    Start the thread enforcing Worker and Incoming timeouts.
+
+    Args:
+        ctx: The Context object.
+    """
+
+    ctx.watchdog.start()
 
 
 def start_workers(ctx: ContextBase) -> None:
     """
     Start worker threads.
 
+    In process pool mode each worker thread hands its files to the pool.
+
     Args:
         ctx: The Context object.
     """
 
+    if ctx.pool == "process":
+        ctx.process_pool = ProcessPoolDemo(ctx)
+
     for worker in range(ctx.worker_count):
         WorkerDemo(ctx, worker).start()  # instantiate and start()
 
 
-def update_ctx(ctx: ContextBase) -> None:
+def start_supervisor(ctx: ContextBase) -> None:
+    """
+    Start the initial Workers and the thread that grows and shrinks them.
+
+    In process pool mode each worker thread hands its files to the pool.
+
+    Args:
+        ctx: The Context object.
+    """
+
+    if ctx.pool == "process":
+        ctx.process_pool = ProcessPoolDemo(ctx)
+
+    SupervisorDemo(ctx).start()
+
+
+def update_ctx(ctx: ContextBase, parties: int = 1 + 1 + 1 + 1 + 1) -> None:
     """
     Init shared data structures.
 
     Args:
         ctx: The Context object.
+        parties: The number of startfast threads other than the Workers
+            (default Incoming + Timer + Results + FailFast + Supervisor).
     """
 
-    # thread count for startfast:
-    #     Number of Workers + Incoming + Timer + Results + FailFast
-    ctx.startfast_br = Barrier(ctx.worker_count + 1 + 1 + 1 + 1, timeout=60)
+    # thread count for startfast: Number of Workers + parties
+    ctx.startfast_br = Barrier(ctx.worker_count + parties, timeout=60)
     ctx.failfast_ev = Event()
-
-    ctx.workq = Queue()
-    ctx.resultq = Queue()
+    ctx.watchdog = WatchdogDemo(ctx)  # not a startfast party: runs before all
+    ctx.metrics = MetricsDemo(ctx)  # recorded by Results
+
+    # bounded: a full workq pauses Incoming, a full resultq blocks Workers
+    if ctx.queue_policy == "sjf":  # cheapest file first, with aging
+        ctx.workq = PriorityWorkQueue(maxsize=ctx.queue_depth)
+    else:
+        ctx.workq = Queue(maxsize=ctx.queue_depth)
+
+    ctx.resultq = Queue(maxsize=ctx.queue_depth)
+    ctx.inflight = InFlight()  # added by Incoming, discarded by Workers
+
+    ctx.ledger = None  # recorded by Results
+
+    if getattr(ctx, "use_ledger", False):  # not every cmd
+        ctx.ledger = LedgerDemo(ctx.ledger_filep, ctx.util_cmd)
+        ctx._logger.info(f"ledger: {ctx.ledger_filep}")
+
+    ctx.acker = None  # Results acks only messages from the pubsub work source
+
+    if getattr(ctx, "work_source", "directory") == "pubsub":  # not every cmd
+        ctx.pubsub_stream = PubSubStream(ctx.pubsub_address, ctx.max_outstanding)
+        ctx.acker = AckBatcher(
+            ctx.pubsub_stream,
+            ctx.ack_batch,
+            ctx.ledger.flush if ctx.ledger else None,  # no ack before its row
+        )
+        ctx._logger.info(
+            f"pubsub stream: {ctx.pubsub_address}; "
+            f"ack deadline {ctx.pubsub_stream.ack_deadline_secs}s"
+        )
+
+    get_transforms(ctx)  # build the shared plugin registry once, before Workers
+
+    applied = configure_magick(ctx)  # shared by all threads of this process
+    ctx._logger.info(f"ImageMagick resource limits: {applied}")
 
     # ensure existence of I/O directories
     ctx.INCOMING_DIRP.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,193 @@
+import time
+from threading import Lock
+from datetime import timedelta
+from collections import defaultdict
+from typing import DefaultDict, Dict, NamedTuple, Optional, Tuple
+
+from photon.demo_util.common.messages import ResultNT
+from photon.demo_util.common.stats import LogHistogram
+from photon.demo_util.common.context_base import ContextBase
+
+QUEUED = "queued"  # queue wait: queued on the workq until a Worker takes it
+WORK = "work"  # Worker time: archive, transforms and move
+END = "end"  # end to end: start until Results handles it
+TRANSFORM_PREFIX = "transform:"  # per transform plugin
+RECENT_SECS = 60  # recent(): the last 60 to 120 secs
+
+
+class SnapshotNT(NamedTuple):
+    """
+    Histograms of finished files over a period.
+
+    """
+
+    secs: float
+    count: int
+    histogramsd: Dict[str, LogHistogram]
+    rejects: int
+    size: int
+
+
+SnapshotNT.secs.__doc__ = "float (field 0): Length of the period in secs."
+SnapshotNT.count.__doc__ = "int (field 1): Files finished in the period."
+SnapshotNT.histogramsd.__doc__ = "Dict (field 2): Latency histograms in secs by name."
+SnapshotNT.rejects.__doc__ = "int (field 3): Invalid files among them."
+SnapshotNT.size.__doc__ = "int (field 4): Bytes of the files when queued."
+
+
+class _Period:
+    def __init__(self) -> None:
+        self.begin = time.monotonic()
+        self.count = 0
+        self.rejects = 0
+        self.size = 0
+        self.histogramsd: DefaultDict[str, LogHistogram] = defaultdict(LogHistogram)
+
+    def record(self, name: str, td: timedelta) -> None:
+        self.histogramsd[name].record(td.total_seconds())
+
+    def snapshot(self, *others: "_Period") -> SnapshotNT:
+        histogramsd = {k: v.copy() for k, v in self.histogramsd.items()}
+        count, rejects, size = self.count, self.rejects, self.size
+
+        for other in others:  # later periods
+            for k, v in other.histogramsd.items():
+                if k in histogramsd:
+                    histogramsd[k].merge(v)
+                else:
+                    histogramsd[k] = v.copy()
+
+            count += other.count
+            rejects += other.rejects
+            size += other.size
+
+        secs = time.monotonic() - self.begin
+
+        return SnapshotNT(secs, count, histogramsd, rejects, size)
+
+
+class MetricsDemo:
+    """
+    Keep latency histograms of finished files in fixed memory.
+
+    Results records queue wait, work time, the time of each transform and
+    end-to-end time for every file, both since start and for the current
+    window. Reading the window starts a new one, so each health check reports
+    the files finished since the last. A separate recent period, rotated every
+    RECENT_SECS, serves readers that must not reset the window, such as the
+    metrics endpoint.
+
+    Workers also report when they start and finish a file, for busy/idle
+    worker counts.
+
+    """
+
+    def __init__(self, ctx: ContextBase) -> None:
+        """
+        Args:
+            ctx: The Context object.
+        """
+        self._lock = Lock()  # updated by Results and Workers, read by others
+        self._cumulative = _Period()
+        self._window = _Period()
+        self._recent = _Period()
+        self._previous: Optional[_Period] = None
+        self._workers = 0
+        self._busy = 0
+
+    def _rotate_recent(self) -> None:
+        age = time.monotonic() - self._recent.begin
+
+        if age >= RECENT_SECS:  # a period with no records in it is dropped
+            self._previous = self._recent if age < 2 * RECENT_SECS else None
+            self._recent = _Period()
+
+    def add_workers(self, count: int) -> None:
+        """
+        Count Workers starting (positive) or exiting (negative).
+
+        Args:
+            count: The change in the number of Workers.
+        """
+        with self._lock:
+            self._workers += count
+
+    def begin_work(self) -> None:
+        """
+        Count a Worker as busy.
+
+        """
+        with self._lock:
+            self._busy += 1
+
+    def end_work(self) -> None:
+        """
+        Count a Worker as idle again.
+
+        """
+        with self._lock:
+            self._busy -= 1
+
+    def workers(self) -> Tuple[int, int]:
+        """
+        Get the number of busy and idle Workers.
+
+        """
+        with self._lock:
+            return self._busy, self._workers - self._busy
+
+    def record(self, resultnt: ResultNT, finishtd: timedelta) -> None:
+        """
+        Record a finished file.
+
+        Args:
+            resultnt: The result from a Worker.
+            finishtd: The end-to-end time.
+        """
+        with self._lock:
+            self._rotate_recent()
+
+            for period in (self._cumulative, self._window, self._recent):
+                period.count += 1
+                period.rejects += 0 if resultnt.valid else 1
+                period.size += resultnt.size
+                period.record(QUEUED, resultnt.beginworktd - resultnt.queuedtd)
+                period.record(WORK, resultnt.endworktd - resultnt.beginworktd)
+                period.record(END, finishtd)
+
+                for transformnt in resultnt.transforms:
+                    period.histogramsd[TRANSFORM_PREFIX + transformnt.name].record(
+                        transformnt.secs
+                    )
+
+    def cumulative(self) -> SnapshotNT:
+        """
+        Get the histograms since start.
+
+        """
+        with self._lock:
+            return self._cumulative.snapshot()
+
+    def recent(self) -> SnapshotNT:
+        """
+        Get the histograms of the last RECENT_SECS to twice that.
+
+        """
+        with self._lock:
+            self._rotate_recent()
+
+            if self._previous is None:
+                return self._recent.snapshot()
+
+            return self._previous.snapshot(self._recent)
+
+    def window(self) -> SnapshotNT:
+        """
+        Get the histograms of the current window and start a new window.
+
+        """
+        with self._lock:
+            snapshotnt = self._window.snapshot()
+            self._window = _Period()
+
+        return snapshotnt
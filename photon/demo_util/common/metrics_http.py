@@ -0,0 +1,204 @@
+import os
+import resource
+from threading import Thread
+from typing import Any, Dict, List, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.metrics import END, QUEUED, WORK, TRANSFORM_PREFIX
+
+METRIC_PREFIX = "photon_demo_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _resident_bytes(pid: str = "self") -> int:
+    try:  # Linux: current resident set size
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):  # elsewhere: the peak, in KB
+        if pid != "self":
+            return 0  # gone, or not Linux
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _Lines:
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+
+    def metric(
+        self, name: str, kind: str, help: str, *samples: Tuple[str, Any]
+    ) -> None:
+        self.lines.append(f"# HELP {METRIC_PREFIX}{name} {help}")
+        self.lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+
+        for suffix_labels, value in samples:
+            self.lines.append(f"{METRIC_PREFIX}{name}{suffix_labels} {value}")
+
+
+def render_metrics(ctx: ContextBase) -> str:
+    """
+    Render the metrics in the Prometheus text exposition format.
+
+    Counters and latency sums and counts are since start; quantiles and
+    images/sec cover the recent period of MetricsDemo (60 to 120 secs).
+
+    Args:
+        ctx: The Context object.
+
+    Returns:
+        The metrics page.
+    """
+    cumulative = ctx.metrics.cumulative()
+    recent = ctx.metrics.recent()
+    busy, idle = ctx.metrics.workers()
+    out = _Lines()
+
+    rate = f"{recent.count / max(recent.secs, 1.0):.3f}"
+
+    for name, kind, help, value in (
+        ("workq_depth", "gauge", "Files waiting on the work queue.", ctx.workq.qsize()),
+        ("workq_capacity", "gauge", "Max files on the work queue.", ctx.workq.maxsize),
+        ("resultq_depth", "gauge", "Results waiting.", ctx.resultq.qsize()),
+        ("images_total", "counter", "Files finished.", cumulative.count),
+        ("rejects_total", "counter", "Invalid files finished.", cumulative.rejects),
+        ("bytes_total", "counter", "Bytes of files finished.", cumulative.size),
+        ("images_per_second", "gauge", "Files finished per sec.", rate),
+    ):
+        out.metric(name, kind, help, ("", value))
+
+    out.metric(
+        "workers",
+        "gauge",
+        "Workers by state.",
+        ('{state="busy"}', busy),
+        ('{state="idle"}', idle),
+    )
+
+    for name, names, help in (
+        ("latency_seconds", (QUEUED, WORK, END), "Latency by stage."),
+        ("transform_seconds", None, "Wall clock time by transform plugin."),
+    ):
+        samples: List[Tuple[str, Any]] = []
+
+        for key, histogram in sorted(cumulative.histogramsd.items()):
+            if names is None and key.startswith(TRANSFORM_PREFIX):
+                label = f'transform="{_escape(key[len(TRANSFORM_PREFIX):])}"'
+            elif names is not None and key in names:
+                label = f'stage="{key}"'
+            else:
+                continue
+
+            recent_histogram = recent.histogramsd.get(key)
+
+            for quantile in QUANTILES:
+                value = (
+                    recent_histogram.percentile(quantile * 100)
+                    if recent_histogram
+                    else "NaN"
+                )
+                samples.append((f'{{{label},quantile="{quantile:g}"}}', value))
+
+            samples.append((f"_sum{{{label}}}", histogram.total))
+            samples.append((f"_count{{{label}}}", histogram.count))
+
+        out.metric(name, "summary", help, *samples)
+
+    if ctx.pool == "process":  # ImageMagick runs in the children
+        pool_bytes = sum(_resident_bytes(str(p)) for p in ctx.process_pool.pids())
+        help = "Resident memory size of the pool's child processes."
+        out.metric("pool_resident_memory_bytes", "gauge", help, ("", pool_bytes))
+
+    cpu = os.times()
+    out.lines.append("# HELP process_resident_memory_bytes Resident memory size.")
+    out.lines.append("# TYPE process_resident_memory_bytes gauge")
+    out.lines.append(f"process_resident_memory_bytes {_resident_bytes()}")
+    out.lines.append("# HELP process_cpu_seconds_total User and system CPU time.")
+    out.lines.append("# TYPE process_cpu_seconds_total counter")
+    out.lines.append(f"process_cpu_seconds_total {cpu.user + cpu.system:.3f}")
+
+    return "\n".join(out.lines) + "\n"
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    """
+    Parse a page in the Prometheus text exposition format.
+
+    Args:
+        text: The page, as rendered by render_metrics().
+
+    Returns:
+        The value of each sample by its name and labels as written, ex:
+        'photon_demo_latency_seconds_sum{stage="queued"}'. NaN for "NaN".
+    """
+    samplesd = {}
+
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            series, _, value = line.rpartition(" ")
+            samplesd[series] = float(value)
+
+    return samplesd
+
+
+class MetricsServerDemo(Thread):
+    """
+    Serve Prometheus text-format metrics over HTTP.
+
+    GET /metrics renders the queue depths, worker states, counters and
+    latency quantiles on the request's own thread. Reading them only takes the
+    MetricsDemo lock for as long as a copy, so a slow or stuck scraper never
+    blocks Incoming, the Workers or Results.
+
+    Not a startfast party: it serves from start until the process exits.
+
+    """
+
+    def __init__(self, ctx: ContextBase) -> None:
+        """
+        Args:
+            ctx: The Context object.
+        """
+        super().__init__(daemon=True)  # terminate together w main thread
+        self._logger = ctx._logger
+        self._logger.info(
+            f"MetricsServer: host {ctx.metrics_host}; port {ctx.metrics_port}"
+        )
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = render_metrics(ctx).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                ctx._logger.debug(f"metrics {self.address_string()}: {format % args}")
+
+        # bind now, so a port in use fails the command at startup
+        address = (ctx.metrics_host, ctx.metrics_port)
+        self._server = ThreadingHTTPServer(address, Handler)
+        self._server.daemon_threads = True
+
+    def run(self) -> None:
+        """
+        Run the thread.
+
+        """
+        self._logger.info("MetricsServer running")
+
+        try:
+            self._server.serve_forever()
+        except Exception as e:  # never fail the pipeline for its metrics
+            self._logger.error(f"metrics server failed: {e}")
@@ -0,0 +1,102 @@
+import logging
+import multiprocessing
+from pathlib import Path
+from types import SimpleNamespace
+from typing import cast, Any, Dict, List, Optional
+
+from photon.demo_util.common.handler import HandlerDemo, HandledNT
+from photon.demo_util.common.magick import configure_magick
+from photon.demo_util.common.context_base import ContextBase
+
+# lower case ctx attributes needed by HandlerDemo in a child process
+CHILD_SETTINGS = [
+    "archive_mode",
+    "cache_mb",
+    "instrument",
+    "magick_threads",
+    "magick_memory_mb",
+    "magick_map_mb",
+    "magick_area_mp",
+]
+
+_handler: Optional[HandlerDemo] = None  # one per child process
+
+
+def _init_child(settingsd: Dict[str, Any]) -> None:
+    global _handler
+
+    logging.basicConfig(
+        level=settingsd["LOG_LEVEL"], format=settingsd["LOG_FORMAT"], style="{"
+    )
+    childctx = cast(ContextBase, SimpleNamespace(**settingsd))
+    configure_magick(childctx)  # limits are per process
+    _handler = HandlerDemo(childctx)
+
+
+def _handle_in_child(filep: Path, valid: bool) -> HandledNT:
+    return _handler.handle(filep, valid)  # type: ignore
+
+
+class ProcessPoolDemo:
+    """
+    Run the Worker's file handling in a pool of processes.
+
+    Worker threads still take WorkNT from the workq, arm the watchdog and put
+    ResultNT on the resultq - they block in `handle()` while a child process
+    archives, transforms and moves the file. Only the filepath, the valid flag
+    and the result cross the process boundary, and the pluggy dispatch and
+    Wand glue run outside the parent's GIL.
+
+    An exception in a child is re-raised in the Worker thread, which sets the
+    failfast event as usual; a hung child trips the watchdog.
+
+    The pool has max-workers processes, so Workers added by the Supervisor
+    always have one to hand their files to.
+
+    """
+
+    def __init__(self, ctx: ContextBase) -> None:
+        """
+        Args:
+            ctx: The Context object.
+        """
+        self._logger = ctx._logger
+        self._logger.info(f"ProcessPool: {ctx.max_workers} processes")
+
+        settingsd = {k: v for k, v in vars(ctx).items() if k.isupper()}
+        settingsd.update({k: getattr(ctx, k) for k in CHILD_SETTINGS})
+
+        mp_ctx = multiprocessing.get_context("spawn")  # no fork w threads running
+        self._pool = mp_ctx.Pool(
+            ctx.max_workers, initializer=_init_child, initargs=(settingsd,)
+        )
+
+    def handle(self, filep: Path, valid: bool) -> HandledNT:
+        """
+        Handle a file in a child process.
+
+        Args:
+            filep: The incoming file.
+            valid: File valid T/F - invalid files are only moved.
+
+        Returns:
+            The destination directory, completed transforms and cache hit T/F.
+        """
+        return self._pool.apply(_handle_in_child, (filep, valid))  # type: ignore
+
+    def pids(self) -> List[int]:
+        """
+        Get the process IDs of the children.
+
+        """
+        return [process.pid for process in self._pool._pool]  # type: ignore
+
+    def close(self) -> None:
+        """
+        Stop the child processes once they are idle and wait for them.
+
+        Their CPU time and peak RSS then count in RUSAGE_CHILDREN.
+
+        """
+        self._pool.close()
+        self._pool.join()
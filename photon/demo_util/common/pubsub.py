@@ -0,0 +1,338 @@
+import json
+import time
+import select
+import socket
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ADDRESS = "localhost:8085"  # the port of the Pub/Sub emulator
+ACK_FLUSH_SECS = 1.0  # well within the ack deadline
+CONNECT_TIMEOUT_SECS = 10
+
+
+def parse_address(address: str) -> Tuple[str, Any]:
+    """
+    Parse a stand-in server address.
+
+    Args:
+        address: "host:port", or the path of a Unix socket - anything with a
+            "/" in it.
+
+    Returns:
+        ("unix", path) or ("tcp", (host, port)).
+    """
+    if "/" in address:
+        return "unix", address
+
+    host, _, port = address.rpartition(":")
+
+    return "tcp", (host or "localhost", int(port))
+
+
+def _connect(address: str) -> socket.socket:
+    family, sockaddr = parse_address(address)
+
+    if family == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT_SECS)
+        sock.connect(sockaddr)
+    else:
+        sock = socket.create_connection(sockaddr, timeout=CONNECT_TIMEOUT_SECS)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    sock.settimeout(None)
+
+    return sock
+
+
+class PubSubClient:
+    """
+    Unary requests to the Pub/Sub stand-in: one round trip each.
+
+    """
+
+    def __init__(self, address: str) -> None:
+        """
+        Args:
+            address: "host:port", or the path of a Unix socket.
+        """
+        self._sock = _connect(address)
+        self._rfile = self._sock.makefile("rb")
+
+    def _call(self, requestd: Dict[str, Any]) -> Dict[str, Any]:
+        self._sock.sendall(json.dumps(requestd).encode() + b"\n")
+        line = self._rfile.readline()
+
+        if not line:
+            raise ConnectionError("pubsub server closed the connection")
+
+        responsed: Dict[str, Any] = json.loads(line)
+
+        if "error" in responsed:
+            raise ValueError(responsed["error"])
+
+        return responsed
+
+    def publish(self, datas: List[Any]) -> List[str]:
+        """
+        Publish messages.
+
+        Args:
+            datas: The JSON-serializable data of each message.
+
+        Returns:
+            The message IDs.
+        """
+        return self._call({"op": "publish", "datas": datas})["ids"]  # type: ignore
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the subscription counters.
+
+        """
+        return self._call({"op": "stats"})["stats"]  # type: ignore
+
+    def close(self) -> None:
+        """
+        Close the connection.
+
+        """
+        self._rfile.close()
+        self._sock.close()
+
+
+class PubSubStream:
+    """
+    Streaming pull from the Pub/Sub stand-in, with flow control.
+
+    The server sends messages while fewer than `max_outstanding` are leased
+    to this stream - received and not yet acked or nacked - so the client
+    never holds more than it can work on. Leases held for half the ack
+    deadline are extended by `extend_leases()`, as the Pub/Sub client
+    libraries do, so slow work is not redelivered while in progress.
+
+    A redelivery of a message still in work can be joined to the delivery
+    being worked on: its lease is extended too, and it is acked or nacked
+    along with it.
+
+    `receive()` is called by a single thread; `ack()`, `nack()`, `join()` and
+    `extend_leases()` may be called from any.
+
+    """
+
+    def __init__(self, address: str, max_outstanding: int) -> None:
+        """
+        Args:
+            address: "host:port", or the path of a Unix socket.
+            max_outstanding: The most messages leased at once.
+
+        Raises:
+            ConnectionError if the server does not open the stream.
+        """
+        self._sock = _connect(address)
+        self._lock = Lock()
+        self._buffer = b""
+        self._leasedd: Dict[str, float] = {}  # ackid: lease start or extension
+        self._joinedd: Dict[str, List[str]] = {}  # ackid: redeliveries joined to it
+        self.ack_requests = 0
+        self.acked = 0
+        self._send({"op": "stream", "max_outstanding": max_outstanding})
+        openedds = self._read(CONNECT_TIMEOUT_SECS)
+
+        if not openedds:
+            raise ConnectionError("pubsub server did not open the stream")
+
+        self.ack_deadline_secs = openedds[0]["ack_deadline_secs"]
+        self._early = openedds[1:]  # messages read along with the opening
+
+    def _send(self, requestd: Dict[str, Any]) -> None:
+        with self._lock:
+            self._sock.sendall(json.dumps(requestd).encode() + b"\n")
+
+    def _read(self, timeout: float) -> List[Dict[str, Any]]:
+        readable, _, _ = select.select([self._sock], [], [], timeout)
+
+        if not readable:
+            return []
+
+        data = self._sock.recv(1 << 16)
+
+        if not data:
+            raise ConnectionError("pubsub server closed the stream")
+
+        *lines, self._buffer = (self._buffer + data).split(b"\n")
+
+        return [json.loads(line) for line in lines]
+
+    def receive(self, timeout: float) -> List[Dict[str, Any]]:
+        """
+        Receive the messages sent by the server, waiting up to a timeout.
+
+        Args:
+            timeout: Secs to wait if none have arrived.
+
+        Returns:
+            The deliveries, maybe none: ackid, id, attempt and data.
+        """
+        sentds, self._early = self._early or self._read(timeout), []
+        deliveries = [d for sentd in sentds for d in sentd["messages"]]
+        now = time.monotonic()
+
+        with self._lock:
+            self._leasedd.update((d["ackid"], now) for d in deliveries)
+
+        return deliveries
+
+    def ack(self, ackids: List[str]) -> None:
+        """
+        Acknowledge deliveries in one request.
+
+        Args:
+            ackids: The ack IDs - redeliveries joined to them are acked too.
+        """
+        with self._lock:
+            ackids = self._end_leases(ackids)
+            self.ack_requests += 1
+            self.acked += len(ackids)
+
+        self._send({"op": "ack", "ackids": ackids})
+
+    def nack(self, ackids: List[str]) -> None:
+        """
+        Give up deliveries for prompt redelivery.
+
+        Args:
+            ackids: The ack IDs - redeliveries joined to them are nacked too.
+        """
+        with self._lock:
+            ackids = self._end_leases(ackids)
+
+        self._send({"op": "modack", "ackids": ackids, "secs": 0})
+
+    def _end_leases(self, ackids: List[str]) -> List[str]:
+        ended = []
+
+        for ackid in ackids:
+            ended.append(ackid)
+            ended.extend(self._joinedd.pop(ackid, []))
+
+        for ackid in ended:
+            self._leasedd.pop(ackid, None)
+
+        return ended
+
+    def join(self, ackid: str, original: str) -> bool:
+        """
+        Join a redelivery to the delivery of the same message being worked on,
+        to be acked or nacked with it.
+
+        Args:
+            ackid: The ack ID of the redelivery.
+            original: The ack ID of the delivery being worked on.
+
+        Returns:
+            False if the original is no longer leased - already acked or
+            nacked - and the redelivery was not joined.
+        """
+        with self._lock:
+            if original not in self._leasedd:
+                return False
+
+            self._joinedd.setdefault(original, []).append(ackid)
+
+        return True
+
+    def extend_leases(self) -> None:
+        """
+        Extend the leases of messages held for half the ack deadline or more.
+
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            ackids = [
+                ackid
+                for ackid, since in self._leasedd.items()
+                if now - since >= self.ack_deadline_secs / 2
+            ]
+            self._leasedd.update((ackid, now) for ackid in ackids)
+
+        if ackids:
+            self._send(
+                {"op": "modack", "ackids": ackids, "secs": self.ack_deadline_secs}
+            )
+
+    def close(self) -> None:
+        """
+        Close the stream - leases are left to expire on the server.
+
+        """
+        self._sock.close()
+
+
+class AckBatcher:
+    """
+    Collect acks and send them in batches rather than one request each.
+
+    A batch is sent when it is full, and by `flush_due()` once its oldest ack
+    has waited ACK_FLUSH_SECS - well within the ack deadline. A batch of 1
+    sends every ack at once. `before_flush`, if given, is called before each
+    batch is sent, ex: to commit the ledger rows of the files it acks - if it
+    raises, the batch is not sent.
+
+    Not thread-safe: used by the Results thread only.
+
+    """
+
+    def __init__(
+        self,
+        stream: PubSubStream,
+        batch: int,
+        before_flush: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Args:
+            stream: The stream the messages came from.
+            batch: The most acks per request.
+            before_flush: Called before each batch is sent.
+        """
+        self._stream = stream
+        self._batch = batch
+        self._before_flush = before_flush
+        self._ackids: List[str] = []
+        self._oldest = 0.0
+
+    def add(self, ackid: str) -> None:
+        """
+        Add an ack, sending the batch if it is full.
+
+        Args:
+            ackid: The ack ID.
+        """
+        if not self._ackids:
+            self._oldest = time.monotonic()
+
+        self._ackids.append(ackid)
+
+        if len(self._ackids) >= self._batch:
+            self.flush()
+
+    def flush_due(self) -> None:
+        """
+        Send the batch if its oldest ack has waited long enough.
+
+        """
+        if self._ackids and time.monotonic() - self._oldest >= ACK_FLUSH_SECS:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Send the batch, if any.
+
+        """
+        if self._ackids:
+            if self._before_flush:
+                self._before_flush()
+
+            self._stream.ack(self._ackids)
+            self._ackids = []
@@ -0,0 +1,389 @@
+import os
+import json
+import time
+import heapq
+import logging
+import itertools
+import socketserver
+from collections import defaultdict, deque
+from threading import Condition, Event, Thread
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from photon.demo_util.common.pubsub import parse_address
+
+ACK_DEADLINE_SECS = 10  # as for Pub/Sub, the lease of each delivery
+STREAM_BATCH = 100  # max messages per streamed line
+STREAM_WAIT_SECS = 1.0  # a stream notices its client is gone this often
+STATS_INTERVAL_SECS = 10
+
+
+class SubscriptionDemo:
+    """
+    The messages, leases and counters of a single subscription.
+
+    A delivered message is leased to the stream that pulled it until its ack
+    deadline. An ack deletes it; a modack extends the lease, or with 0 secs
+    (a nack) ends it. When a lease expires the message is redelivered -
+    first, ahead of newer messages - with a new ack ID, so a late ack of the
+    previous delivery is ignored.
+
+    Each stream has flow control: it is sent messages only while it holds
+    fewer than its max outstanding leases. Acks, nacks and expiries free
+    that credit.
+
+    Thread-safe: shared by every connection of the server.
+
+    """
+
+    def __init__(
+        self,
+        ack_deadline_secs: float = ACK_DEADLINE_SECS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            ack_deadline_secs: Secs a delivery is leased before redelivery.
+            clock: The time source for lease expiries.
+        """
+        self.ack_deadline_secs = ack_deadline_secs
+        self._clock = clock
+        self._cond = Condition()
+        self._ready: Deque[str] = deque()  # message ids
+        self._datad: Dict[str, Any] = {}  # message id: data, until acked
+        self._attemptsd: Dict[str, int] = defaultdict(int)
+        self._leasesd: Dict[str, Tuple[str, float, int]] = {}  # ackid: lease
+        self._expiries: List[Tuple[float, str]] = []  # heap; stale when modacked
+        self._outstandingd: Dict[int, int] = defaultdict(int)  # stream: leases
+        self._ids = itertools.count(1)
+        self.statsd: Dict[str, int] = defaultdict(int)
+
+    def publish(self, datas: List[Any]) -> List[str]:
+        """
+        Publish messages.
+
+        Args:
+            datas: The JSON-serializable data of each message.
+
+        Returns:
+            The message IDs.
+        """
+        with self._cond:
+            msgids = [str(next(self._ids)) for _ in datas]
+            self._datad.update(zip(msgids, datas))
+            self._ready.extend(msgids)
+            self.statsd["published"] += len(datas)
+            self._cond.notify_all()
+
+        return msgids
+
+    def _end_lease(self, ackid: str) -> Optional[str]:
+        lease = self._leasesd.pop(ackid, None)
+
+        if lease is None:
+            return None
+
+        msgid, _, stream = lease
+        self._outstandingd[stream] -= 1
+
+        return msgid
+
+    def _expire(self, now: float) -> None:
+        while self._expiries and self._expiries[0][0] <= now:
+            expiry, ackid = heapq.heappop(self._expiries)
+            lease = self._leasesd.get(ackid)
+
+            if lease and lease[1] == expiry:  # not extended since
+                self._ready.appendleft(self._end_lease(ackid))  # type: ignore
+                self.statsd["expired"] += 1
+                self._cond.notify_all()
+
+    def take(
+        self,
+        stream: int,
+        max_messages: int,
+        max_outstanding: Optional[int] = None,
+        timeout: float = 0.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Lease messages to a stream, waiting for some if there are none.
+
+        Args:
+            stream: The stream ID, 0 for unary pulls.
+            max_messages: The most messages to return.
+            max_outstanding: Flow control - the most leases the stream may
+                hold, or None for no limit.
+            timeout: Secs to wait for a message and for credit.
+
+        Returns:
+            The deliveries, maybe none: ackid, id, attempt and data.
+        """
+        deadline = self._clock() + timeout
+
+        with self._cond:
+            while True:
+                now = self._clock()
+                self._expire(now)
+                room = max_messages
+
+                if max_outstanding is not None:
+                    room = min(room, max_outstanding - self._outstandingd[stream])
+
+                if room > 0 and self._ready:
+                    break
+
+                if now >= deadline:
+                    return []
+
+                wait = deadline - now
+
+                if self._expiries:  # wake to redeliver
+                    wait = min(wait, max(0.0, self._expiries[0][0] - now))
+
+                self._cond.wait(wait)
+
+            deliveries = []
+            expiry = now + self.ack_deadline_secs
+
+            for _ in range(min(room, len(self._ready))):
+                msgid = self._ready.popleft()
+                ackid = f"{msgid}-{next(self._ids)}"
+                self._attemptsd[msgid] += 1
+                self._leasesd[ackid] = (msgid, expiry, stream)
+                heapq.heappush(self._expiries, (expiry, ackid))
+                self._outstandingd[stream] += 1
+                deliveries.append(
+                    {
+                        "ackid": ackid,
+                        "id": msgid,
+                        "attempt": self._attemptsd[msgid],
+                        "data": self._datad[msgid],
+                    }
+                )
+
+            self.statsd["delivered"] += len(deliveries)
+            self.statsd["redelivered"] += sum(d["attempt"] > 1 for d in deliveries)
+
+        return deliveries
+
+    def ack(self, ackids: List[str]) -> int:
+        """
+        Acknowledge deliveries: their messages are done and deleted.
+
+        Args:
+            ackids: The ack IDs.
+
+        Returns:
+            The number acked - late acks of expired deliveries do not count.
+        """
+        with self._cond:
+            acked = 0
+
+            for ackid in ackids:
+                msgid = self._end_lease(ackid)
+
+                if msgid is not None:
+                    del self._datad[msgid]
+                    del self._attemptsd[msgid]
+                    acked += 1
+
+            self.statsd["ack_requests"] += 1
+            self.statsd["acked"] += acked
+            self.statsd["late_acks"] += len(ackids) - acked
+            self._cond.notify_all()
+
+        return acked
+
+    def modack(self, ackids: List[str], secs: float) -> int:
+        """
+        Extend the leases of deliveries, or with 0 secs end them (a nack).
+
+        Args:
+            ackids: The ack IDs.
+            secs: Secs from now until the new ack deadline.
+
+        Returns:
+            The number of leases modified.
+        """
+        with self._cond:
+            modified = 0
+            expiry = self._clock() + secs
+
+            for ackid in ackids:
+                lease = self._leasesd.get(ackid)
+
+                if lease is None:
+                    continue
+
+                modified += 1
+
+                if secs > 0:
+                    self._leasesd[ackid] = (lease[0], expiry, lease[2])
+                    heapq.heappush(self._expiries, (expiry, ackid))
+                else:
+                    self._ready.appendleft(self._end_lease(ackid))  # type: ignore
+                    self.statsd["nacked"] += 1
+
+            self.statsd["modack_requests"] += 1
+            self._cond.notify_all()
+
+        return modified
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the counters and the current backlog and leases.
+
+        """
+        with self._cond:
+            statsd = dict(self.statsd)
+            statsd["backlog"] = len(self._ready)
+            statsd["outstanding"] = len(self._leasesd)
+
+        return statsd
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_ServerMixin"
+
+    def _send(self, responsed: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(responsed).encode() + b"\n")
+        self.wfile.flush()
+
+    def _dispatch(self, requestd: Dict[str, Any]) -> Dict[str, Any]:
+        subscription = self.server.subscription
+        op = requestd.get("op")
+
+        if op == "publish":
+            return {"ids": subscription.publish(requestd["datas"])}
+
+        if op == "pull":
+            return {"messages": subscription.take(0, requestd.get("max", 1))}
+
+        if op == "ack":
+            return {"acked": subscription.ack(requestd["ackids"])}
+
+        if op == "modack":
+            return {
+                "modified": subscription.modack(requestd["ackids"], requestd["secs"])
+            }
+
+        if op == "stats":
+            return {"stats": subscription.stats()}
+
+        return {"error": f"unknown op: {op}"}
+
+    def _read_acks(self, closed_ev: Event) -> None:
+        try:
+            for line in self.rfile:  # acks and modacks: no responses on a stream
+                self._dispatch(json.loads(line))
+        except (OSError, ValueError):
+            pass
+        finally:
+            closed_ev.set()
+
+    def _stream(self, requestd: Dict[str, Any]) -> None:
+        subscription = self.server.subscription
+        stream = next(self.server.stream_ids)
+        max_outstanding = requestd["max_outstanding"]
+        closed_ev = Event()
+        self._send({"ack_deadline_secs": subscription.ack_deadline_secs})
+        Thread(target=self._read_acks, args=(closed_ev,), daemon=True).start()
+        self.server.logger.info(f"stream {stream}: max outstanding {max_outstanding}")
+
+        while not closed_ev.is_set():
+            deliveries = subscription.take(
+                stream, STREAM_BATCH, max_outstanding, STREAM_WAIT_SECS
+            )
+
+            if deliveries:
+                self._send({"messages": deliveries})
+
+        self.server.logger.info(f"stream {stream}: closed")
+
+    def handle(self) -> None:
+        try:
+            for line in self.rfile:
+                requestd = json.loads(line)
+
+                if requestd.get("op") == "stream":  # the rest of the connection
+                    self._stream(requestd)
+                    return
+
+                self._send(self._dispatch(requestd))
+        except (OSError, ValueError) as e:
+            self.server.logger.warning(f"connection dropped: {e}")
+
+
+class _ServerMixin:
+    subscription: SubscriptionDemo
+    stream_ids: Any
+    logger: logging.Logger
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _TCPServer(_ServerMixin, socketserver.ThreadingTCPServer):
+    pass
+
+
+class _UnixServer(_ServerMixin, socketserver.ThreadingUnixStreamServer):
+    pass
+
+
+class PubSubServerDemo(Thread):
+    """
+    A local stand-in for a Pub/Sub subscription, over TCP or a Unix socket.
+
+    One subscription, no topics. The protocol is newline-delimited JSON:
+    requests {"op": "publish" | "pull" | "ack" | "modack" | "stats", ...} each
+    get a response, and {"op": "stream", "max_outstanding": N} turns the
+    connection into a streaming pull - the server replies with its ack
+    deadline, then sends batches of messages while the client holds fewer
+    than N leases, and the client sends acks and modacks without responses.
+
+    """
+
+    def __init__(
+        self, logger: logging.Logger, address: str, ack_deadline_secs: float
+    ) -> None:
+        """
+        Args:
+            logger: The logger.
+            address: "host:port", or the path of a Unix socket.
+            ack_deadline_secs: Secs a delivery is leased before redelivery.
+        """
+        super().__init__(daemon=True)  # terminate together w main thread
+        self._logger = logger
+        self.subscription = SubscriptionDemo(ack_deadline_secs)
+        family, sockaddr = parse_address(address)
+
+        if family == "unix":
+            try:
+                os.unlink(sockaddr)  # left by a previous server
+            except FileNotFoundError:
+                pass
+
+            server: _ServerMixin = _UnixServer(sockaddr, _Handler)
+        else:
+            server = _TCPServer(sockaddr, _Handler)
+
+        server.subscription = self.subscription
+        server.stream_ids = itertools.count(1)
+        server.logger = logger
+        self._server = server
+        self._logger.info(f"PubSubServer: {address}; ack deadline {ack_deadline_secs}s")
+
+    def run(self) -> None:
+        """
+        Run the thread.
+
+        """
+        self._server.serve_forever()  # type: ignore
+
+    def log_stats(self) -> None:
+        """
+        Log the subscription counters every STATS_INTERVAL_SECS, forever.
+
+        """
+        while True:
+            time.sleep(STATS_INTERVAL_SECS)
+            self._logger.info(f"pubsub stats: {self.subscription.stats()}")
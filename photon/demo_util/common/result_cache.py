@@ -0,0 +1,238 @@
+import os
+import errno
+import fcntl
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from threading import Lock
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from photon.demo_util.common.context_base import ContextBase
+
+MB = 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+_cache_lock = Lock()
+_caches = {}  # type: ignore  # signature: cache - one per process
+
+
+class ResultCacheDemo:
+    """
+    Content-addressed cache of transformed images.
+
+    Keyed by a BLAKE2b hash of the original file bytes and the signature of the
+    transform chain (plugin names, versions and source hashes in run order), so
+    re-delivered images - retries, or the same image under another name - are
+    served by a hardlink (or a copy across filesystems) instead of being
+    transformed again.
+
+    Entries live in MODIFIED_DIRP/.cache and are evicted least recently used
+    first once the cache exceeds its size. The directory is the only state, so
+    the limit holds across the processes of a process pool and restarts: the
+    total size is kept in `.bytes` and updated under an exclusive `flock` of
+    `.lock`, and eviction scans the entries under the same lock. Recency is the
+    mtime of a `<key>.used` stamp next to the entry, touched on every hit - not
+    of the entry itself, whose inode is shared with the outputs linked to it.
+    A hit is not locked: an entry evicted meanwhile is a miss.
+
+    """
+
+    def __init__(self, ctx: ContextBase, signature: str) -> None:
+        """
+        Args:
+            ctx: The Context object.
+            signature: The transform chain signature.
+        """
+        logname = Path(__file__).stem
+        self._logger = logging.getLogger(f"{ctx.PACKAGE_NAME}.{logname}")
+        self._signature = signature.encode()
+        self._max_bytes = ctx.cache_mb * MB
+        self._cache_dirp = ctx.MODIFIED_DIRP / ".cache"
+        self._bytes_filep = self._cache_dirp / ".bytes"
+        self._load()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        self._cache_dirp.mkdir(parents=True, exist_ok=True)
+
+        with open(self._cache_dirp / ".lock", "a") as f:  # per call: threads too
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield  # closing the file releases the lock
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        entries = []
+
+        for entryp in self._cache_dirp.glob("??/*"):
+            if "." in entryp.name:  # skip stamps and in-flight temp files
+                continue
+
+            try:
+                st = entryp.stat()
+            except FileNotFoundError:  # evicted since listed
+                continue
+
+            try:
+                used = entryp.with_name(f"{entryp.name}.used").stat().st_mtime
+            except FileNotFoundError:  # no stamp: as old as the entry
+                used = st.st_mtime
+
+            entries.append((used, entryp.name, st.st_size))
+
+        return sorted(entries)  # least recently used first
+
+    def _read_total(self) -> int:
+        try:
+            return int(self._bytes_filep.read_text())
+        except (OSError, ValueError):  # missing or torn: recount
+            return sum(size for _, _, size in self._scan())
+
+    def _write_total(self, total: int) -> None:
+        tmpp = self._bytes_filep.with_name(f".bytes.{os.getpid()}")
+        tmpp.write_text(str(total))
+        tmpp.replace(self._bytes_filep)
+
+    def _load(self) -> None:
+        with self._locked():  # recount, in case entries were removed by hand
+            entries = self._scan()
+            total = sum(size for _, _, size in entries)
+            self._write_total(total)
+
+        self._logger.info(
+            f"result cache: {len(entries)} entries; "
+            f"{total / MB:.1f} of {self._max_bytes / MB:.0f} MB"
+        )
+
+    def _entryp(self, key: str) -> Path:
+        return self._cache_dirp / key[:2] / key
+
+    def _evict(self, keep: str) -> int:
+        entries = self._scan()
+        total = sum(size for _, _, size in entries)
+
+        for _, key, size in entries:
+            if total <= self._max_bytes:
+                break
+
+            if key == keep:  # just stored
+                continue
+
+            for filep in (self._entryp(key), self._entryp(f"{key}.used")):
+                try:
+                    filep.unlink()
+                except FileNotFoundError:
+                    pass
+
+            total -= size
+
+        return total
+
+    def key(self, filep: Path) -> str:
+        """
+        Hash a file and the transform chain signature.
+
+        Args:
+            filep: The original file.
+
+        Returns:
+            The cache key.
+        """
+        blake = hashlib.blake2b(self._signature, digest_size=20)
+
+        with open(filep, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                blake.update(chunk)
+
+        return blake.hexdigest()
+
+    def fetch(self, key: str, destp: Path) -> bool:
+        """
+        Link or copy a cached result to the destination.
+
+        Args:
+            key: The cache key.
+            destp: The destination file.
+
+        Returns:
+            True on a hit.
+        """
+        entryp = self._entryp(key)
+
+        try:
+            _link_or_copy(entryp, destp)
+        except FileNotFoundError:
+            return False
+
+        try:
+            os.utime(entryp.with_name(f"{key}.used"))  # most recently used
+        except FileNotFoundError:  # evicted since linked
+            pass
+
+        return True
+
+    def store(self, key: str, srcp: Path) -> None:
+        """
+        Add a transformed file to the cache and evict down to the size limit.
+
+        Args:
+            key: The cache key.
+            srcp: The transformed file - linked, so never modify it in place.
+        """
+        entryp = self._entryp(key)
+        entryp.parent.mkdir(parents=True, exist_ok=True)
+        tmpp = entryp.with_name(f".{key}.{os.getpid()}.{id(srcp)}")
+        _link_or_copy(srcp, tmpp)
+        size = tmpp.stat().st_size
+
+        with self._locked():
+            total = self._read_total() + size
+
+            try:
+                total -= entryp.stat().st_size  # replaced
+            except FileNotFoundError:
+                pass
+
+            tmpp.replace(entryp)  # atomic: readers never see a partial entry
+            entryp.with_name(f"{key}.used").touch()
+
+            if total > self._max_bytes:
+                total = self._evict(key)
+
+            self._write_total(total)
+
+
+def _link_or_copy(srcp: Path, destp: Path) -> None:
+    try:
+        destp.unlink()
+    except FileNotFoundError:
+        pass
+
+    try:
+        os.link(srcp, destp)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+
+        shutil.copyfile(srcp, destp)
+
+
+def get_result_cache(ctx: ContextBase, signature: str) -> Optional[ResultCacheDemo]:
+    """
+    Get the process-wide result cache, if one is configured.
+
+    Args:
+        ctx: The Context object.
+        signature: The transform chain signature.
+
+    Returns:
+        The shared cache, or None when `cache_mb` is zero.
+    """
+    if not ctx.cache_mb:
+        return None
+
+    with _cache_lock:
+        if signature not in _caches:
+            _caches[signature] = ResultCacheDemo(ctx, signature)
+
+        return _caches[signature]  # type: ignore
@@ -1,8 +1,11 @@
 import traceback
+from queue import Empty
 from threading import Thread
 
 from photon.common.json_common import JSONCommon
 from photon.common.tuuid_common import TUUIDCommon
+from photon.demo_util.common.ledger import LEDGER_FLUSH_SECS
+from photon.demo_util.common.pubsub import ACK_FLUSH_SECS
 from photon.demo_util.common.messages import ResultNT
 from photon.demo_util.common.context_base import ContextBase
 
@@ -15,6 +18,13 @@ class ResultsDemo(Thread):
     to the logging that you see below. We also use this thread to indicate to our
     Redis cache that the work has completed.
 
+    With the pubsub work source, acks are batched: sent when --ack-batch have
+    collected, or within ACK_FLUSH_SECS of the oldest.
+
+    Each finish is recorded in the ledger, also in batches, rather than as a
+    JSON log line - unless --event-log. Pending rows are committed before any
+    acks are sent, so an acked file is never missing from the ledger.
+
     """
 
     def __init__(self, ctx: ContextBase) -> None:
@@ -29,6 +39,13 @@ class ResultsDemo(Thread):
         self._resultq = ctx.resultq
         self._json = JSONCommon(ctx)
         self._tuuid = TUUIDCommon(ctx)
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._metrics = ctx.metrics
+        self._acker = ctx.acker  # None unless the work source is pubsub
+        self._ledger = ctx.ledger  # None if --no-ledger
+        self._event_log = getattr(ctx, "event_log", True)  # not every cmd
+        self._flush_secs = min(ACK_FLUSH_SECS, LEDGER_FLUSH_SECS)
         self._failfast_ev = ctx.failfast_ev
         self._startfast_br = ctx.startfast_br
 
@@ -36,6 +53,19 @@ class ResultsDemo(Thread):
         nowdt = self._tuuid.get_tza_utcdt()
         finishtd = nowdt - resultnt.startdt
 
+        if resultnt.cachehit:
+            self._cache_hits += 1
+        elif resultnt.transforms:
+            self._cache_misses += 1
+
+        self._metrics.record(resultnt, finishtd)
+
+        if self._ledger:
+            self._ledger.add(resultnt, nowdt, finishtd)
+
+        if not self._event_log:
+            return
+
         message = (
             f"{self._util_cmd} finish:: tuuid: {resultnt.tuuid}; "
             f"finishtd: {finishtd}; destdirp: {resultnt.destdirp}; "
@@ -47,13 +77,35 @@ class ResultsDemo(Thread):
             "event": "finish",
             "util_cmd": self._util_cmd,
             "finishtd": finishtd,
+            "cache_hits": self._cache_hits,
+            "cache_misses": self._cache_misses,
             "message": message,
         }
 
         msgd = resultnt._asdict()
+        msgd["transforms"] = [t._asdict() for t in resultnt.transforms]
         msgd.update(updated)
         self._logger.info(self._json.jsonsafe(msgd))
 
+    def handle_result(self, resultnt: ResultNT) -> None:
+        """
+        Handle one resultq object.
+
+        Called by `run()`, or directly by a command draining the resultq from
+        its main thread.
+
+        Args:
+            resultnt: The result from a Worker.
+        """
+        if isinstance(resultnt, ResultNT):
+            self._log_finish_event(resultnt)
+
+            if self._acker and resultnt.ackid:
+                self._acker.add(resultnt.ackid)
+        else:  # shouldn't happen
+            self._logger.error("Invalid resultq object")
+            self._failfast_ev.set()
+
     def run(self) -> None:
         """
         Run in a background thread.
@@ -64,13 +116,20 @@ class ResultsDemo(Thread):
 
         try:
             while True:
-                resultnt = self._resultq.get()  # blocks
+                if not self._ledger and not self._acker:
+                    self.handle_result(self._resultq.get())  # blocks
+                    continue
+
+                try:  # wake to commit rows and send acks that have waited
+                    self.handle_result(self._resultq.get(timeout=self._flush_secs))
+                except Empty:
+                    pass
+
+                if self._ledger:
+                    self._ledger.flush_due()
 
-                if isinstance(resultnt, ResultNT):
-                    self._log_finish_event(resultnt)
-                else:  # shouldn't happen
-                    self._logger.error("Invalid resultq object")
-                    self._failfast_ev.set()
+                if self._acker:
+                    self._acker.flush_due()
         except Exception as e:
             t = traceback.format_exc()
             msg = f"results thread failed: {e}\n{t}"
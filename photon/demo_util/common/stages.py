@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from wand.image import Image
+
+from photon.demo_util.common.messages import TransformNT
+from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.transforms import TransformsDemo, save_image
+
+CHUNK_SIZE = 1024 * 1024
+STAGE_FORMAT = "miff"  # lossless ImageMagick native format: no generation loss
+
+
+class ReprocessNT(NamedTuple):
+    """
+    Result of reprocessing one original.
+
+    """
+
+    transforms: List[TransformNT]
+    skipped: int
+
+
+ReprocessNT.transforms.__doc__ = "List (field 0): Transforms run for this file."
+ReprocessNT.skipped.__doc__ = "int (field 1): Stages served from the stage cache."
+
+
+class StageCacheDemo:
+    """
+    Cache the image after each stage of the transform chain.
+
+    Each intermediate image is keyed by a hash of the original bytes and the
+    signature of the chain up to that stage (plugin names, versions and source
+    hashes). When only a later stage changes - its version or just its code -
+    reprocessing resumes from the last cached stage whose prefix is unchanged
+    instead of running the whole chain.
+
+    """
+
+    def __init__(self, ctx: ContextBase, transforms: TransformsDemo) -> None:
+        """
+        Args:
+            ctx: The Context object.
+            transforms: The TransformsDemo.
+        """
+        logname = Path(__file__).stem
+        self._logger = logging.getLogger(f"{ctx.PACKAGE_NAME}.{logname}")
+        self._stages_dirp = ctx.MODIFIED_DIRP / ".stages"
+        self._transforms = transforms
+        self._prefixes = transforms.prefix_signatures()
+
+    def _stagep(self, file_hash: str, index: int) -> Path:
+        blake = hashlib.blake2b(file_hash.encode(), digest_size=20)
+        blake.update(self._prefixes[index].encode())
+        key = blake.hexdigest()
+
+        return self._stages_dirp / key[:2] / f"{key}.{STAGE_FORMAT}"
+
+    def _save_stage(self, file_hash: str, index: int, img: Image) -> None:
+        stagep = self._stagep(file_hash, index)
+        stagep.parent.mkdir(parents=True, exist_ok=True)
+        tmpp = stagep.with_name(f".{stagep.name}.{threading.get_ident()}")
+
+        with img.clone() as stage_img:  # leave the format of img untouched
+            stage_img.format = STAGE_FORMAT
+            stage_img.save(filename=str(tmpp))
+
+        tmpp.replace(stagep)
+
+    def _load_latest(self, file_hash: str) -> Optional[Tuple[int, Image]]:
+        for index in reversed(range(len(self._prefixes))):
+            stagep = self._stagep(file_hash, index)
+
+            if stagep.exists():
+                return index + 1, Image(filename=str(stagep))
+
+        return None
+
+    def reprocess(self, srcp: Path, destp: Path) -> ReprocessNT:
+        """
+        Transform an original, resuming from the latest cached stage.
+
+        Args:
+            srcp: The original file.
+            destp: The destination file.
+
+        Returns:
+            The transforms run and the number of stages skipped.
+        """
+        blake = hashlib.blake2b(digest_size=20)
+
+        with open(srcp, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                blake.update(chunk)
+
+        file_hash = blake.hexdigest()
+        latest = self._load_latest(file_hash)
+        start, img = latest if latest else (0, self._transforms.read(str(srcp)))
+
+        def on_stage(index: int, stage_img: Image) -> None:
+            self._save_stage(file_hash, index, stage_img)
+
+        img, transforms = self._transforms.run_chain(
+            img, str(destp), start=start, on_stage=on_stage
+        )
+
+        try:
+            save_image(img, str(destp))
+        finally:
+            img.close()
+
+        return ReprocessNT(transforms, start)
@@ -0,0 +1,216 @@
+import math
+from typing import Dict, Iterable, List, Sequence
+
+HISTOGRAM_LOWEST = 1e-6  # secs: a microsecond
+HISTOGRAM_HIGHEST = 3600.0  # secs: an hour
+HISTOGRAM_PRECISION = 0.01  # relative error of any reported value
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """
+    Get a percentile by the nearest-rank method.
+
+    Args:
+        sorted_values: The values, sorted ascending.
+        pct: The percentile, 0-100.
+
+    Returns:
+        The smallest value with at least pct percent of the values at or below
+        it, or 0.0 if there are no values.
+    """
+    if not sorted_values:
+        return 0.0
+
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+
+    return float(sorted_values[min(rank, len(sorted_values)) - 1])
+
+
+def percentiles(
+    values: Iterable[float], pcts: Iterable[float] = (50, 95, 99)
+) -> Dict[str, float]:
+    """
+    Get several percentiles of unsorted values.
+
+    Args:
+        values: The values.
+        pcts: The percentiles, 0-100.
+
+    Returns:
+        A dict of "p50": value, ... in the order of pcts.
+    """
+    sorted_values = sorted(values)
+
+    return {f"p{pct:g}": percentile(sorted_values, pct) for pct in pcts}
+
+
+def slope(xs: Sequence[float], ys: Sequence[float]) -> float:
+    """
+    Get the least-squares slope of y against x.
+
+    Args:
+        xs: The x values, at least two distinct.
+        ys: The y values.
+
+    Returns:
+        The slope, or NaN if there are fewer than two distinct x values.
+    """
+    if len(xs) < 2:
+        return math.nan
+
+    meanx = sum(xs) / len(xs)
+    meany = sum(ys) / len(ys)
+    sxx = sum((x - meanx) ** 2 for x in xs)
+
+    if not sxx:
+        return math.nan
+
+    return sum((x - meanx) * (y - meany) for x, y in zip(xs, ys)) / sxx
+
+
+def loglog_slope(xs: Sequence[float], ys: Sequence[float]) -> float:
+    """
+    Get the least-squares slope of log(y) against log(x).
+
+    For y = a * x ** k the slope is k: 1.0 is linear scaling, above 1.0 is
+    superlinear.
+
+    Args:
+        xs: The positive x values, at least two distinct.
+        ys: The positive y values.
+
+    Returns:
+        The slope, or NaN if there are fewer than two distinct x values.
+    """
+    return slope([math.log(x) for x in xs], [math.log(y) for y in ys])
+
+
+class LogHistogram:
+    """
+    Fixed-memory histogram of positive values in logarithmic buckets.
+
+    As with HdrHistogram, every bucket has the same relative width, so a
+    percentile is reported within `precision` of the recorded value anywhere
+    in the range, recording is O(1) and the memory does not grow with the
+    number of values. Values outside the range land in the first or last
+    bucket; the exact min and max are kept as well.
+
+    Not thread-safe: the caller holds a lock if several threads share one.
+
+    """
+
+    def __init__(
+        self,
+        lowest: float = HISTOGRAM_LOWEST,
+        highest: float = HISTOGRAM_HIGHEST,
+        precision: float = HISTOGRAM_PRECISION,
+    ) -> None:
+        """
+        Args:
+            lowest: The smallest value resolved - anything smaller is counted
+                with it.
+            highest: The largest value resolved - anything larger is counted
+                with it.
+            precision: The relative width of each bucket.
+        """
+        self._lowest = lowest
+        self._log_base = math.log1p(precision)
+        self._counts: List[int] = [0] * (self._index(highest) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        if value <= self._lowest:
+            return 0
+
+        return math.ceil(math.log(value / self._lowest) / self._log_base)
+
+    def record(self, value: float) -> None:
+        """
+        Record a value.
+
+        Args:
+            value: The value - negative values are counted as lowest.
+        """
+        self._counts[min(self._index(value), len(self._counts) - 1)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LogHistogram") -> None:
+        """
+        Add the values of another histogram with the same range and precision.
+
+        Args:
+            other: The other histogram.
+        """
+        if len(other._counts) != len(self._counts):
+            raise ValueError("histograms differ in range or precision")
+
+        for index, count in enumerate(other._counts):
+            self._counts[index] += count
+
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def copy(self) -> "LogHistogram":
+        """
+        Get an independent copy.
+
+        """
+        histogram = LogHistogram.__new__(LogHistogram)
+        histogram.__dict__.update(self.__dict__)
+        histogram._counts = list(self._counts)
+
+        return histogram
+
+    def percentile(self, pct: float) -> float:
+        """
+        Get a percentile by the nearest-rank method.
+
+        Args:
+            pct: The percentile, 0-100.
+
+        Returns:
+            The upper bound of the bucket holding the value, capped at the max,
+            or 0.0 if there are no values.
+        """
+        if not self.count:
+            return 0.0
+
+        rank = max(1, math.ceil(pct / 100 * self.count))
+        seen = 0
+
+        for index, count in enumerate(self._counts):
+            seen += count
+
+            if seen >= rank:
+                upper = self._lowest * math.exp(index * self._log_base)
+                return max(self.min, min(upper, self.max))
+
+        return self.max  # not reached
+
+    def percentiles(self, pcts: Iterable[float] = (50, 95, 99)) -> Dict[str, float]:
+        """
+        Get several percentiles.
+
+        Args:
+            pcts: The percentiles, 0-100.
+
+        Returns:
+            A dict of "p50": value, ... in the order of pcts.
+        """
+        return {f"p{pct:g}": self.percentile(pct) for pct in pcts}
+
+    @property
+    def mean(self) -> float:
+        """
+        The exact mean, or 0.0 if there are no values.
+
+        """
+        return self.total / self.count if self.count else 0.0
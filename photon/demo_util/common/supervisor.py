@@ -0,0 +1,208 @@
+import os
+import time
+import traceback
+from threading import Thread
+from multiprocessing import cpu_count
+from typing import List, NamedTuple, Optional
+
+from photon.demo_util.common.metrics import QUEUED
+from photon.demo_util.common.worker import WorkerDemo
+from photon.demo_util.common.context_base import ContextBase
+
+SUPERVISE_INTERVAL_SECS = 5
+QUEUED_TARGET_SECS = 2.0  # recent p95 queue wait above this: grow
+GROW_CHECKS = 2  # consecutive checks under pressure before growing
+SHRINK_CHECKS = 6  # consecutive idle checks before shrinking
+COOLDOWN_SECS = 30  # after any change, let the signals settle
+LOAD_HIGH = 1.0  # 1-minute load average per cpu: no cpu headroom left
+MEM_LOW = 0.10  # fraction of memory available: no memory headroom left
+
+
+class SignalsNT(NamedTuple):
+    """
+    What the Supervisor decides from.
+
+    """
+
+    workers: int
+    busy: int
+    depth: int
+    queued_p95: float
+    load: Optional[float]
+    mem_available: Optional[float]
+
+
+SignalsNT.workers.__doc__ = "int (field 0): Running Workers."
+SignalsNT.busy.__doc__ = "int (field 1): Workers handling a file."
+SignalsNT.depth.__doc__ = "int (field 2): Files waiting on the workq."
+SignalsNT.queued_p95.__doc__ = "float (field 3): Recent p95 queue wait in secs."
+SignalsNT.load.__doc__ = "float (field 4): Load average per cpu; None if unknown."
+SignalsNT.mem_available.__doc__ = (
+    "float (field 5): Fraction of memory available; None if unknown."
+)
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:.2f}"
+
+
+def _load_per_cpu() -> Optional[float]:
+    try:
+        return os.getloadavg()[0] / cpu_count()
+    except OSError:  # not available on this platform
+        return None
+
+
+def _mem_available() -> Optional[float]:
+    try:  # Linux
+        with open("/proc/meminfo") as meminfo:
+            fieldsd = {line.split(":")[0]: int(line.split()[1]) for line in meminfo}
+        return fieldsd["MemAvailable"] / fieldsd["MemTotal"]
+    except (OSError, KeyError, ValueError, IndexError, ZeroDivisionError):
+        return None
+
+
+class SupervisorDemo(Thread):
+    """
+    Grow and shrink the Workers between min-workers and max-workers.
+
+    Every few seconds the Supervisor reads the workq depth, the recent p95 queue
+    wait and the cpu and memory headroom, and logs each decision:
+
+    * grow, by a quarter, when files wait - a backlog of more than one file per
+      Worker, or any backlog with a p95 queue wait above target - for
+      consecutive checks, unless the cpus or memory are already saturated;
+    * shrink, by one, when the workq has been empty with idle Workers for
+      longer, or at once when memory runs low.
+
+    After any change it waits out a cooldown, so one burst does not make the
+    pool oscillate. A retired Worker finishes its current file and exits
+    cleanly; Workers started later do not wait on the startfast barrier.
+
+    """
+
+    def __init__(self, ctx: ContextBase) -> None:
+        """
+        Args:
+            ctx: The Context object.
+        """
+        super().__init__(daemon=True)  # terminate together w main thread
+        self._logger = ctx._logger
+        self._logger.info(
+            f"Supervisor: workers {ctx.min_workers}-{ctx.max_workers}, "
+            f"starting {ctx.worker_count}"
+        )
+        self._ctx = ctx
+        self._min_workers = ctx.min_workers
+        self._max_workers = ctx.max_workers
+        self._workq = ctx.workq
+        self._metrics = ctx.metrics
+        self._failfast_ev = ctx.failfast_ev
+        self._startfast_br = ctx.startfast_br
+        self._workers: List[WorkerDemo] = []  # started last, retired first
+        self._next_worker = 0
+        self._pressure = 0  # consecutive checks under pressure
+        self._idle = 0  # consecutive idle checks
+        self._changed = float(0)  # monotonic time of the last change
+
+        for _ in range(ctx.worker_count):  # wait on the startfast barrier
+            self._start_worker(startfast=True)
+
+    def _start_worker(self, startfast: bool) -> None:
+        worker = WorkerDemo(self._ctx, self._next_worker, startfast=startfast)
+        worker.start()
+        self._workers.append(worker)
+        self._next_worker += 1
+
+    def _signals(self) -> SignalsNT:
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        busy, _ = self._metrics.workers()
+        histogram = self._metrics.recent().histogramsd.get(QUEUED)
+
+        return SignalsNT(
+            workers=len(self._workers),
+            busy=busy,
+            depth=self._workq.qsize(),
+            queued_p95=histogram.percentile(95) if histogram else 0.0,
+            load=_load_per_cpu(),
+            mem_available=_mem_available(),
+        )
+
+    def _decide(self, signalsnt: SignalsNT) -> int:
+        memory_low = (
+            signalsnt.mem_available is not None and signalsnt.mem_available < MEM_LOW
+        )
+        saturated = memory_low or (
+            signalsnt.load is not None and signalsnt.load >= LOAD_HIGH
+        )
+        pressure = signalsnt.depth > signalsnt.workers or (
+            signalsnt.depth > 0 and signalsnt.queued_p95 > QUEUED_TARGET_SECS
+        )
+        idle = signalsnt.depth == 0 and signalsnt.busy < signalsnt.workers
+
+        self._pressure = self._pressure + 1 if pressure and not saturated else 0
+        self._idle = self._idle + 1 if idle else 0
+
+        if memory_low and signalsnt.workers > self._min_workers:
+            return -1  # shed memory now: no cooldown
+
+        if time.monotonic() - self._changed < COOLDOWN_SECS:
+            return 0
+
+        if self._pressure >= GROW_CHECKS and signalsnt.workers < self._max_workers:
+            grow = max(1, signalsnt.workers // 4)
+            return min(grow, self._max_workers - signalsnt.workers)
+
+        if self._idle >= SHRINK_CHECKS and signalsnt.workers > self._min_workers:
+            return -1
+
+        return 0
+
+    def _scale(self, delta: int, signalsnt: SignalsNT) -> None:
+        if delta > 0:
+            for _ in range(delta):
+                self._start_worker(startfast=False)
+        else:
+            for worker in self._workers[delta:]:
+                worker.retire()  # exits after its current file
+
+            self._workers = self._workers[:delta]
+
+        self._changed = time.monotonic()
+        self._pressure = self._idle = 0
+
+        self._logger.info(
+            f"supervisor: {'grow' if delta > 0 else 'shrink'} "
+            f"{signalsnt.workers} -> {signalsnt.workers + delta} workers; "
+            f"busy: {signalsnt.busy}; workq: {signalsnt.depth}; "
+            f"queued p95: {signalsnt.queued_p95:.3f} secs; "
+            f"load/cpu: {_fmt(signalsnt.load)}; "
+            f"mem available: {_fmt(signalsnt.mem_available)}"
+        )
+
+    def run(self) -> None:
+        """
+        Run the thread.
+
+        """
+        self._startfast_br.wait()  # blocks until all threads are ready
+
+        if self._min_workers == self._max_workers:
+            self._logger.info("Supervisor: fixed worker count, not scaling")
+            return
+
+        self._logger.info("Supervisor running")
+
+        try:
+            while True:
+                time.sleep(SUPERVISE_INTERVAL_SECS)
+                signalsnt = self._signals()
+                delta = self._decide(signalsnt)
+
+                if delta:
+                    self._scale(delta, signalsnt)
+        except Exception as e:
+            t = traceback.format_exc()
+            msg = f"supervisor thread failed: {e}\n{t}"
+            self._logger.error(msg)
+            self._failfast_ev.set()
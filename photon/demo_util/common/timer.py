@@ -2,6 +2,7 @@ import time
 from threading import Thread
 
 from photon.demo_util.common.context_base import ContextBase
+from photon.demo_util.common.metrics import END, QUEUED, WORK, TRANSFORM_PREFIX
 
 
 class TimerDemo(Thread):
@@ -23,9 +24,47 @@ class TimerDemo(Thread):
         self._logger = ctx._logger
         self._logger.info("Timer")
         self._sleep_time = ctx.timeout * 1.5
+        self._watchdog = ctx.watchdog
+        self._metrics = ctx.metrics
         self._failfast_ev = ctx.failfast_ev
         self._startfast_br = ctx.startfast_br
 
+    def _headroom_msg(self) -> str:
+        headroomd = self._watchdog.headroom()
+
+        if not headroomd:
+            return "timeout used: none yet"
+
+        owner = max(headroomd, key=headroomd.get)  # type: ignore
+
+        return f"timeout used: max {headroomd[owner]:.0%} ({owner})"
+
+    def _latency_msg(self) -> str:
+        snapshotnt = self._metrics.window()  # since the last health check
+        msg = (
+            f"last {snapshotnt.secs:.0f} secs: {snapshotnt.count} images "
+            f"({snapshotnt.count / max(snapshotnt.secs, 1e-9):.2f}/sec)"
+        )
+
+        if not snapshotnt.count:
+            return msg
+
+        histogramsd = snapshotnt.histogramsd
+        endd = histogramsd[END].percentiles()
+        msg += (
+            f"; end p50/p95/p99: {endd['p50']:.3f}/{endd['p95']:.3f}/"
+            f"{endd['p99']:.3f} secs"
+            f"; queued p99: {histogramsd[QUEUED].percentile(99):.3f} secs"
+            f"; work p99: {histogramsd[WORK].percentile(99):.3f} secs"
+        )
+
+        for name, histogram in sorted(histogramsd.items()):
+            if name.startswith(TRANSFORM_PREFIX):
+                name = name[len(TRANSFORM_PREFIX) :]
+                msg += f"; {name} p99: {histogram.percentile(99):.3f} secs"
+
+        return msg
+
     def run(self) -> None:
         """
         Run the thread.
@@ -40,7 +79,8 @@ class TimerDemo(Thread):
             self._logger.info(msg)
 
             while True:
-                self._logger.info("health check: up")
+                msg = f"health check: up; {self._headroom_msg()}; {self._latency_msg()}"
+                self._logger.info(msg)
                 time.sleep(60)
         except Exception as e:
             msg = f"timer thread failed: {e}"
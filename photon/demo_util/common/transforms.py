@@ -1,19 +1,73 @@
-import inspect
+import os
+import time
+import heapq
 import logging
-import pkgutil
 import importlib
 from pathlib import Path
-from typing import List, Any
+from threading import Lock
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple, Any
 
 import pluggy
+from wand.image import Image
 
 import photon.demo_util.plugins.transforms as plugins_pkg
+from photon.demo_util.manifest import get_manifest
+from photon.demo_util.common.messages import TransformNT
 from photon.demo_util.common.context_base import ContextBase
 
 transform_spec = pluggy.HookspecMarker("transform")
 transform_impl = pluggy.HookimplMarker("transform")
 
 
+class TransformTraitsNT(NamedTuple):
+    """
+    What a transform plugin declares about itself for ordering.
+
+    """
+
+    reduces_size: bool = False
+    cost: float = 1.0
+    after: Tuple[str, ...] = ()
+    before: Tuple[str, ...] = ()
+    version: str = "1"
+
+
+TransformTraitsNT.reduces_size.__doc__ = "bool (field 0): Shrinks the image T/F."
+TransformTraitsNT.cost.__doc__ = "float (field 1): Relative cost per pixel."
+TransformTraitsNT.after.__doc__ = "Tuple (field 2): Plugins that must run first."
+TransformTraitsNT.before.__doc__ = "Tuple (field 3): Plugins that must run later."
+TransformTraitsNT.version.__doc__ = "str (field 4): Bump when the output changes."
+
+# decode at >= 2x the target so the final resize still has real pixels to use
+DECODE_SIZE_FACTOR = 2
+
+_registry_lock = Lock()
+_registry: Optional["TransformsDemo"] = None
+
+
+def get_transforms(ctx: ContextBase) -> "TransformsDemo":
+    """
+    Get the process-wide TransformsDemo, building it on first use.
+
+    Plugins are discovered, imported and registered once per process and the
+    instance is shared by all Worker threads - hook calls only read the plugin
+    manager, and plugins keep no per-image state.
+
+    Args:
+        ctx: The Context object.
+
+    Returns:
+        The shared TransformsDemo.
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            _registry = TransformsDemo(ctx)
+
+        return _registry
+
+
 class TransformsDemo:
     """
     Pluggy host for image transformations.
@@ -34,6 +88,8 @@ class TransformsDemo:
     Essentially, plugins allow us to easily (and literally) drop in new features to
     our code base and help us build composable applications.
 
+    Use get_transforms() rather than instantiating this class per thread.
+
     """
 
     def __init__(self, ctx: ContextBase) -> None:
@@ -46,45 +102,280 @@ class TransformsDemo:
         self._logger.debug("")
         self._pluggy_mgr = pluggy.PluginManager("transform")
         self._pluggy_mgr.add_hookspecs(TransformSpec)
+        self._chain: List[Tuple[str, Any]] = []  # (plugin name, hook caller)
+        self._traitsd: Dict[str, TransformTraitsNT] = {}
+        self._sourcesd: Dict[str, str] = {}  # module name: source hash
+        self._source_hashesd: Dict[str, str] = {}  # plugin name: source hash
+        self._decode_size: Optional[Tuple[int, int]] = None
+        self._instrument: Any = None  # InstrumentDemo with --instrument
+        self._instrumented = getattr(ctx, "instrument", False)  # not every cmd
+        self.load_timings: Dict[str, float] = {}  # startup step: secs
         self._load_plugins()
+        self._timed("decode_size", self._load_decode_size)
+        self._log_load_timings()
+
+    def _timed(self, step: str, func: Any, *args: Any) -> Any:
+        begin = time.perf_counter()
+        result = func(*args)
+        self.load_timings[step] = time.perf_counter() - begin
+
+        return result
+
+    def _log_load_timings(self) -> None:
+        total = sum(self.load_timings.values())
+        steps = "; ".join(
+            f"{step}: {secs * 1000:.1f} ms" for step, secs in self.load_timings.items()
+        )
+        self._logger.info(f"plugin registry built in {total * 1000:.1f} ms ({steps})")
+
+    def _discover_plugins(self) -> Dict[str, List[str]]:
+        plugins_dirps = [Path(p) for p in plugins_pkg.__path__]  # type: ignore
+        manifest = get_manifest(plugins_dirps)  # cached, from the sources
+        self._sourcesd = manifest["sources"]
+
+        return manifest["plugins"]  # type: ignore
+
+    def _import_plugins(self, pluginsd: Dict[str, List[str]]) -> Dict[str, Any]:
+        return {name: importlib.import_module(name) for name in pluginsd}
+
+    def _inspect_plugins(
+        self, pluginsd: Dict[str, List[str]], plugin_modulesd: Dict[str, Any]
+    ) -> List[Any]:
+        all_classesd = {
+            class_name: getattr(plugin_modulesd[module_name], class_name)
+            for module_name, class_names in pluginsd.items()
+            for class_name in class_names
+        }
+
+        return [klass for name, klass in sorted(all_classesd.items(), reverse=True)]
 
     def _load_plugins(self) -> None:
-        plugin_modules = [
-            importlib.import_module(name)
-            for finder, name, ispkg in pkgutil.iter_modules(
-                plugins_pkg.__path__,  # type: ignore
-                plugins_pkg.__name__ + ".",
+        pluginsd = self._timed("discover", self._discover_plugins)
+        plugin_modulesd = self._timed("import", self._import_plugins, pluginsd)
+        plugin_classes = self._timed(
+            "inspect", self._inspect_plugins, pluginsd, plugin_modulesd
+        )
+        self._timed("register", self._register_plugins, plugin_classes)
+        self._timed("chain", self._build_chain)
+
+    def _register_plugins(self, plugin_classes: List[Any]) -> None:
+        for plugin_class in plugin_classes:
+            plugin = plugin_class()
+
+            if not (
+                hasattr(plugin, "run_image_transform")
+                and self._pluggy_mgr.parse_hookimpl_opts(plugin, "run_image_transform")
+            ):
+                plugin = FilenameTransformAdapter(plugin)  # legacy plugin
+
+            name = plugin_class.__name__.replace("Transform", "", 1).lower()
+            self._pluggy_mgr.register(plugin, name=name)
+            self._source_hashesd[name] = self._sourcesd.get(plugin_class.__module__, "")
+
+        if self._instrumented:  # before the chain: its callers must include it
+            from photon.demo_util.common.instrument import (
+                INSTRUMENT_NAME,
+                InstrumentDemo,
             )
-        ]
 
-        all_classesd = {}
-        for plugin_module in plugin_modules:
-            plugin_classesd = {
-                name: klass
-                for name, klass in inspect.getmembers(plugin_module, inspect.isclass)
-                if name.startswith("Transform") and name != "TransformsDemo"
-            }
+            self._instrument = InstrumentDemo()
+            self._pluggy_mgr.register(self._instrument, name=INSTRUMENT_NAME)
 
-            all_classesd.update(plugin_classesd)
+    def _plugin_names(self) -> List[str]:
+        return [
+            name
+            for name, plugin in self._pluggy_mgr.list_name_plugin()
+            if plugin is not self._instrument
+        ]
 
-        plugin_classes = [
-            klass for name, klass in sorted(all_classesd.items(), reverse=True)
+    def _plugin_caller(self, hook_name: str, name: str) -> Any:
+        others = [
+            plugin
+            for other, plugin in self._pluggy_mgr.list_name_plugin()
+            if other != name and plugin is not self._instrument
         ]
 
-        for plugin_class in plugin_classes:  # plugins fire in alpha order
-            self._pluggy_mgr.register(plugin_class())
+        return self._pluggy_mgr.subset_hook_caller(hook_name, remove_plugins=others)
+
+    def _build_chain(self) -> None:
+        for name in self._plugin_names():
+            results = self._plugin_caller("transform_traits", name)()
+            self._traitsd[name] = results[0] if results else TransformTraitsNT()
+
+        names = order_transforms(self._traitsd)
+        self._logger.info(f"transform order: {' -> '.join(names)}")
+
+        for name in names:  # one caller per plugin so images can be chained
+            caller = self._plugin_caller("run_image_transform", name)
+            self._chain.append((name, caller))
+
+    def _load_decode_size(self) -> None:
+        hints = self._pluggy_mgr.hook.decode_size_hint()
+
+        if hints:  # the output fits within the smallest box
+            width = min(w for w, h in hints) * DECODE_SIZE_FACTOR
+            height = min(h for w, h in hints) * DECODE_SIZE_FACTOR
+            self._decode_size = (width, height)
+            self._logger.info(f"jpeg shrink-on-load decode size: {width}x{height}")
+
+    def read(self, filename: str) -> Image:
+        """
+        Decode an image, at a reduced size if plugins declared a size hint.
+
+        Args:
+            filename: The filename.
+
+        Returns:
+            The open image - the caller closes it.
+        """
+        img = Image()
+
+        try:
+            if self._decode_size:  # libjpeg DCT scaling, never below the hint
+                img.options["jpeg:size"] = "{}x{}".format(*self._decode_size)
+
+            img.read(filename=filename)
+        except Exception:
+            img.close()
+            raise
+
+        return img
+
+    def signature(self) -> str:
+        """
+        Identify the transform chain.
+
+        Each plugin is identified by its declared version and a hash of its
+        source, so an edited plugin invalidates cached results even if its
+        version was not bumped.
+
+        Returns:
+            The plugin names, versions and source hashes in run order, ex:
+            "resize:1:3f2a9c0e1b7d,smooth:1:8e41d07a5c22".
+        """
+        return ",".join(
+            f"{name}:{self._traitsd[name].version}:{self._source_hashesd[name]}"
+            for name, _ in self._chain
+        )
+
+    def prefix_signatures(self) -> List[str]:
+        """
+        Identify each stage of the transform chain with everything before it.
+
+        Returns:
+            The signature of the chain up to and including each stage.
+        """
+        signature = self.signature().split(",")
+
+        return [",".join(signature[: i + 1]) for i in range(len(self._chain))]
+
+    def stage_names(self) -> List[str]:
+        """
+        Get the plugin names of the transform chain.
+
+        Returns:
+            The plugin names in run order, ex: ["resize", "smooth"].
+        """
+        return [name for name, _ in self._chain]
+
+    def run_stage(self, name: str, img: Image, filename: str) -> Image:
+        """
+        Run a single plugin of the transform chain on an open image.
+
+        Args:
+            name: The plugin name, one of stage_names().
+            img: The open image - closed here if the plugin replaces it.
+            filename: The filename, for filename-based plugins.
+
+        Returns:
+            The transformed image - the caller closes it.
+
+        Raises:
+            KeyError if no plugin has that name.
+        """
+        caller = dict(self._chain)[name]
+
+        try:
+            results = caller(img=img, filename=filename)
+        except Exception:
+            img.close()
+            raise
+
+        if results and results[0] is not img:  # plugin made a new image
+            img.close()
+            img = results[0]
+
+        return img
+
+    def run_chain(
+        self,
+        img: Image,
+        filename: str,
+        start: int = 0,
+        on_stage: Optional[Callable[[int, Image], None]] = None,
+    ) -> Tuple[Image, List[TransformNT]]:
+        """
+        Run the transform chain on an open image.
+
+        Args:
+            img: The open image - closed here if a plugin replaces it.
+            filename: The filename, for filename-based plugins.
+            start: The index of the first stage to run.
+            on_stage: Called with the stage index and image after each stage.
+
+        Returns:
+            The transformed image - the caller closes it - and the list of
+            completed transforms with their durations - and, with
+            --instrument, CPU time and pixel counts.
+        """
+        transforms = []
+
+        try:
+            for index, (name, caller) in enumerate(self._chain[start:], start):
+                begin = time.perf_counter()
+                results = caller(img=img, filename=filename)
+                secs = time.perf_counter() - begin
+
+                if results and results[0] is not img:  # plugin made a new image
+                    img.close()
+                    img = results[0]
+
+                if self._instrument:
+                    transforms.append(TransformNT(name, secs, *self._instrument.take()))
+                else:
+                    transforms.append(TransformNT(name, secs))
+
+                if on_stage:
+                    on_stage(index, img)
+        except Exception:
+            img.close()
+            raise
 
-    def run_transforms(self, filename: str, **kwargs: Any) -> List[str]:
+        return img, transforms
+
+    def run_transforms(self, filename: str, **kwargs: Any) -> List[TransformNT]:
         """
         Run image transforms.
 
+        The image is decoded once, passed through every plugin in memory and
+        encoded once, rather than each plugin reading and writing the file.
+        If plugins declare a decode size hint, JPEGs are decoded at a reduced
+        size that is still at least twice the smallest target geometry.
+
+        Args:
+            filename: The filename - transformed in place.
+
         Returns:
-            List of completed transforms.
+            List of completed transforms with their durations.
         """
+        img, transforms = self.run_chain(self.read(filename), filename)
 
-        transforms = self._pluggy_mgr.hook.run_transform(filename=filename)
+        try:
+            save_image(img, filename)
+        finally:
+            img.close()
 
-        return transforms  # type: ignore
+        return transforms
 
 
 class TransformSpec:  # needs to come after TransformsDemo
@@ -95,4 +386,143 @@ class TransformSpec:  # needs to come after TransformsDemo
 
     @transform_spec  # type: ignore
     def run_transform(self, filename: str) -> str:
+        """
+        Transform the image file in place (legacy, filename-based).
+
+        """
+        pass
+
+    @transform_spec  # type: ignore
+    def run_image_transform(self, img: Image, filename: str) -> Image:
+        """
+        Transform an open image in memory.
+
+        Implementations may accept only the arguments they need. Return the
+        transformed image - either `img` itself or a new image.
+
+        """
+        pass
+
+    @transform_spec  # type: ignore
+    def decode_size_hint(self) -> Tuple[int, int]:
+        """
+        Declare that the plugin shrinks images to fit a (width, height) box.
+
+        Lets the decoder skip detail that would be thrown away. Only plugins
+        that reduce the size of every image should implement this hook.
+
+        """
+        pass
+
+    @transform_spec  # type: ignore
+    def transform_traits(self) -> TransformTraitsNT:
+        """
+        Declare ordering constraints and the relative cost of the plugin.
+
+        Plugins without this hook get the TransformTraitsNT defaults.
+
+        """
+        pass
+
+
+class FilenameTransformAdapter:
+    """
+    Adapt a filename-based transform plugin to the in-memory image hook.
+
+    The image is written out before and read back after the legacy plugin runs,
+    so these plugins keep working at the cost of an extra encode and decode.
+
+    """
+
+    def __init__(self, plugin: Any) -> None:
+        """
+        Args:
+            plugin: The plugin implementing only `run_transform`.
+        """
+        self._plugin = plugin
+
+    @transform_impl  # type: ignore
+    def run_transform(self, filename: str) -> str:
+        return self._plugin.run_transform(filename=filename)  # type: ignore
+
+    @transform_impl  # type: ignore
+    def run_image_transform(self, img: Image, filename: str) -> Image:
+        save_image(img, filename)
+        self._plugin.run_transform(filename=filename)
+
+        return Image(filename=filename)
+
+
+def order_transforms(traitsd: Dict[str, TransformTraitsNT]) -> List[str]:
+    """
+    Order transforms so size-reducing ones run as early as allowed.
+
+    A topological sort of the `after`/`before` constraints. Whenever several
+    plugins are ready, size-reducing plugins and the plugins they must run
+    after go first, then the cheapest, then by name.
+
+    Args:
+        traitsd: The traits of each plugin by plugin name.
+
+    Returns:
+        The plugin names in run order.
+
+    Raises:
+        ValueError if the constraints contain a cycle.
+    """
+    predsd: Dict[str, Set[str]] = {name: set() for name in traitsd}
+
+    for name, traits in traitsd.items():  # unknown names are ignored
+        predsd[name].update(p for p in traits.after if p in traitsd)
+
+        for succ in traits.before:
+            if succ in traitsd:
+                predsd[succ].add(name)
+
+    reducing = {name for name, traits in traitsd.items() if traits.reduces_size}
+    pending = list(reducing)
+
+    while pending:  # reducing plugins pull their prerequisites forward
+        for pred in predsd[pending.pop()] - reducing:
+            reducing.add(pred)
+            pending.append(pred)
+
+    def key(name: str) -> Tuple[bool, float, str]:
+        return (name not in reducing, traitsd[name].cost, name)
+
+    ready = [key(name) for name, preds in predsd.items() if not preds]
+    heapq.heapify(ready)
+    order: List[str] = []
+
+    while ready:
+        name = heapq.heappop(ready)[2]
+        order.append(name)
+
+        for succ, preds in predsd.items():
+            if name in preds:
+                preds.discard(name)
+
+                if not preds:
+                    heapq.heappush(ready, key(succ))
+
+    if len(order) < len(traitsd):
+        cycle = sorted(set(traitsd) - set(order))
+        raise ValueError(f"transform ordering constraints form a cycle: {cycle}")
+
+    return order
+
+
+def save_image(img: Image, filename: str) -> None:
+    """
+    Encode an image to a new inode, replacing any existing file.
+
+    Args:
+        img: The open image.
+        filename: The filename - the format follows its extension.
+    """
+    try:
+        os.unlink(filename)  # never write through a hardlinked original
+    except FileNotFoundError:
         pass
+
+    img.save(filename=filename)
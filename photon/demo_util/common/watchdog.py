@@ -0,0 +1,156 @@
+import time
+import heapq
+import itertools
+from threading import Thread, Condition
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+from photon.demo_util.common.context_base import ContextBase
+
+
+class DeadlineNT(NamedTuple):
+    """
+    A registered deadline.
+
+    """
+
+    owner: str
+    tuuid: Any
+    begin: float
+    timeout: float
+    kill_switch: Callable[[], None]
+
+
+class WatchdogDemo(Thread):
+    """
+    One thread enforcing the timeouts of every other thread.
+
+    Threads register a deadline before a unit of work and clear it afterwards.
+    Registering pushes onto a heap and clearing drops the entry from a dict, so
+    neither creates a thread - unlike a `threading.Timer` per unit of work.
+    Cleared entries are discarded lazily when they reach the top of the heap.
+
+    The kill switch of an expired deadline is called from this thread. The
+    highest fraction of its timeout that each owner has used is kept for the
+    health checks.
+
+    """
+
+    def __init__(self, ctx: ContextBase) -> None:
+        """
+        Args:
+            ctx: The Context object.
+        """
+        super().__init__(daemon=True)  # terminate together w main thread
+        self._logger = ctx._logger
+        self._logger.info("Watchdog")
+        self._failfast_ev = ctx.failfast_ev
+        self._cond = Condition()
+        self._heap: List[Tuple[float, int]] = []  # (deadline, token)
+        self._deadlinesd: Dict[int, DeadlineNT] = {}  # token: active deadline
+        self._headroomd: Dict[str, float] = {}  # owner: max fraction of timeout
+        self._tokens = itertools.count()
+
+    def register(
+        self,
+        owner: str,
+        timeout: float,
+        kill_switch: Callable[[], None],
+        tuuid: Any = None,
+    ) -> int:
+        """
+        Register a deadline.
+
+        Args:
+            owner: The name of the registering thread, ex: "worker 3".
+            timeout: Seconds until the kill switch is called.
+            kill_switch: Called from the watchdog thread on expiry.
+            tuuid: The unit of work, if any.
+
+        Returns:
+            The token to clear the deadline with.
+        """
+        begin = time.monotonic()
+
+        with self._cond:
+            token = next(self._tokens)
+            self._deadlinesd[token] = DeadlineNT(
+                owner, tuuid, begin, timeout, kill_switch
+            )
+            heapq.heappush(self._heap, (begin + timeout, token))
+
+            if len(self._heap) > 2 * len(self._deadlinesd) + 64:  # mostly cleared
+                self._heap = [e for e in self._heap if e[1] in self._deadlinesd]
+                heapq.heapify(self._heap)
+
+            if self._heap[0][1] == token:  # new earliest deadline
+                self._cond.notify()
+
+        return token
+
+    def clear(self, token: int) -> None:
+        """
+        Clear a deadline.
+
+        Args:
+            token: The token returned by register().
+        """
+        end = time.monotonic()
+
+        with self._cond:
+            deadline = self._deadlinesd.pop(token, None)
+
+            if deadline:
+                used = (end - deadline.begin) / deadline.timeout
+                owner = deadline.owner
+                self._headroomd[owner] = max(self._headroomd.get(owner, 0.0), used)
+
+    def headroom(self) -> Dict[str, float]:
+        """
+        Report how close each owner has come to its timeout.
+
+        Returns:
+            The highest fraction of its timeout that each owner has used.
+        """
+        with self._cond:
+            return dict(self._headroomd)
+
+    def _next_expired(self) -> DeadlineNT:
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][1] not in self._deadlinesd:
+                    heapq.heappop(self._heap)  # discard cleared deadlines
+
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                expires, token = self._heap[0]
+                remaining = expires - time.monotonic()
+
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+
+                heapq.heappop(self._heap)
+                deadline = self._deadlinesd.pop(token)
+                self._headroomd[deadline.owner] = 1.0
+
+                return deadline
+
+    def run(self) -> None:
+        """
+        Run the thread.
+
+        Background thread of parent process.
+
+        """
+        self._logger.info("Watchdog running")
+
+        try:
+            while True:
+                deadline = self._next_expired()  # blocks
+                deadline.kill_switch()
+        except Exception as e:
+            msg = f"watchdog thread failed: {e}"
+            self._logger.error(msg)
+            self._failfast_ev.set()
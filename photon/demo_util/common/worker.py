@@ -1,14 +1,15 @@
 import traceback
+from queue import Empty
+from functools import partial
 from typing import List
-from pathlib import Path
-from threading import Thread, Timer
-
-from wand.image import Image
+from threading import Event, Thread
 
 from photon.common.tuuid_common import TUUIDCommon
+from photon.demo_util.common.handler import HandlerDemo
 from photon.demo_util.common.context_base import ContextBase
-from photon.demo_util.common.transforms import TransformsDemo
-from photon.demo_util.common.messages import WorkNT, ResultNT
+from photon.demo_util.common.messages import WorkNT, ResultNT, TransformNT
+
+RETIRE_CHECK_SECS = 1  # how long an idle Worker takes to notice it is retired
 
 
 class WorkerDemo(Thread):
@@ -21,11 +22,13 @@ class WorkerDemo(Thread):
 
     """
 
-    def __init__(self, ctx: ContextBase, worker: int) -> None:
+    def __init__(self, ctx: ContextBase, worker: int, startfast: bool = True) -> None:
         """
         Args:
             ctx: The Context object.
             worker: The worker index.
+            startfast: Wait on the startfast barrier - False for Workers
+                started by the Supervisor after startup.
         """
         super().__init__(daemon=True)  # worker terminates if parent does
         self._logger = ctx._logger
@@ -33,36 +36,34 @@ class WorkerDemo(Thread):
         self._worker = worker
         self._workq = ctx.workq
         self._resultq = ctx.resultq
+        self._inflight = ctx.inflight
         self._tuuid = TUUIDCommon(ctx)
-        self._transforms = TransformsDemo(ctx)
+        self._handler = ctx.process_pool if ctx.pool == "process" else HandlerDemo(ctx)
         self._timeout = ctx.timeout
-        self._modified_dirp = ctx.MODIFIED_DIRP
-        self._original_dirp = ctx.ORIGINAL_DIRP
-        self._rejected_dirp = ctx.REJECTED_DIRP
+        self._watchdog = ctx.watchdog
+        self._metrics = ctx.metrics
         self._failfast_ev = ctx.failfast_ev
         self._startfast_br = ctx.startfast_br
+        self._startfast = startfast
+        self._retire_ev = Event()
 
-    def _save_original(self, filep: Path) -> None:
-        with Image(filename=str(filep)) as img:
-            copyp = self._original_dirp / filep.name
-            img.save(filename=str(copyp))
+    def retire(self) -> None:
+        """
+        Exit cleanly once the current file, if any, is done.
+
+        """
+        self._retire_ev.set()
 
     def _process_work(self, worknt: WorkNT) -> None:
         beginworktd = self._tuuid.get_tza_utcdt() - worknt.startdt
         filep = worknt.filep
-        transforms: List[str] = []
+        transforms: List[TransformNT] = []
+        cachehit = False
 
         if filep.exists():
-            if worknt.valid:
-                self._save_original(filep)
-                transforms = self._transforms.run_transforms(str(filep))
-                destdirp = self._modified_dirp
-            else:
-                destdirp = self._rejected_dirp
-
-            new_name = destdirp / filep.name
-            filep.rename(new_name)  # move to destination directory
+            destdirp, transforms, cachehit = self._handler.handle(filep, worknt.valid)
         else:
+            destdirp = filep.parent  # nothing moved: ex, a Pub/Sub redelivery
             msg = (
                 "filepath does not currently exist; "
                 f"worker: {self._worker}; worknt: {worknt}"
@@ -70,12 +71,15 @@ class WorkerDemo(Thread):
 
             self._logger.warning(msg)
 
+        self._inflight.discard(filep)  # gone from incoming: a new file may be queued
+
         updated = {
             "worker": self._worker,
             "beginworktd": beginworktd,
             "endworktd": self._tuuid.get_tza_utcdt() - worknt.startdt,
             "destdirp": destdirp,
             "transforms": transforms,
+            "cachehit": cachehit,
         }
 
         resultd = worknt._asdict()
@@ -93,17 +97,34 @@ class WorkerDemo(Thread):
         Start the thread.
 
         """
-        self._startfast_br.wait()  # blocks until all threads are ready
+        if self._startfast:
+            self._startfast_br.wait()  # blocks until all threads are ready
+
         self._logger.info(f"Worker: {self._worker} running")
+        self._metrics.add_workers(1)
 
         try:
-            while True:
+            while not self._retire_ev.is_set():
                 worknt = None  # make sure it is defined for use in except
-                worknt = self._workq.get()  # blocks
-                ks = Timer(self._timeout, self._kill_switch, args=[worknt])
-                ks.start()
+
+                try:
+                    worknt = self._workq.get(timeout=RETIRE_CHECK_SECS)
+                except Empty:
+                    continue
+
+                token = self._watchdog.register(
+                    f"worker {self._worker}",
+                    self._timeout,
+                    partial(self._kill_switch, worknt),
+                    worknt.tuuid,
+                )
+                self._metrics.begin_work()
                 self._process_work(worknt)
-                ks.cancel()
+                self._metrics.end_work()
+                self._watchdog.clear(token)
+
+            self._metrics.add_workers(-1)
+            self._logger.info(f"Worker: {self._worker} retired")
         except Exception as e:
             t = traceback.format_exc()
             msg = f"worker run failed: {e}\nworknt: {worknt}\n{t}"
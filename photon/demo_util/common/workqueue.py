@@ -0,0 +1,59 @@
+import time
+import heapq
+import itertools
+from queue import Queue
+from typing import Any, Callable, List, Tuple
+
+QUEUE_POLICIES = ["fifo", "sjf"]
+AGING_SECS_PER_COST = 0.5  # a file waits at most this long per megapixel
+
+
+class PriorityWorkQueue(Queue):  # type: ignore
+    """
+    A workq that hands out the cheapest file first, without starving big ones.
+
+    Items are ordered by `enqueue time + cost * aging_secs_per_cost`, where the
+    cost is the estimate Incoming puts on the WorkNT. A thumbnail queued just
+    after an 80MB panorama therefore overtakes it, but anything queued more
+    than `cost * aging_secs_per_cost` secs after the panorama lines up behind
+    it - so no file waits longer than its own aging allowance plus the work
+    ahead of it. Equal keys are served FIFO.
+
+    Only the ordering changes: blocking, maxsize and task_done() are those of
+    `queue.Queue`. The clock is injectable, so a simulation can drive it.
+
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        aging_secs_per_cost: float = AGING_SECS_PER_COST,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            maxsize: Max items, 0 for no limit - as for `queue.Queue`.
+            aging_secs_per_cost: Secs of head start per unit of cost given to
+                files cheaper than this one.
+            clock: The time source for enqueue times.
+        """
+        self._aging_secs_per_cost = aging_secs_per_cost
+        self._clock = clock
+        self._seq = itertools.count()
+        super().__init__(maxsize)
+
+    # called by Queue with its mutex held
+
+    def _init(self, maxsize: int) -> None:
+        self.queue: List[Tuple[float, int, Any]] = []  # type: ignore
+
+    def _qsize(self) -> int:
+        return len(self.queue)
+
+    def _put(self, item: Any) -> None:
+        cost = getattr(item, "cost", 0.0)
+        key = self._clock() + cost * self._aging_secs_per_cost
+        heapq.heappush(self.queue, (key, next(self._seq), item))
+
+    def _get(self) -> Any:
+        return heapq.heappop(self.queue)[-1]
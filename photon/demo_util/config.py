@@ -19,4 +19,5 @@ INCOMING_DIRP = DEMO_DIRP / "incoming"  # input images
 MODIFIED_DIRP = DEMO_DIRP / "modified"  # modified images
 ORIGINAL_DIRP = DEMO_DIRP / "original"  # original images
 REJECTED_DIRP = DEMO_DIRP / "rejected"  # rejected original images (ex: png filetype)
+LEDGER_FILEP = DEMO_DIRP / "ledger.sqlite3"  # completed files, see `util ledger`
 VALID_EXTENSIONS = [".JPEG", ".JPG"]
@@ -0,0 +1,127 @@
+import os
+import ast
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from photon.demo_util import config
+
+DEPLOYP = Path(__file__).parent
+CMD_DIR_PATH = DEPLOYP / "commands"
+PLUGINS_PACKAGE = "photon.demo_util.plugins.transforms"
+PLUGINS_DIR_PATHS = [DEPLOYP / "plugins" / "transforms"]
+MANIFEST_VERSION = 2
+
+
+def _cache_filep() -> Path:
+    cache_dirp = Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser()
+
+    return cache_dirp / config.PACKAGE_HIERARCHY / "manifest.json"
+
+
+def _fingerprint(dirps: Iterable[Path]) -> str:
+    sha = hashlib.sha1(str(MANIFEST_VERSION).encode())
+
+    for dirp in dirps:
+        for filep in sorted(dirp.glob("*.py")):
+            st = filep.stat()
+            sha.update(f"{filep}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+
+    return sha.hexdigest()
+
+
+def _short_help(filep: Path) -> str:
+    tree = ast.parse(filep.read_text(), str(filep))
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and getattr(node.func, "attr", "") == "command":
+            for keyword in node.keywords:
+                if keyword.arg == "short_help":
+                    try:
+                        return str(ast.literal_eval(keyword.value))
+                    except ValueError:  # not a literal
+                        return ""
+
+    return ""
+
+
+def _plugin_classes(filep: Path) -> List[str]:
+    tree = ast.parse(filep.read_text(), str(filep))
+
+    return [
+        node.name
+        for node in tree.body
+        if isinstance(node, ast.ClassDef) and node.name.startswith("Transform")
+    ]
+
+
+def _source_hash(filep: Path) -> str:
+    return hashlib.sha1(filep.read_bytes()).hexdigest()[:12]
+
+
+def _build(fingerprint: str, plugins_dirps: List[Path]) -> Dict[str, Any]:
+    commandsd = {
+        filep.stem.replace("cmd_", ""): _short_help(filep)
+        for filep in sorted(CMD_DIR_PATH.glob("cmd_*.py"))
+    }
+
+    pluginsd = {
+        f"{PLUGINS_PACKAGE}.{filep.stem}": _plugin_classes(filep)
+        for dirp in plugins_dirps
+        for filep in sorted(dirp.glob("*.py"))
+    }
+
+    sourcesd = {
+        f"{PLUGINS_PACKAGE}.{filep.stem}": _source_hash(filep)
+        for dirp in plugins_dirps
+        for filep in sorted(dirp.glob("*.py"))
+    }
+
+    return {
+        "fingerprint": fingerprint,
+        "commands": commandsd,
+        "plugins": pluginsd,
+        "sources": sourcesd,
+    }
+
+
+def get_manifest(plugins_dirps: List[Path] = PLUGINS_DIR_PATHS) -> Dict[str, Any]:
+    """
+    Get the manifest of commands and transform plugins.
+
+    The manifest is read from the sources with `ast` - nothing is imported -
+    and cached in the user cache directory until a command or plugin file
+    changes, so listing commands and finding plugins does not pay for
+    importing click commands, Wand or the plugins.
+
+    Args:
+        plugins_dirps: The transform plugin directories.
+
+    Returns:
+        A dict with "commands" (name: short help), "plugins"
+        (module name: plugin class names) and "sources" (module name: hash of
+        the plugin source).
+    """
+    fingerprint = _fingerprint([CMD_DIR_PATH, *plugins_dirps])
+    cache_filep = _cache_filep()
+
+    try:
+        manifest = json.loads(cache_filep.read_text())
+
+        if manifest.get("fingerprint") == fingerprint:
+            return manifest  # type: ignore
+    except (OSError, ValueError):
+        pass
+
+    manifest = _build(fingerprint, plugins_dirps)
+
+    try:  # best effort: an unwritable cache only costs a rebuild next time
+        cache_filep.parent.mkdir(parents=True, exist_ok=True)
+        tmp_filep = cache_filep.with_name(f".{cache_filep.name}.{os.getpid()}")
+        tmp_filep.write_text(json.dumps(manifest, indent=2))
+        tmp_filep.replace(cache_filep)
+    except OSError:
+        pass
+
+    return manifest
@@ -1,6 +1,6 @@
 from wand.image import Image
 
-from photon.demo_util.common.transforms import transform_impl
+from photon.demo_util.common.transforms import transform_impl, TransformTraitsNT
 
 
 class TransformPolaroid:
@@ -10,18 +10,26 @@ class TransformPolaroid:
     """
 
     @transform_impl  # type: ignore
-    def run_transform(self, filename: str) -> str:
+    def transform_traits(self) -> TransformTraitsNT:
+        """
+        Frame the final-size image: run after resize.
+
+        returns:
+            The ordering traits.
+        """
+        return TransformTraitsNT(cost=2.0, after=("resize",))
+
+    @transform_impl  # type: ignore
+    def run_image_transform(self, img: Image) -> Image:
         """
         Apply a polaroid effect to an image.
 
         args:
-            filename: The filename.
+            img: The open image.
 
         returns:
-            The name of the completed transform.
+            The transformed image.
         """
-        with Image(filename=filename) as img:
-            img.polaroid()
-            img.save(filename=filename)
+        img.polaroid()
 
-        return "polaroid"
+        return img
@@ -1,6 +1,8 @@
+from typing import Tuple
+
 from wand.image import Image
 
-from photon.demo_util.common.transforms import transform_impl
+from photon.demo_util.common.transforms import transform_impl, TransformTraitsNT
 
 
 class TransformResize:
@@ -9,19 +11,40 @@ class TransformResize:
 
     """
 
+    width = 750
+    height = 500
+
+    @transform_impl  # type: ignore
+    def transform_traits(self) -> TransformTraitsNT:
+        """
+        Shrinks images, so it runs as early as allowed.
+
+        returns:
+            The ordering traits.
+        """
+        return TransformTraitsNT(reduces_size=True, cost=1.0)
+
+    @transform_impl  # type: ignore
+    def decode_size_hint(self) -> Tuple[int, int]:
+        """
+        Declare the target geometry so JPEGs can be decoded at a reduced size.
+
+        returns:
+            The (width, height) box that images are shrunk to fit.
+        """
+        return self.width, self.height
+
     @transform_impl  # type: ignore
-    def run_transform(self, filename: str) -> str:
+    def run_image_transform(self, img: Image) -> Image:
         """
         Resize an image.
 
         args:
-            filename: The filename.
+            img: The open image.
 
         returns:
-            The name of the completed transform.
+            The transformed image.
         """
-        with Image(filename=filename) as img:
-            img.transform(resize="750x500>")
-            img.save(filename=filename)
+        img.transform(resize=f"{self.width}x{self.height}>")
 
-        return "resize"
+        return img
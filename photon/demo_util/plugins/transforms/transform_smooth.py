@@ -1,6 +1,6 @@
 from wand.image import Image
 
-from photon.demo_util.common.transforms import transform_impl
+from photon.demo_util.common.transforms import transform_impl, TransformTraitsNT
 
 
 class TransformSmooth:
@@ -10,18 +10,26 @@ class TransformSmooth:
     """
 
     @transform_impl  # type: ignore
-    def run_transform(self, filename: str) -> str:
+    def transform_traits(self) -> TransformTraitsNT:
+        """
+        Kuwahara is costly per pixel: run after resize.
+
+        returns:
+            The ordering traits.
+        """
+        return TransformTraitsNT(cost=4.0, after=("resize",))
+
+    @transform_impl  # type: ignore
+    def run_image_transform(self, img: Image) -> Image:
         """
         Smoothes an image.
 
         args:
-            filename: The filename.
+            img: The open image.
 
         returns:
-            The name of the completed transform.
+            The transformed image.
         """
-        with Image(filename=filename) as img:
-            img.kuwahara(radius=2, sigma=1.5)
-            img.save(filename=filename)
+        img.kuwahara(radius=2, sigma=1.5)
 
-        return "smooth"
+        return img
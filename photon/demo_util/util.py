@@ -1,3 +1,4 @@
+import time
 import logging
 from pathlib import Path
 from typing import cast, Any, List
@@ -11,7 +12,6 @@ from photon.demo_util.common.context_base import ContextBase
 
 ROOTP = Path.cwd()
 DEPLOYP = Path(__file__).parent
-CMD_DIR_PATH = DEPLOYP / "commands"
 CONTEXT_SETTINGS = {"auto_envvar_prefix": "UTIL"}
 _logging_common = LoggingCommon(cast(ContextBase, config))
 _root_logger = _logging_common.get_root_logger()
@@ -49,6 +49,10 @@ class DemoUtil(click.MultiCommand):
     """
     Support dynamic cmd listing, selection and importation.
 
+    Commands are listed from the cached manifest, so only the selected command
+    is imported - and each command imports its heavy dependencies only when
+    it executes.
+
     """
 
     def list_commands(self, ctx: Any) -> List[str]:
@@ -61,14 +65,32 @@ class DemoUtil(click.MultiCommand):
         Returns:
             The command list.
         """
+        from photon.demo_util.manifest import get_manifest  # only to list cmds
+
         _logger.debug("")
 
-        cmds_all = [
-            path.stem.replace("cmd_", "") for path in CMD_DIR_PATH.glob("cmd_*.py")
-        ]
+        cmds_all = get_manifest()["commands"]
 
         return sorted(cmds_all)
 
+    def format_commands(self, ctx: Any, formatter: Any) -> None:
+        """
+        Write the command list for --help without importing the commands.
+
+        Args:
+            ctx: The Context.
+            formatter: The click HelpFormatter.
+        """
+        from photon.demo_util.manifest import get_manifest  # only to list cmds
+
+        _logger.debug("")
+
+        rows = sorted(get_manifest()["commands"].items())
+
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
     def get_command(self, ctx: Any, cmd: str) -> Any:
         """
         Get a command.
@@ -85,12 +107,17 @@ class DemoUtil(click.MultiCommand):
         """
         _logger.debug("")
 
+        begin = time.perf_counter()
+
         try:
             cmd_module = import_module(f"photon.demo_util.commands.cmd_{cmd}")
         except ImportError as e:
             print(f"ImportError: {e}")
             raise
 
+        secs = time.perf_counter() - begin
+        _logger.debug(f"cmd_{cmd} imported in {secs * 1000:.1f} ms")
+
         return cmd_module.cli  # type:ignore
 
 
@@ -0,0 +1,106 @@
+import json
+from typing import Any, Dict
+
+import pytest
+
+from photon.demo_util.util import Context, cli
+from photon.demo_util.commands import cmd_bench
+from photon.demo_util.common.bench import BENCH_VERSION, compare
+from photon.demo_util.common.corpus import make_corpus
+
+COUNT = 3
+MIX = "small"
+SEED = 7
+
+
+@pytest.fixture(scope="module")
+def resultd(tmp_path_factory: Any) -> Dict[str, Any]:
+    pytest.importorskip("wand.image")  # the corpus is generated with Wand
+    ctx = Context()
+    args = ["bench", "-n", str(COUNT), "--mix", MIX, "--seed", str(SEED), "-w", "1"]
+    cli.main(args, obj=ctx, standalone_mode=False)  # not executed: options only
+    dirp = tmp_path_factory.mktemp("corpus")
+    fileps = make_corpus(dirp, COUNT, MIX, SEED)
+
+    return cmd_bench._run(ctx, fileps)
+
+
+def test_run_schema(resultd: Dict[str, Any]) -> None:
+    assert resultd["version"] == BENCH_VERSION
+    assert resultd["images"] == COUNT
+    assert resultd["secs"] > 0
+    assert resultd["images_per_sec"] > 0
+    assert resultd["peak_rss_bytes"] > 0
+    assert resultd["cpu_secs"] >= 0
+    assert resultd["cpu_utilization"] >= 0
+
+    for name in ("queued", "work", "end"):
+        percentilesd = resultd["latency"][name]
+        assert set(percentilesd) == {"p50", "p95", "p99"}
+        assert 0 <= percentilesd["p50"] <= percentilesd["p95"] <= percentilesd["p99"]
+
+    json.dumps(resultd)  # written as JSON
+
+
+def test_run_reproducible_corpus(tmp_path: Any) -> None:
+    pytest.importorskip("wand.image")
+    fileps = make_corpus(tmp_path, COUNT, MIX, SEED)
+
+    assert [p.name for p in fileps] == [
+        p.name for p in make_corpus(tmp_path, COUNT, MIX, SEED)
+    ]
+
+
+BASELINED = {
+    "version": BENCH_VERSION,
+    "images_per_sec": 100.0,
+    "latency": {"end": {"p99": 1.0}},
+}
+CHECKS = [("images_per_sec", True), ("latency.end.p99", False)]
+
+
+def test_compare_within_tolerance() -> None:
+    resultd = {
+        "version": BENCH_VERSION,
+        "images_per_sec": 95.0,  # -5%
+        "latency": {"end": {"p99": 1.05}},  # +5%
+    }
+
+    assert compare(resultd, BASELINED, CHECKS, 0.10) == []
+
+
+def test_compare_improvement() -> None:
+    resultd = {
+        "version": BENCH_VERSION,
+        "images_per_sec": 200.0,
+        "latency": {"end": {"p99": 0.5}},
+    }
+
+    assert compare(resultd, BASELINED, CHECKS, 0.10) == []
+
+
+def test_compare_regression() -> None:
+    resultd = {
+        "version": BENCH_VERSION,
+        "images_per_sec": 80.0,  # -20%
+        "latency": {"end": {"p99": 1.5}},  # +50%
+    }
+    regressions = compare(resultd, BASELINED, CHECKS, 0.10)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("images_per_sec:")
+    assert regressions[1].startswith("latency.end.p99:")
+
+
+def test_compare_missing_key_skipped() -> None:
+    resultd = {"version": BENCH_VERSION, "images_per_sec": 100.0}
+
+    assert compare(resultd, BASELINED, CHECKS, 0.10) == []
+
+
+def test_compare_version_mismatch() -> None:
+    resultd = dict(BASELINED, version=BENCH_VERSION + 1)
+    regressions = compare(resultd, BASELINED, CHECKS, 0.10)
+
+    assert len(regressions) == 1
+    assert "not comparable" in regressions[0]
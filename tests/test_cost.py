@@ -0,0 +1,76 @@
+import struct
+from pathlib import Path
+from typing import Any
+
+from photon.demo_util.common.cost import MP, PIXELS_PER_BYTE, estimate_cost
+from photon.demo_util.common.cost import jpeg_dimensions
+
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+
+
+def segment(code: int, payload: bytes) -> bytes:
+    return bytes([0xFF, code]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def sof(width: int, height: int, code: int = 0xC0) -> bytes:
+    return segment(code, struct.pack(">BHHB", 8, height, width, 1) + b"\x01\x11\x00")
+
+
+def jpeg(width: int, height: int) -> bytes:
+    return SOI + sof(width, height) + segment(0xDA, b"\x00" * 8) + EOI
+
+
+def write(tmp_path: Any, data: bytes) -> Path:
+    filep = tmp_path / "image.jpg"
+    filep.write_bytes(data)
+
+    return filep
+
+
+def test_sof(tmp_path: Any) -> None:
+    assert jpeg_dimensions(write(tmp_path, jpeg(640, 480))) == (640, 480)
+
+
+def test_progressive_sof(tmp_path: Any) -> None:
+    data = SOI + sof(1024, 768, code=0xC2) + EOI
+
+    assert jpeg_dimensions(write(tmp_path, data)) == (1024, 768)
+
+
+def test_exif_thumbnail_skipped(tmp_path: Any) -> None:
+    thumbnail = jpeg(160, 120)  # its own SOF, inside the APP1 segment
+    exif = segment(0xE1, b"Exif\x00\x00" + thumbnail)
+    jfif = segment(0xE0, b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00")
+    tables = segment(0xDB, b"\x00" * 65) + segment(0xC4, b"\x00" * 29)  # DQT, DHT
+    fill = b"\xff"  # padding allowed before a marker
+    data = SOI + jfif + exif + tables + fill + sof(4000, 3000) + EOI
+
+    assert jpeg_dimensions(write(tmp_path, data)) == (4000, 3000)
+
+
+def test_sos_before_sof(tmp_path: Any) -> None:
+    data = SOI + segment(0xDA, b"\x00" * 8) + sof(640, 480) + EOI
+
+    assert jpeg_dimensions(write(tmp_path, data)) is None
+
+
+def test_truncated(tmp_path: Any) -> None:
+    data = jpeg(640, 480)
+    width_end = len(SOI) + 4 + 5  # marker, length, precision, height, width
+
+    for end in range(width_end):
+        assert jpeg_dimensions(write(tmp_path, data[:end])) is None, end
+
+
+def test_not_jpeg(tmp_path: Any) -> None:
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+    assert jpeg_dimensions(write(tmp_path, png)) is None
+    assert jpeg_dimensions(write(tmp_path, SOI + b"garbage")) is None
+    assert jpeg_dimensions(tmp_path / "missing.jpg") is None
+
+
+def test_estimate_cost(tmp_path: Any) -> None:
+    assert estimate_cost(write(tmp_path, jpeg(2000, 1500)), 0) == 2000 * 1500 / MP
+    assert estimate_cost(write(tmp_path, b"plasma"), MP) == PIXELS_PER_BYTE
@@ -0,0 +1,114 @@
+from typing import List
+
+import pytest
+
+from photon.demo_util.common.pubsub_server import SubscriptionDemo
+
+DEADLINE = 10.0
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def subscription(clock: FakeClock) -> SubscriptionDemo:
+    return SubscriptionDemo(DEADLINE, clock)
+
+
+def ids(deliveries: List[dict]) -> List[str]:
+    return [d["id"] for d in deliveries]
+
+
+def test_lease_expiry_redelivers(
+    clock: FakeClock, subscription: SubscriptionDemo
+) -> None:
+    (msgid,) = subscription.publish(["a"])
+    (first,) = subscription.take(1, 10)
+    clock.now = DEADLINE - 0.1
+
+    assert subscription.take(1, 10) == []
+
+    clock.now = DEADLINE
+    (second,) = subscription.take(1, 10)
+
+    assert (second["id"], second["attempt"], second["data"]) == (msgid, 2, "a")
+    assert second["ackid"] != first["ackid"]
+    assert subscription.stats()["expired"] == 1
+    assert subscription.stats()["redelivered"] == 1
+
+
+def test_redelivery_ahead_of_newer(
+    clock: FakeClock, subscription: SubscriptionDemo
+) -> None:
+    (old,) = subscription.publish(["a"])
+    subscription.take(1, 1)
+    (new,) = subscription.publish(["b"])
+    clock.now = DEADLINE
+
+    assert ids(subscription.take(1, 10)) == [old, new]
+
+
+def test_late_ack_not_counted(clock: FakeClock, subscription: SubscriptionDemo) -> None:
+    subscription.publish(["a"])
+    (first,) = subscription.take(1, 10)
+    clock.now = DEADLINE
+    (second,) = subscription.take(1, 10)
+
+    assert subscription.ack([first["ackid"]]) == 0
+    assert subscription.ack([second["ackid"]]) == 1
+
+    statsd = subscription.stats()
+    assert (statsd["acked"], statsd["late_acks"]) == (1, 1)
+    assert (statsd["backlog"], statsd["outstanding"]) == (0, 0)
+
+
+def test_modack_extends_lease(clock: FakeClock, subscription: SubscriptionDemo) -> None:
+    subscription.publish(["a"])
+    (delivery,) = subscription.take(1, 10)
+    clock.now = DEADLINE / 2
+
+    assert subscription.modack([delivery["ackid"]], DEADLINE) == 1
+
+    clock.now = DEADLINE  # the first expiry is stale
+    assert subscription.take(1, 10) == []
+
+    clock.now = DEADLINE * 1.5
+    (redelivery,) = subscription.take(1, 10)
+    assert redelivery["attempt"] == 2
+
+
+def test_nack_redelivers_at_once(subscription: SubscriptionDemo) -> None:
+    subscription.publish(["a"])
+    (delivery,) = subscription.take(1, 10)
+
+    assert subscription.modack([delivery["ackid"]], 0) == 1
+
+    (redelivery,) = subscription.take(1, 10)
+    assert (redelivery["id"], redelivery["attempt"]) == (delivery["id"], 2)
+    assert subscription.stats()["nacked"] == 1
+    assert subscription.modack([delivery["ackid"]], 0) == 0  # lease ended
+
+
+def test_flow_control(clock: FakeClock, subscription: SubscriptionDemo) -> None:
+    subscription.publish(["a", "b", "c", "d"])
+    deliveries = subscription.take(1, 10, max_outstanding=2)
+
+    assert len(deliveries) == 2
+    assert subscription.take(1, 10, max_outstanding=2) == []
+    assert len(subscription.take(2, 10, max_outstanding=1)) == 1  # per stream
+
+    subscription.ack([deliveries[0]["ackid"]])
+    assert len(subscription.take(1, 10, max_outstanding=2)) == 1
+
+    clock.now = DEADLINE  # expiries free credit too
+    assert len(subscription.take(1, 10, max_outstanding=2)) == 2
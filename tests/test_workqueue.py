@@ -0,0 +1,64 @@
+from typing import List, NamedTuple
+
+from photon.demo_util.common.workqueue import PriorityWorkQueue
+
+AGING = 0.5
+
+
+class ItemNT(NamedTuple):
+    name: str
+    cost: float
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def drain(workq: PriorityWorkQueue) -> List[str]:
+    return [workq.get_nowait().name for _ in range(workq.qsize())]
+
+
+def test_cheapest_first() -> None:
+    workq = PriorityWorkQueue(aging_secs_per_cost=AGING, clock=FakeClock())
+
+    for item in (ItemNT("big", 80.0), ItemNT("small", 0.1), ItemNT("medium", 12.0)):
+        workq.put(item)
+
+    assert drain(workq) == ["small", "medium", "big"]
+
+
+def test_equal_cost_fifo() -> None:
+    workq = PriorityWorkQueue(aging_secs_per_cost=AGING, clock=FakeClock())
+    names = [f"file{i}" for i in range(10)]
+
+    for name in names:
+        workq.put(ItemNT(name, 1.0))
+
+    assert drain(workq) == names
+
+
+def test_aging_bound() -> None:
+    clock = FakeClock()
+    workq = PriorityWorkQueue(aging_secs_per_cost=AGING, clock=clock)
+    workq.put(ItemNT("big", 80.0))  # served by 80 * AGING = 40 secs
+    clock.now = 40.0 - 0.1
+    workq.put(ItemNT("before", 0.0))
+    clock.now = 40.0  # a tie: FIFO
+    workq.put(ItemNT("tie", 0.0))
+    clock.now = 40.0 + 0.1
+    workq.put(ItemNT("after", 0.0))
+
+    assert drain(workq) == ["before", "big", "tie", "after"]
+
+
+def test_no_cost_is_fifo() -> None:
+    workq = PriorityWorkQueue(clock=FakeClock())
+
+    for name in ("a", "b", "c"):
+        workq.put(name)
+
+    assert [workq.get_nowait() for _ in range(3)] == ["a", "b", "c"]